@@ -1,15 +1,38 @@
 import asyncnetfsm.vendors
 from asyncnetfsm.dispatcher import create, platforms
 from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError, AsyncnetfsmCommitError
+from asyncnetfsm.exceptions import AsyncnetfsmConfigError, AsyncnetfsmConnectionError, AsyncnetfsmNetconfError
+from asyncnetfsm.exceptions import AsyncnetfsmTransferError
+from asyncnetfsm.fingerprint import FingerprintCache
+from asyncnetfsm.fleet import FleetRunner, FleetResult
 from asyncnetfsm.logger import logger
+from asyncnetfsm.multichannel import MultiChannelDevice
+from asyncnetfsm.pool import DevicePool
+from asyncnetfsm.ratelimit import RateLimiter
+from asyncnetfsm.resilient import ResilientDevice
+from asyncnetfsm.transfer import distribute_file
+from asyncnetfsm.tunnels import TunnelManager
 from asyncnetfsm.version import __author__, __author_email__, __url__, __version__
 
 __all__ = (
     "create",
     "platforms",
+    "DevicePool",
+    "FingerprintCache",
+    "FleetRunner",
+    "FleetResult",
+    "MultiChannelDevice",
+    "RateLimiter",
+    "ResilientDevice",
+    "TunnelManager",
+    "distribute_file",
     "logger",
     "AsyncnetfsmAuthenticationError",
     "AsyncnetfsmTimeoutError",
     "AsyncnetfsmCommitError",
+    "AsyncnetfsmConfigError",
+    "AsyncnetfsmConnectionError",
+    "AsyncnetfsmNetconfError",
+    "AsyncnetfsmTransferError",
     "vendors",
 )
@@ -2,4 +2,7 @@
 Connections Module, classes that handle the protocols connection like ssh,telnet and serial.
 """
 from .ssh import SSHConnection
+from .ssh_exec import SSHExecConnection, ExecResult
+from .netconf import NetconfSession
+from .sftp import SFTPTransfer, TransferResult
 from .telnet import TelnetConnection
@@ -3,8 +3,13 @@ Base Connection Module
 """
 import re
 import asyncio
+from asyncnetfsm.constants import MAX_BUFFER
+from asyncnetfsm.exceptions import AsyncnetfsmConnectionError
 from asyncnetfsm.logger import logger
+from asyncnetfsm.connections.buffer import OutputBuffer
 from asyncnetfsm.connections.interface import IConnection
+from asyncnetfsm.connections.matcher import PatternMatcher, PatternSet
+from asyncnetfsm.connections.timer import ReadTimer, current_task
 
 
 class BaseConnection(IConnection):
@@ -13,8 +18,22 @@ class BaseConnection(IConnection):
         self._host = None
         self._timeout = None
         self._conn = None
+        self._stdin = self._stdout = self._stderr = None
         self._base_prompt = self._base_pattern = ""
-        self._MAX_BUFFER = 65535
+        self._MAX_BUFFER = MAX_BUFFER
+        self._PATTERN_OVERLAP = 1024
+        self.last_read_stats = None
+        self.last_match = None
+        self._pattern_sets = {}
+        self._MAX_PATTERN_SETS = 64
+        self._prompt_classifier = None
+        self._stop_line = None
+        self.prompt = None
+        self.mode = None
+        self.last_activity = None
+        self._probe_task = None
+        self._probe_done = None
+        self._held = []
 
     async def __aenter__(self):
         """Async Context Manager"""
@@ -32,10 +51,99 @@ class BaseConnection(IConnection):
     def set_base_prompt(self, prompt):
         """ base prompt setter """
         self._base_prompt = prompt
+        self._pattern_sets.clear()
 
     def set_base_pattern(self, pattern):
         """ base patter setter """
         self._base_pattern = pattern
+        self._pattern_sets.clear()
+        self._classify_stop_line()
+
+    def set_prompt_classifier(self, classifier):
+        """
+        prompt classifier setter
+
+        :param classifier: function returning the mode of the session for the prompt line or None
+        """
+        self._prompt_classifier = classifier
+
+    async def probe(self, cmd, timeout=None):
+        """
+        Send cmd and read until the prompt as the liveness probe of the idle session
+
+        Data sent by other coroutines during the probe is held and written after it, and their reads
+        wait for the end of the probe, so the probe never takes the output of their commands.
+
+        :param str cmd: data for sending, usually new line
+        :param float timeout: time in seconds for the prompt
+        :return: output until the prompt
+        """
+        self._probe_task = current_task()
+        self._probe_done = asyncio.Event()
+        try:
+            self.send(cmd)
+            return await self.read_until_prompt(timeout=timeout)
+        finally:
+            # Held data is written before the waiting reads are resumed
+            self._probe_task = None
+            self._probe_done.set()
+            self._probe_done = None
+            held, self._held = self._held, []
+            for data in held:
+                if self.is_closed():
+                    break
+                self.send(data)
+
+    def _waits_for_probe(self):
+        """Check the probe is running in other coroutine"""
+        return self._probe_task is not None and current_task() is not self._probe_task
+
+    def _hold(self, cmd):
+        """Keep data sent during the probe of other coroutine, return True if it's held"""
+        if not self._waits_for_probe():
+            return False
+        self._held.append(cmd)
+        return True
+
+    async def _read_after_probe(self):
+        """Wait for the end of the probe and read"""
+        await self._probe_done.wait()
+        return await self.read()
+
+    def reset_prompt(self):
+        """ Forget the tracked prompt and mode, they are unknown after sending data """
+        self._stop_line = self.prompt = self.mode = None
+
+    def _track_prompt(self, output, match):
+        """Save the line of output ending with the found pattern and classify it"""
+        self._stop_line = output[output.rfind("\n", 0, match.end) + 1:match.end].strip()
+        self._classify_stop_line()
+
+    def _classify_stop_line(self):
+        """
+        Save the prompt where the last read stopped and classify it into the mode of the session
+
+        The line is the prompt if the base pattern is found in it
+        """
+        line = self._stop_line
+        if not line or not self._base_pattern or not self._get_pattern_set([self._base_pattern]).search(line):
+            self.prompt = self.mode = None
+            return
+        self.prompt = line
+        if self._prompt_classifier is not None:
+            self.mode = self._prompt_classifier(line)
+        logger.debug("Host {}: Prompt: {}, mode: {}".format(self._host, repr(self.prompt), self.mode))
+
+    def _get_pattern_set(self, patterns, re_flags=0):
+        """Return patterns compiled into :class:`PatternSet`, compiled once per session"""
+        key = (tuple(patterns), re_flags)
+        pattern_set = self._pattern_sets.get(key)
+        if pattern_set is None:
+            if len(self._pattern_sets) >= self._MAX_PATTERN_SETS:
+                self._pattern_sets.clear()
+            pattern_set = PatternSet(patterns, re_flags)
+            self._pattern_sets[key] = pattern_set
+        return pattern_set
 
     async def disconnect(self):
         """ Close Connection """
@@ -49,12 +157,32 @@ class BaseConnection(IConnection):
         """ send data """
         raise NotImplementedError("Connection must implement send method")
 
+    def is_closed(self):
+        """ Check the transport was closed """
+        raise NotImplementedError("Connection must implement is_closed method")
+
+    def abort(self):
+        """ Close the transport without waiting """
+        raise NotImplementedError("Connection must implement abort method")
+
     async def read(self):
         """ read from buffer """
         raise NotImplementedError("Connection must implement read method ")
 
-    async def read_until_pattern(self, pattern, re_flags=0, read_for=0):
-        """Read channel until pattern detected. Return ALL data available"""
+    async def read_until_pattern(self, pattern, re_flags=0, read_for=0, timeout=None, idle_timeout=None):
+        """
+        Read channel until pattern detected. Return ALL data available
+
+        :param pattern: regular expression or list of regular expressions
+        :param re.flags re_flags: re flags for pattern
+        :param float read_for: return the output instead of raising when the channel is idle
+                for read_for seconds or when the timeout is exceeded
+        :param float timeout: total time in seconds for reading. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is connection timeout
+
+        Statistics of the gaps between chunks are saved in last_read_stats.
+        The :class:`PatternMatch` of the found pattern is saved in last_match, it's None when nothing was found
+        """
 
         if pattern is None:
             raise ValueError("pattern cannot be None")
@@ -62,34 +190,117 @@ class BaseConnection(IConnection):
         if isinstance(pattern, str):
             pattern = [pattern]
 
-        output = ""
+        if read_for:
+            idle_timeout = read_for
+        elif idle_timeout is None:
+            idle_timeout = self._timeout
+
+        matcher = PatternMatcher(self._get_pattern_set(pattern, re_flags), overlap=self._PATTERN_OVERLAP)
+        self.last_match = None
+        output = OutputBuffer()
         logger.info("Host {}: Reading until pattern".format(self._host))
 
         logger.debug("Host {}: Reading pattern: {}".format(self._host, pattern))
-        while True:
-
-            fut = self.read()
-            try:
-                output += await asyncio.wait_for(fut, read_for or self._timeout)
-            except asyncio.TimeoutError:
-                if read_for:
-                    return output
-                raise TimeoutError(self._host)
-            for exp in pattern:
-                if re.search(exp, output, flags=re_flags):
-                    logger.debug(
-                        "Host {}: Reading pattern '{}' was found: {}".format(
-                            self._host, pattern, repr(output)
+        timer = ReadTimer(timeout=timeout, idle_timeout=idle_timeout)
+        try:
+            with timer:
+                while True:
+                    chunk = await self.read()
+                    if not chunk:
+                        self._set_read_stats(timer, "eof")
+                        if read_for:
+                            return output.getvalue()
+                        raise AsyncnetfsmConnectionError(self._host, None, "connection closed by remote host")
+                    timer.touch()
+                    output.append(chunk)
+                    match = matcher.feed(chunk)
+                    if match:
+                        self.last_match = match
+                        self._set_read_stats(timer, "pattern")
+                        output = output.getvalue()
+                        self._track_prompt(output, match)
+                        logger.debug(
+                            "Host {}: Reading pattern '{}' was found: {}".format(
+                                self._host, match.pattern, repr(output)
+                            )
+                        )
+                        return output
+        except asyncio.TimeoutError:
+            self._set_read_stats(timer, timer.expired)
+            if read_for:
+                return output.getvalue()
+            raise TimeoutError(self._host)
+
+    async def read_until_pattern_sequence(self, patterns, re_flags=0, timeout=None, idle_timeout=None):
+        """
+        Read channel until all patterns are found one after another
+
+        Every pattern is searched only after the end of the previous one, so one read
+        collects and splits the outputs of several commands written at once.
+
+        :param list patterns: regular expressions in the order of appearance
+        :param re.flags re_flags: re flags for patterns
+        :param float timeout: total time in seconds for reading. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is connection timeout
+        :return: list of outputs, every output ends with the match of its pattern
+        """
+        if not patterns:
+            return []
+        if idle_timeout is None:
+            idle_timeout = self._timeout
+
+        logger.info("Host {}: Reading until sequence of {} patterns".format(self._host, len(patterns)))
+        outputs = []
+        matcher = PatternMatcher(self._get_pattern_set([patterns[0]], re_flags), overlap=self._PATTERN_OVERLAP)
+        self.last_match = None
+        output = OutputBuffer()
+        timer = ReadTimer(timeout=timeout, idle_timeout=idle_timeout)
+        try:
+            with timer:
+                while True:
+                    chunk = await self.read()
+                    if not chunk:
+                        self._set_read_stats(timer, "eof")
+                        raise AsyncnetfsmConnectionError(self._host, None, "connection closed by remote host")
+                    timer.touch()
+                    output.append(chunk)
+                    match = matcher.feed(chunk)
+                    while match:
+                        # Offsets of the match count from the beginning of the current output. The match
+                        # can end in the data read earlier, when a lookahead needed the next chunk
+                        text = output.getvalue()
+                        output, rest = text[:match.end], text[match.end:]
+                        self.last_match = match
+                        self._track_prompt(output, match)
+                        outputs.append(output)
+                        if len(outputs) == len(patterns):
+                            self._set_read_stats(timer, "pattern")
+                            return outputs
+                        matcher = PatternMatcher(
+                            self._get_pattern_set([patterns[len(outputs)]], re_flags), overlap=self._PATTERN_OVERLAP
                         )
-                    )
-                    return output
+                        output = OutputBuffer(rest)
+                        match = matcher.feed(rest) if rest else None
+        except asyncio.TimeoutError:
+            self._set_read_stats(timer, timer.expired)
+            raise TimeoutError(self._host)
+
+    def _set_read_stats(self, timer, ended_by):
+        self.last_read_stats = timer.stats(ended_by)
+        logger.debug("Host {}: Read stats: {}".format(self._host, self.last_read_stats))
 
-    async def read_until_prompt(self, read_for=0):
+    async def read_until_prompt(self, read_for=0, timeout=None, idle_timeout=None):
         """ read util prompt """
-        return await self.read_until_pattern(self._base_pattern, read_for=read_for)
+        return await self.read_until_pattern(
+            self._base_pattern, read_for=read_for, timeout=timeout, idle_timeout=idle_timeout
+        )
+
+    async def read_until_prompt_or_pattern(self, pattern, re_flags=0, read_for=0, timeout=None, idle_timeout=None):
+        """
+        read util prompt or pattern
 
-    async def read_until_prompt_or_pattern(self, pattern, re_flags=0, read_for=0):
-        """ read util prompt or pattern """
+        The prompt has index 0 in last_match, the patterns are numbered from 1
+        """
 
         logger.info("Host {}: Reading until prompt or pattern".format(self._host))
 
@@ -100,4 +311,6 @@ class BaseConnection(IConnection):
             pattern = [base_prompt] + pattern
         else:
             raise ValueError("pattern must be string or list of strings")
-        return await self.read_until_pattern(pattern=pattern, re_flags=re_flags, read_for=read_for)
+        return await self.read_until_pattern(
+            pattern=pattern, re_flags=re_flags, read_for=read_for, timeout=timeout, idle_timeout=idle_timeout
+        )
@@ -0,0 +1,47 @@
+"""
+Output Buffer Module, accumulates the channel output without copying it on every read
+"""
+
+
+class OutputBuffer(object):
+    """
+    Collect chunks of output and join them only once
+
+    Appending a chunk doesn't copy the data which was collected before,
+    the chunks are joined when the whole value is requested.
+    """
+
+    def __init__(self, initial=""):
+        self._chunks = []
+        self._length = 0
+        self.append(initial)
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return self.getvalue()
+
+    def append(self, chunk):
+        """Add chunk to the end of the buffer"""
+        if chunk:
+            self._chunks.append(chunk)
+            self._length += len(chunk)
+
+    def tail(self, size):
+        """Return last size characters of the buffer without joining the whole buffer"""
+        parts = []
+        collected = 0
+        for chunk in reversed(self._chunks):
+            if collected >= size:
+                break
+            parts.append(chunk)
+            collected += len(chunk)
+        tail = "".join(reversed(parts))
+        return tail[-size:] if size else ""
+
+    def getvalue(self):
+        """Join all chunks and return the whole output"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
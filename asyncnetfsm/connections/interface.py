@@ -37,16 +37,31 @@ class IConnection(abc.ABC):
         pass
 
     @abc.abstractmethod
-    async def read_until_pattern(self, pattern, re_flags=0):
+    def is_closed(self):
+        """ Check the transport was closed """
+        pass
+
+    @abc.abstractmethod
+    def abort(self):
+        """ Close the transport without waiting, pending reads get end of file """
+        pass
+
+    @abc.abstractmethod
+    async def read_until_pattern(self, pattern, re_flags=0, read_for=0, timeout=None, idle_timeout=None):
         """ read util pattern """
         pass
 
     @abc.abstractmethod
-    async def read_until_prompt(self):
+    async def read_until_pattern_sequence(self, patterns, re_flags=0, timeout=None, idle_timeout=None):
+        """ read until patterns one after another """
+        pass
+
+    @abc.abstractmethod
+    async def read_until_prompt(self, read_for=0, timeout=None, idle_timeout=None):
         """ read util pattern """
         pass
 
     @abc.abstractmethod
-    async def read_until_prompt_or_pattern(self, attern, re_flags=0):
+    async def read_until_prompt_or_pattern(self, pattern, re_flags=0, read_for=0, timeout=None, idle_timeout=None):
         """ read util pattern """
         pass
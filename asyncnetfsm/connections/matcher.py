@@ -0,0 +1,134 @@
+"""
+Pattern Matcher Module, incremental search of patterns in the channel output
+"""
+import re
+
+
+class PatternMatch(object):
+    """Information about the pattern which was found in the channel output"""
+
+    def __init__(self, index, pattern, start, end, text):
+        self.index = index
+        """Index of the pattern in the list of patterns"""
+
+        self.pattern = pattern
+        """Regular expression which was found"""
+
+        self.start = start
+        """Offset of the beginning of the match in the whole output"""
+
+        self.end = end
+        """Offset of the end of the match in the whole output"""
+
+        self.text = text
+        """Matched text"""
+
+    def __repr__(self):
+        return "PatternMatch(index={}, pattern={!r}, start={}, end={}, text={!r})".format(
+            self.index, self.pattern, self.start, self.end, self.text
+        )
+
+
+class PatternSet(object):
+    """
+    List of patterns compiled once into a single alternation
+
+    Every pattern is wrapped into a named group, so one search finds the
+    leftmost match of all patterns and tells which pattern it was.
+    Patterns with numbered backreferences or patterns which can't be
+    combined are searched one by one instead.
+    """
+
+    _group_name = "_p{}"
+
+    def __init__(self, patterns, re_flags=0):
+        """
+        :param list patterns: list of regular expressions
+        :param re.flags re_flags: re flags for patterns
+        """
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        self.patterns = list(patterns)
+        self._combined = None
+        self._separated = None
+        if not any(re.search(r"\\[1-9]", exp) for exp in self.patterns):
+            alternation = "|".join(
+                "(?P<{}>{})".format(self._group_name.format(index), exp)
+                for index, exp in enumerate(self.patterns)
+            )
+            try:
+                self._combined = re.compile(alternation, flags=re_flags)
+            except re.error:
+                pass
+        if self._combined is None:
+            self._separated = [re.compile(exp, flags=re_flags) for exp in self.patterns]
+
+    def search(self, string, pos=0):
+        """
+        Search patterns in string starting from pos
+
+        :return: tuple (index of the pattern, match object) or None
+        """
+        if self._combined is not None:
+            match = self._combined.search(string, pos)
+            if match:
+                return int(match.lastgroup[2:]), match
+            return None
+        for index, exp in enumerate(self._separated):
+            match = exp.search(string, pos)
+            if match:
+                return index, match
+        return None
+
+
+class PatternMatcher(object):
+    """
+    Search a set of patterns in a stream of chunks
+
+    Only the new chunk plus a bounded overlap window of the previous data is
+    scanned on every feed, so the cost of reading a long output is linear
+    in its size. A match longer than the overlap window can be missed.
+    """
+
+    def __init__(self, patterns, re_flags=0, overlap=1024):
+        """
+        :param patterns: :class:`PatternSet` or list of regular expressions
+        :param re.flags re_flags: re flags for patterns, used only with list of regular expressions
+        :param int overlap: number of already scanned characters which are scanned again with the new chunk
+        """
+        if not isinstance(patterns, PatternSet):
+            patterns = PatternSet(patterns, re_flags)
+        self._patterns = patterns
+        self._overlap = overlap
+        self._window = ""
+        self._start = 0
+        self._offset = 0
+
+    def feed(self, chunk):
+        """
+        Search patterns in the new chunk
+
+        :param str chunk: data which was read from the channel
+        :return: :class:`PatternMatch` of the pattern found or None
+        """
+        window = self._window + chunk
+        found = self._patterns.search(window, self._start)
+        if found:
+            index, match = found
+            return PatternMatch(
+                index,
+                self._patterns.patterns[index],
+                self._offset + match.start(),
+                self._offset + match.end(),
+                match.group(),
+            )
+
+        if len(window) > self._overlap:
+            # Keep one character before the window, so "^" and look-behind
+            # assertions don't match at the cut
+            cut = len(window) - self._overlap - 1
+            self._offset += cut
+            window = window[cut:]
+            self._start = 1
+        self._window = window
+        return None
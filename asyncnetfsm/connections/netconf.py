@@ -0,0 +1,344 @@
+"""
+NETCONF Module, RPCs over the netconf SSH subsystem with incremental XML parsing
+"""
+import asyncio
+from xml.etree import ElementTree
+
+import asyncssh
+
+from asyncnetfsm.constants import MAX_BUFFER
+from asyncnetfsm.connections.timer import ReadTimer
+from asyncnetfsm.exceptions import AsyncnetfsmConnectionError, AsyncnetfsmNetconfError
+from asyncnetfsm.logger import logger
+
+NETCONF_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+BASE_1_0 = "urn:ietf:params:netconf:base:1.0"
+BASE_1_1 = "urn:ietf:params:netconf:base:1.1"
+
+
+class _EOMDecoder(object):
+    """Split the stream into messages ended with ]]>]]> (NETCONF 1.0 framing)"""
+
+    delimiter = b"]]>]]>"
+
+    def __init__(self):
+        self._pending = b""
+
+    @classmethod
+    def encode(cls, message):
+        """Frame the message"""
+        return message + cls.delimiter
+
+    def feed(self, data):
+        """
+        Decode the data of the stream
+
+        :return: tuple (payload, rest). rest is None while the message isn't complete,
+            otherwise it's the data after the end of the message
+        """
+        data = self._pending + data
+        self._pending = b""
+        end = data.find(self.delimiter)
+        if end != -1:
+            return data[:end], data[end + len(self.delimiter):]
+        # The end of data can be the beginning of the delimiter
+        keep = 0
+        for size in range(min(len(self.delimiter) - 1, len(data)), 0, -1):
+            if self.delimiter.startswith(data[-size:]):
+                keep = size
+                break
+        if keep:
+            self._pending = data[-keep:]
+            data = data[:-keep]
+        return data, None
+
+
+class _ChunkedDecoder(object):
+    """Split the stream into messages of chunks (NETCONF 1.1 framing, RFC 6242)"""
+
+    _max_header = 12
+
+    def __init__(self):
+        self._pending = b""
+        self._remaining = 0
+
+    @staticmethod
+    def encode(message):
+        """Frame the message as one chunk"""
+        return b"\n#%d\n" % len(message) + message + b"\n##\n"
+
+    def feed(self, data):
+        """
+        Decode the data of the stream
+
+        :return: tuple (payload, rest). rest is None while the message isn't complete,
+            otherwise it's the data after the end of the message
+        """
+        data = self._pending + data
+        self._pending = b""
+        payload = []
+        pos = 0
+        while pos < len(data):
+            if self._remaining:
+                end = min(pos + self._remaining, len(data))
+                payload.append(data[pos:end])
+                self._remaining -= end - pos
+                pos = end
+                continue
+            if len(data) - pos < 4:
+                break
+            if data.startswith(b"\n##\n", pos):
+                return b"".join(payload), data[pos + 4:]
+            if not data.startswith(b"\n#", pos):
+                raise ValueError("invalid chunk header: {!r}".format(data[pos:pos + self._max_header]))
+            end = data.find(b"\n", pos + 2)
+            if end == -1:
+                if len(data) - pos > self._max_header:
+                    raise ValueError("invalid chunk header: {!r}".format(data[pos:pos + self._max_header]))
+                break
+            self._remaining = int(data[pos + 2:end])
+            pos = end + 1
+        self._pending = data[pos:]
+        return b"".join(payload), None
+
+
+class NetconfSession(object):
+    """
+    NETCONF session in the netconf subsystem of an existing SSH connection
+
+    Replies are fed to XMLPullParser chunk by chunk as they arrive, so the reply never exists as one string.
+    :meth:`rpc` returns the parsed reply, :meth:`iter_rpc` yields matching elements and drops them after use.
+
+    Example::
+
+        async with await device.netconf() as netconf:
+            async for interface in netconf.iter_rpc("<get-interface-information/>", "physical-interface"):
+                print(ElementTree.tostring(interface, encoding="unicode"))
+    """
+
+    _capabilities = [BASE_1_0, BASE_1_1]
+    """Capabilities advertised in the client hello"""
+
+    def __init__(self, conn, host=None, timeout=30):
+        """
+        :param conn: :class:`asyncssh.SSHClientConnection`
+        :param str host: hostname of the device for logging and errors
+        :param float timeout: time in seconds without any data from the device
+        """
+        self._conn = conn
+        self._host = host
+        self._timeout = timeout
+        self._stdin = self._stdout = None
+        self._decoder = _EOMDecoder()
+        self._rest = b""
+        self._message_id = 0
+        self.server_capabilities = []
+        """Capabilities from the server hello"""
+
+        self.session_id = None
+        """Session id from the server hello"""
+
+    async def __aenter__(self):
+        """Async Context Manager"""
+        if self._stdin is None:
+            await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async Context Manager"""
+        await self.close()
+
+    @property
+    def framing(self):
+        """'chunked' after both sides advertised base:1.1, otherwise 'eom'"""
+        return "chunked" if isinstance(self._decoder, _ChunkedDecoder) else "eom"
+
+    async def connect(self):
+        """Open the netconf subsystem and exchange hello messages"""
+        logger.info("Host {}: NETCONF: Opening netconf subsystem".format(self._host))
+        try:
+            self._stdin, self._stdout, _ = await self._conn.open_session(subsystem="netconf", encoding=None)
+        except asyncssh.ChannelOpenError as e:
+            raise AsyncnetfsmConnectionError(self._host, e.code, e.reason)
+        capabilities = "".join(
+            "<capability>{}</capability>".format(capability) for capability in type(self)._capabilities
+        )
+        self._stdin.write(self._decoder.encode(
+            '<?xml version="1.0" encoding="UTF-8"?><hello xmlns="{}"><capabilities>{}</capabilities></hello>'.format(
+                NETCONF_NS, capabilities
+            ).encode()
+        ))
+        hello = await self._read_reply()
+        self.server_capabilities = [element.text.strip() for element in hello.iter() if _local_name(element) ==
+                                    "capability" and element.text]
+        self.session_id = hello.findtext("{%s}session-id" % NETCONF_NS)
+        if BASE_1_1 in self.server_capabilities and BASE_1_1 in type(self)._capabilities:
+            self._decoder = _ChunkedDecoder()
+        logger.debug("Host {}: NETCONF: Session {} uses {} framing".format(self._host, self.session_id, self.framing))
+
+    async def rpc(self, request, timeout=None):
+        """
+        Send RPC and return parsed reply
+
+        :param request: RPC operation as XML string or :class:`Element <xml.etree.ElementTree.Element>`,
+            for example "<get-configuration/>"
+        :param float timeout: total time in seconds for the reply. Default is no limit
+        :return: :class:`Element <xml.etree.ElementTree.Element>` of rpc-reply
+        """
+        self._send_rpc(request)
+        reply = await self._read_reply(timeout=timeout)
+        self._check_errors(reply)
+        return reply
+
+    async def iter_rpc(self, request, tag, timeout=None):
+        """
+        Send RPC and yield reply elements with the tag as soon as they are parsed
+
+        Yielded elements are cleared and removed from their parent after use,
+        so memory doesn't grow with the size of the reply. The rest of the reply is read
+        when the iterator is closed early, so the next RPC starts with its own reply.
+        A loop left by break doesn't close the iterator, close it explicitly::
+
+            elements = netconf.iter_rpc("<get-interface-information/>", "physical-interface")
+            try:
+                async for interface in elements:
+                    break
+            finally:
+                await elements.aclose()
+
+        :param request: RPC operation as XML string or :class:`Element <xml.etree.ElementTree.Element>`
+        :param str tag: local name or {namespace}name of the elements
+        :param float timeout: total time in seconds for the reply. Default is no limit
+        :return: async iterator over :class:`Element <xml.etree.ElementTree.Element>`
+        """
+        self._send_rpc(request)
+        errors = []
+        root = None
+        # Open elements, the parent of the ended element is the last one
+        parents = []
+        events = self._read_events(timeout, events=("start", "end"))
+        complete = False
+        try:
+            async for event, element in events:
+                if event == "start":
+                    parents.append(element)
+                    continue
+                parents.pop()
+                root = element
+                name = _local_name(element)
+                if element.tag == tag or name == tag:
+                    yield element
+                    element.clear()
+                    if parents:
+                        parents[-1].remove(element)
+                elif name == "rpc-error":
+                    errors.append(element)
+            complete = True
+        finally:
+            # The iterator was closed before the end of the reply, the rest of the message belongs to it
+            if not complete:
+                async for event, element in events:
+                    if event == "end":
+                        element.clear()
+        if root is not None:
+            self._check_errors(root, errors)
+
+    async def close(self):
+        """Send close-session and close the channel"""
+        if self._stdin is None:
+            return
+        try:
+            await asyncio.wait_for(self.rpc("<close-session/>"), self._timeout)
+        except Exception as e:
+            logger.debug("Host {}: NETCONF: close-session failed: {}".format(self._host, repr(e)))
+        self._stdin.close()
+        self._stdin = self._stdout = None
+
+    def _send_rpc(self, request):
+        """Wrap the operation into rpc element and send it"""
+        if isinstance(request, ElementTree.Element):
+            request = ElementTree.tostring(request, encoding="unicode")
+        self._message_id += 1
+        message = '<rpc message-id="{}" xmlns="{}">{}</rpc>'.format(self._message_id, NETCONF_NS, request)
+        logger.debug("Host {}: NETCONF: Sending rpc: {}".format(self._host, message))
+        self._stdin.write(self._decoder.encode(message.encode()))
+
+    async def _read_reply(self, timeout=None):
+        """Read one message and return its root element"""
+        root = None
+        async for _, element in self._read_events(timeout):
+            root = element
+        if root is None:
+            raise AsyncnetfsmNetconfError(self._host, None, "empty reply")
+        return root
+
+    async def _read_events(self, timeout=None, events=("end",)):
+        """
+        Read one message feeding XMLPullParser with every piece of payload
+
+        Yields tuples (event, element) of the parser, the last end event is the end of the root element.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        # The limits cover only the reading, not the time of the consumer between the events
+        parser = ElementTree.XMLPullParser(events=events)
+        data = self._rest
+        self._rest = b""
+        started = False
+        while True:
+            try:
+                payload, rest = self._decoder.feed(data)
+            except ValueError as e:
+                raise AsyncnetfsmNetconfError(self._host, None, str(e))
+            if not started:
+                # Whitespace between messages must not precede XML declaration
+                payload = payload.lstrip()
+                started = bool(payload)
+            try:
+                parser.feed(payload)
+                parsed = list(parser.read_events())
+            except ElementTree.ParseError as e:
+                raise AsyncnetfsmNetconfError(self._host, None, "invalid reply: {}".format(e))
+            for event in parsed:
+                yield event
+            if rest is not None:
+                self._rest = rest
+                break
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                with ReadTimer(timeout=remaining, idle_timeout=self._timeout):
+                    data = await self._stdout.read(MAX_BUFFER)
+            except asyncio.TimeoutError:
+                raise TimeoutError(self._host)
+            if not data:
+                raise AsyncnetfsmConnectionError(self._host, None, "netconf session closed by remote host")
+        try:
+            parser.close()
+        except ElementTree.ParseError as e:
+            raise AsyncnetfsmNetconfError(self._host, None, "invalid reply: {}".format(e))
+        for event in parser.read_events():
+            yield event
+
+    def _check_errors(self, reply, errors=None):
+        """Raise AsyncnetfsmNetconfError for rpc-error elements with error severity"""
+        if errors is None:
+            errors = [element for element in reply.iter() if _local_name(element) == "rpc-error"]
+        for error in errors:
+            severity = _find_text(error, "error-severity", "error").strip()
+            if severity == "error":
+                tag = _find_text(error, "error-tag")
+                message = _find_text(error, "error-message") or tag or "rpc-error"
+                raise AsyncnetfsmNetconfError(self._host, tag, message.strip())
+
+
+def _local_name(element):
+    """Return the tag of the element without namespace"""
+    return element.tag.rpartition("}")[2]
+
+
+def _find_text(element, name, default=None):
+    """Return the text of the first child with the local name in any namespace"""
+    for child in element:
+        if _local_name(child) == name:
+            return child.text or ""
+    return default
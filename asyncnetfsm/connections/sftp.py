@@ -0,0 +1,368 @@
+"""
+SFTP Module, file transfer over the SSH connection with pipelined block requests and resume
+"""
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+
+import asyncssh
+
+from asyncnetfsm.exceptions import AsyncnetfsmConnectionError, AsyncnetfsmTransferError
+from asyncnetfsm.logger import logger
+from asyncnetfsm.utils import LRUCache
+
+SOURCE_MD5_CACHE_SIZE = 32
+"""Number of MD5 digests of uploaded files kept in the process-wide cache"""
+
+_source_md5_cache = LRUCache(SOURCE_MD5_CACHE_SIZE)
+_source_md5_pending = {}
+
+
+class TransferResult(object):
+    """Result of the file transfer"""
+
+    def __init__(self, source, destination, size, transferred, resumed_from, elapsed, md5):
+        self.source = source
+        """Path of the copied file"""
+
+        self.destination = destination
+        """Path of the new file"""
+
+        self.size = size
+        """Size of the file in bytes"""
+
+        self.transferred = transferred
+        """Number of bytes sent over the connection, less than size after resume"""
+
+        self.resumed_from = resumed_from
+        """Offset where the transfer started, 0 if the file was copied from the beginning"""
+
+        self.elapsed = elapsed
+        """Time of the transfer in seconds"""
+
+        self.md5 = md5
+        """MD5 hex digest of the file"""
+
+    @property
+    def rate(self):
+        """Bytes per second sent over the connection"""
+        return self.transferred / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return "TransferResult(source={!r}, destination={!r}, size={}, transferred={})".format(
+            self.source, self.destination, self.size, self.transferred
+        )
+
+
+class SFTPTransfer(object):
+    """
+    File transfer in SFTP channel of an existing SSH connection
+
+    The file is split into blocks and up to max_requests block requests are in flight at once,
+    so the throughput isn't limited by the round trip time. Blocks are written at their offsets.
+    If the transfer fails, the destination is truncated to the blocks copied without gaps,
+    and the next transfer with resume continues from its size. Before resuming, the last block
+    of the existing destination is compared with the source, a different file is copied again.
+    Earlier blocks aren't compared, so the resumed file is always checked by MD5 of the whole file.
+    Local file is read and written in the executor.
+    """
+
+    def __init__(self, conn, host=None, block_size=65536, max_requests=16, limiter=None):
+        """
+        :param conn: :class:`asyncssh.SSHClientConnection`
+        :param str host: hostname of the device for logging and errors
+        :param int block_size: size of one read or write request in bytes
+        :param int max_requests: number of block requests in flight
+        :param limiter: :class:`RateLimiter <asyncnetfsm.RateLimiter>` in bytes per second for capping bandwidth,
+            it can be shared by many transfers
+        """
+        if block_size < 1 or max_requests < 1:
+            raise ValueError("block_size and max_requests must be positive")
+        self._conn = conn
+        self._host = host
+        self._block_size = block_size
+        self._max_requests = max_requests
+        self._limiter = limiter
+
+    async def get(self, remote_path, local_path, resume=False, md5=None):
+        """
+        Download remote file
+
+        :param str remote_path: path of the file on the device, for example "bootflash:image.bin"
+        :param str local_path: path of the local file
+        :param bool resume: True for continuing the download from the size of the existing local file,
+            which was left by the interrupted download of the same file. It requires md5,
+            only the last block of the existing file is compared before resuming
+        :param str md5: expected MD5 hex digest of the file, the mismatching file is removed
+        :return: :class:`TransferResult`
+        """
+        if resume and md5 is None:
+            raise ValueError("resume requires md5 for verifying the resumed file")
+        logger.info("Host {}: SFTP: Downloading {} to {}".format(self._host, remote_path, local_path))
+        started = time.monotonic()
+        loop = asyncio.get_event_loop()
+        async with await self._start_client() as sftp:
+            try:
+                remote = await sftp.open(remote_path, "rb", encoding=None, block_size=self._block_size)
+            except asyncssh.SFTPError as e:
+                raise AsyncnetfsmTransferError(self._host, e.code, "{}: {}".format(remote_path, e.reason))
+            async with remote:
+                size = (await remote.stat()).size
+                start = os.path.getsize(local_path) if resume and os.path.isfile(local_path) else 0
+                if start > size:
+                    start = 0
+                read = functools.partial(self._read_block, remote)
+                local = await _LocalFile.open(local_path, "r+b" if start else "wb")
+                try:
+                    if start:
+                        start = await self._resume_offset(read, local.read, start)
+                    await self._copy(read, local.write, local.truncate, start, size)
+                finally:
+                    await local.close()
+        digest = await loop.run_in_executor(None, _file_md5, local_path)
+        if md5 is not None and digest != md5.lower():
+            os.remove(local_path)
+            raise AsyncnetfsmTransferError(
+                self._host, None, "MD5 of {} is {}, expected {}".format(remote_path, digest, md5)
+            )
+        return self._result(remote_path, local_path, size, start, started, digest)
+
+    async def put(self, local_path, remote_path, resume=False, md5=None, verify=None):
+        """
+        Upload local file
+
+        :param str local_path: path of the local file
+        :param str remote_path: path of the file on the device, for example "bootflash:image.bin"
+        :param bool resume: True for continuing the upload from the size of the existing remote file,
+            which was left by the interrupted upload of the same file. It requires verify,
+            only the last block of the existing file is compared before resuming
+        :param str md5: expected MD5 hex digest of the local file, it's checked before the upload
+        :param verify: coroutine function returning MD5 hex digest of the remote file computed by the device,
+            for example :meth:`BaseDevice.file_md5 <asyncnetfsm.vendors.BaseDevice.file_md5>`.
+            The mismatching remote file is removed
+        :return: :class:`TransferResult`
+        """
+        if resume and verify is None:
+            raise ValueError("resume requires verify for checking the resumed file")
+        logger.info("Host {}: SFTP: Uploading {} to {}".format(self._host, local_path, remote_path))
+        started = time.monotonic()
+        digest = await _source_md5(local_path)
+        if md5 is not None and digest != md5.lower():
+            raise AsyncnetfsmTransferError(
+                self._host, None, "MD5 of {} is {}, expected {}".format(local_path, digest, md5)
+            )
+        size = os.path.getsize(local_path)
+        local = await _LocalFile.open(local_path, "rb")
+        try:
+            async with await self._start_client() as sftp:
+                start = 0
+                if resume:
+                    try:
+                        start = (await sftp.stat(remote_path)).size or 0
+                    except asyncssh.SFTPError:
+                        start = 0
+                    if start > size:
+                        start = 0
+                if start:
+
+                    async def read_remote(offset, length):
+                        async with await sftp.open(remote_path, "rb", encoding=None) as existing:
+                            return await self._read_block(existing, offset, length)
+
+                    start = await self._resume_offset(local.read, read_remote, start)
+                try:
+                    remote = await sftp.open(
+                        remote_path, "r+b" if start else "wb", encoding=None, block_size=self._block_size
+                    )
+                except asyncssh.SFTPError as e:
+                    raise AsyncnetfsmTransferError(self._host, e.code, "{}: {}".format(remote_path, e.reason))
+                async with remote:
+
+                    async def write(offset, data):
+                        await remote.write(data, offset)
+
+                    async def truncate(length):
+                        await sftp.truncate(remote_path, length)
+
+                    await self._copy(local.read, write, truncate, start, size)
+                if verify is not None:
+                    remote_md5 = await verify(remote_path)
+                    if remote_md5 != digest:
+                        # The file must not be resumed by the next upload
+                        try:
+                            await sftp.remove(remote_path)
+                        except asyncssh.SFTPError as e:
+                            logger.debug("Host {}: SFTP: Removing failed: {}".format(self._host, repr(e)))
+                        raise AsyncnetfsmTransferError(
+                            self._host, None, "MD5 of {} is {}, expected {}".format(remote_path, remote_md5, digest)
+                        )
+        finally:
+            await local.close()
+        return self._result(local_path, remote_path, size, start, started, digest)
+
+    async def _start_client(self):
+        """Open SFTP channel"""
+        try:
+            return await self._conn.start_sftp_client()
+        except (asyncssh.ChannelOpenError, asyncssh.SFTPError) as e:
+            raise AsyncnetfsmConnectionError(self._host, e.code, e.reason)
+
+    async def _resume_offset(self, read_source, read_destination, start):
+        """
+        Return the offset for continuing the transfer from the existing destination of start bytes
+
+        The last block before start is compared in the source and the destination, the existing file
+        which isn't the beginning of the source is copied again from the beginning.
+        """
+        length = min(self._block_size, start)
+        offset = start - length
+        try:
+            same = await read_source(offset, length) == await read_destination(offset, length)
+        except (OSError, asyncssh.SFTPError) as e:
+            logger.debug("Host {}: SFTP: Comparing existing file failed: {}".format(self._host, repr(e)))
+            same = False
+        if not same:
+            logger.info("Host {}: SFTP: Existing file differs from the source, copying from the beginning".format(
+                self._host)
+            )
+            return 0
+        return start
+
+    async def _copy(self, read, write, truncate, start, size):
+        """
+        Copy blocks from start to size with max_requests workers
+
+        On failure the destination is truncated to the blocks copied without gaps.
+        """
+        block_size = self._block_size
+        offsets = iter(range(start, size, block_size))
+        copied = set()
+
+        async def worker():
+            for offset in offsets:
+                length = min(block_size, size - offset)
+                if self._limiter is not None:
+                    await self._limiter.acquire(length)
+                data = await read(offset, length)
+                if len(data) != length:
+                    raise AsyncnetfsmTransferError(
+                        self._host, None, "file was changed during transfer, short read at {}".format(offset)
+                    )
+                await write(offset, data)
+                copied.add(offset)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self._max_requests)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            complete = start
+            while complete in copied:
+                complete += block_size
+            complete = min(complete, size)
+            logger.info("Host {}: SFTP: Transfer failed, {} bytes are kept for resume".format(self._host, complete))
+            try:
+                await asyncio.wait_for(truncate(complete), 5)
+            except Exception as e:
+                logger.debug("Host {}: SFTP: Truncating failed: {}".format(self._host, repr(e)))
+            raise
+
+    async def _read_block(self, remote, offset, length):
+        """Read the block, the server can return less data than requested"""
+        data = await remote.read(length, offset)
+        while 0 < len(data) < length:
+            more = await remote.read(length - len(data), offset + len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    def _result(self, source, destination, size, start, started, digest):
+        """Make TransferResult and log it"""
+        result = TransferResult(source, destination, size, size - start, start, time.monotonic() - started, digest)
+        logger.info("Host {}: SFTP: Copied {} bytes in {:.2f}s, resumed from {}".format(
+            self._host, result.transferred, result.elapsed, start)
+        )
+        return result
+
+
+async def _source_md5(path):
+    """
+    Return MD5 hex digest of the uploaded file
+
+    The digest is computed once in the executor for all uploads of the unchanged file,
+    uploads started at the same time wait for the same computation. Only computed digests
+    are cached, failed computation is repeated by the next upload.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _source_md5_cache.get(key)
+    if digest is not None:
+        return digest
+    loop = asyncio.get_event_loop()
+    # Futures belong to the loop, uploads in other loops compute their own
+    pending_key = (loop, key)
+    future = _source_md5_pending.get(pending_key)
+    if future is None:
+        future = loop.run_in_executor(None, _file_md5, path)
+        _source_md5_pending[pending_key] = future
+        future.add_done_callback(functools.partial(_source_md5_done, pending_key))
+    # Cancelled upload doesn't cancel the computation for other uploads
+    return await asyncio.shield(future)
+
+
+def _source_md5_done(pending_key, future):
+    """Move the computed digest to the cache"""
+    del _source_md5_pending[pending_key]
+    if not future.cancelled() and future.exception() is None:
+        _source_md5_cache.set(pending_key[1], future.result())
+
+
+class _LocalFile(object):
+    """Local file read and written at offsets in the executor, so the disk doesn't block the event loop"""
+
+    def __init__(self, file):
+        self._file = file
+        self._lock = threading.Lock()
+
+    @classmethod
+    async def open(cls, path, mode):
+        """Open the file in the executor"""
+        return cls(await asyncio.get_event_loop().run_in_executor(None, open, path, mode))
+
+    async def read(self, offset, length):
+        return await asyncio.get_event_loop().run_in_executor(None, self._read, offset, length)
+
+    async def write(self, offset, data):
+        await asyncio.get_event_loop().run_in_executor(None, self._write, offset, data)
+
+    async def truncate(self, length):
+        await asyncio.get_event_loop().run_in_executor(None, self._file.truncate, length)
+
+    async def close(self):
+        await asyncio.get_event_loop().run_in_executor(None, self._file.close)
+
+    def _read(self, offset, length):
+        # Workers of the transfer share the position of the file
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def _write(self, offset, data):
+        with self._lock:
+            self._file.seek(offset)
+            self._file.write(data)
+
+
+def _file_md5(path):
+    """Return MD5 hex digest of the local file"""
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -4,7 +4,7 @@ SSH Connection Module
 import asyncio
 import asyncssh
 from asyncnetfsm.constants import TERM_LEN, TERM_WID, TERM_TYPE
-from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError
+from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError, AsyncnetfsmConnectionError
 from asyncnetfsm.connections.base import BaseConnection
 
 
@@ -30,7 +30,9 @@ class SSHConnection(BaseConnection):
                  encryption_algs=(),
                  mac_algs=(),
                  compression_algs=(),
-                 signature_algs=()):
+                 signature_algs=(),
+                 keepalive_interval=None,
+                 keepalive_count_max=3):
         super().__init__()
         if host:
             self._host = host
@@ -64,6 +66,10 @@ class SSHConnection(BaseConnection):
             "compression_algs": compression_algs,
             "signature_algs": signature_algs
         }
+        if keepalive_interval:
+            # The connection is closed when keepalive_count_max keepalives in a row are unanswered
+            connect_params_dict["keepalive_interval"] = keepalive_interval
+            connect_params_dict["keepalive_count_max"] = keepalive_count_max
 
         if pattern is not None:
             self._pattern = pattern
@@ -71,6 +77,9 @@ class SSHConnection(BaseConnection):
         self._conn_dict = connect_params_dict
         self._timeout = timeout
 
+        self._owns_connection = True
+        """False for sessions opened on the SSH connection of another SSHConnection"""
+
     async def connect(self):
         """ Etablish SSH connection """
         self._logger.info("Host {}: SSH: Establishing SSH connection on port {}".format(self._host, self._port))
@@ -85,20 +94,51 @@ class SSHConnection(BaseConnection):
 
         await self._start_session()
 
+    async def open_session(self):
+        """
+        Open new interactive session on the same SSH connection
+
+        The new SSHConnection doesn't own the SSH connection, closing it closes only its session
+
+        :return: :class:`SSHConnection` with started session
+        """
+        self._logger.info("Host {}: SSH: Opening new session on the connection".format(self._host))
+        session = SSHConnection(host=self._host, port=self._port, timeout=self._timeout, loop=self._loop)
+        session._conn = self._conn
+        session._owns_connection = False
+        await session._start_session()
+        return session
+
     async def disconnect(self):
         """ Gracefully close the SSH connection """
         self._logger.info("Host {}: SSH: Disconnecting".format(self._host))
-        self._logger.info("Host {}: SSH: Disconnecting".format(self._host))
-        await self._cleanup()
-        self._conn.close()
-        await self._conn.wait_closed()
+        await self.close()
 
     def send(self, cmd):
+        if self.is_closed():
+            raise AsyncnetfsmConnectionError(self._host, None, "connection is closed")
+        if self._hold(cmd):
+            return
+        self.reset_prompt()
+        self.last_activity = self._loop.time()
         self._stdin.write(cmd)
 
     def read(self):
+        if self._waits_for_probe():
+            return self._read_after_probe()
         return self._stdout.read(self._MAX_BUFFER)
 
+    def is_closed(self):
+        """ Check the SSH connection or the session was closed """
+        return self._conn is None or self._conn.is_closed() or self._stdin.channel.is_closing()
+
+    def abort(self):
+        """ Close the session, and the SSH connection if it's owned, without waiting """
+        if self._owns_connection:
+            self._conn.close()
+        else:
+            self._stdin.close()
+
     def __check_session(self):
         """ check session was opened """
         if not self._stdin:
@@ -117,7 +157,11 @@ class SSHConnection(BaseConnection):
         pass
 
     async def close(self):
-        """ Close Connection """
+        """ Close Connection. Only the session is closed if the SSH connection is shared """
         await self._cleanup()
+        if not self._owns_connection:
+            self._stdin.close()
+            await self._stdin.channel.wait_closed()
+            return
         self._conn.close()
         await self._conn.wait_closed()
@@ -0,0 +1,115 @@
+"""
+SSH Exec Connection Module, every command runs in its own exec channel without PTY
+"""
+import asyncio
+import asyncssh
+from asyncnetfsm.exceptions import AsyncnetfsmConnectionError
+from asyncnetfsm.connections.buffer import OutputBuffer
+from asyncnetfsm.connections.ssh import SSHConnection
+from asyncnetfsm.connections.timer import ReadTimer
+
+
+class ExecResult(object):
+    """Result of the command executed in the exec channel"""
+
+    def __init__(self, command, stdout, stderr, exit_status):
+        self.command = command
+        """Executed command"""
+
+        self.stdout = stdout
+        """Standard output of the command"""
+
+        self.stderr = stderr
+        """Standard error of the command"""
+
+        self.exit_status = exit_status
+        """Exit status of the command, None if the server didn't send it"""
+
+    @property
+    def ok(self):
+        """True if the command exited with zero status"""
+        return self.exit_status == 0
+
+    def __repr__(self):
+        return "ExecResult(command={!r}, exit_status={})".format(self.command, self.exit_status)
+
+
+class SSHExecConnection(SSHConnection):
+    """
+    SSH connection without interactive session
+
+    The output of the command is complete when its channel is closed, so there is no prompt
+    to search, no echo and no paging. Several commands can run on the connection at once.
+    """
+
+    async def _start_session(self):
+        """ Exec connection has no interactive session """
+        self._logger.info("Host {}: SSH: Exec mode, interactive session isn't started".format(self._host))
+
+    async def open_session(self):
+        """ Commands of the exec connection run in own channels, so the connection is shared as is """
+        return self
+
+    def send(self, cmd):
+        raise ValueError("SSH exec connection has no interactive session, use exec_command or send_commands")
+
+    def read(self):
+        raise ValueError("SSH exec connection has no interactive session, use exec_command or send_commands")
+
+    def is_closed(self):
+        """ Check the SSH connection was closed """
+        return self._conn is None or self._conn.is_closed()
+
+    def abort(self):
+        """ Close the SSH connection without waiting """
+        self._conn.close()
+
+    async def close(self):
+        """ Close the SSH connection """
+        if self._conn is not None:
+            self._conn.close()
+            await self._conn.wait_closed()
+
+    async def run(self, command, timeout=None, idle_timeout=None):
+        """
+        Execute command in new exec channel and read its output until the channel is closed
+
+        :param str command: command for executing
+        :param float timeout: total time in seconds for the command. Default is no limit
+        :param float idle_timeout: time in seconds without any output. Default is connection timeout
+        :return: :class:`ExecResult`
+        """
+        if idle_timeout is None:
+            idle_timeout = self._timeout
+        self._logger.debug("Host {}: SSH: Exec command: {}".format(self._host, repr(command)))
+        try:
+            process = await self._conn.create_process(command)
+        except asyncssh.ChannelOpenError as e:
+            raise AsyncnetfsmConnectionError(self._host, e.code, e.reason)
+        except (asyncssh.Error, OSError) as e:
+            raise AsyncnetfsmConnectionError(self._host, None, str(e) or repr(e))
+
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        timer = ReadTimer(timeout=timeout, idle_timeout=idle_timeout)
+
+        async def collect(stream, output):
+            while True:
+                chunk = await stream.read(self._MAX_BUFFER)
+                if not chunk:
+                    return
+                timer.touch()
+                output.append(chunk)
+
+        try:
+            with timer:
+                await asyncio.gather(collect(process.stdout, stdout), collect(process.stderr, stderr))
+                await process.wait_closed()
+        except asyncio.TimeoutError:
+            process.close()
+            self._set_read_stats(timer, timer.expired)
+            raise TimeoutError(self._host)
+        self._set_read_stats(timer, "eof")
+        result = ExecResult(command, stdout.getvalue(), stderr.getvalue(), process.exit_status)
+        self._logger.debug("Host {}: SSH: Exec result: {}".format(self._host, result))
+        return result
@@ -2,7 +2,7 @@
 Telnet Connection Module
 """
 import asyncio
-from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError
+from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError, AsyncnetfsmConnectionError
 from asyncnetfsm.connections.base import BaseConnection
 
 
@@ -71,11 +71,27 @@ class TelnetConnection(BaseConnection):
         await self._conn.wait_closed()
 
     def send(self, cmd):
+        if self.is_closed():
+            raise AsyncnetfsmConnectionError(self._host, None, "connection is closed")
+        if self._hold(cmd):
+            return
+        self.reset_prompt()
+        self.last_activity = self._loop.time()
         self._stdin.write(cmd.encode())
 
     async def read(self):
+        if self._waits_for_probe():
+            return await self._read_after_probe()
         output = await self._stdout.read(self._MAX_BUFFER)
         return output.decode(errors='ignore')
 
+    def is_closed(self):
+        """ Check the TCP connection was closed """
+        return self._stdin is None or self._stdin.is_closing() or self._stdout.at_eof()
+
+    def abort(self):
+        """ Close the TCP connection without waiting """
+        self._stdin.close()
+
     async def close(self):
         pass
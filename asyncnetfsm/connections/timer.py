@@ -0,0 +1,119 @@
+"""
+Read Timer Module, limits the total and the idle time of reading from the channel
+"""
+import asyncio
+
+try:
+    current_task = asyncio.current_task
+except AttributeError:
+    # Python 3.6
+    current_task = asyncio.Task.current_task
+
+
+class ReadStats(object):
+    """Statistics of the gaps between chunks during one read call"""
+
+    def __init__(self, chunks, elapsed, max_gap, mean_gap, ended_by):
+        self.chunks = chunks
+        """Number of chunks read from the channel"""
+
+        self.elapsed = elapsed
+        """Duration of the call in seconds"""
+
+        self.max_gap = max_gap
+        """Longest time in seconds between two chunks (or before the first one)"""
+
+        self.mean_gap = mean_gap
+        """Average time in seconds between two chunks (or before the first one)"""
+
+        self.ended_by = ended_by
+        """Reason of the end of reading: 'pattern', 'idle', 'timeout' or 'eof'"""
+
+    def __repr__(self):
+        return "ReadStats(chunks={}, elapsed={:.3f}, max_gap={:.3f}, mean_gap={:.3f}, ended_by={!r})".format(
+            self.chunks, self.elapsed, self.max_gap, self.mean_gap, self.ended_by
+        )
+
+
+class ReadTimer(object):
+    """
+    Context manager which limits the time of reading from the channel
+
+    The total deadline and the idle timeout share one timer handle per call.
+    The handle is rescheduled only when it fires, not on every chunk. When a limit is
+    exceeded the waiting task is cancelled and asyncio.TimeoutError is raised on exit.
+    """
+
+    def __init__(self, timeout=None, idle_timeout=None):
+        """
+        :param float timeout: total time in seconds for the whole call. None for no limit
+        :param float idle_timeout: time in seconds without any data from the channel. None for no limit
+        """
+        self._timeout = timeout
+        self._idle_timeout = idle_timeout
+        self._loop = None
+        self._task = None
+        self._handle = None
+        self._deadline = None
+        self._last_read = None
+        self._started = None
+        self._chunks = 0
+        self._max_gap = 0.0
+        self.expired = None
+        """Name of the exceeded limit: 'timeout' or 'idle'"""
+
+    def __enter__(self):
+        self._loop = asyncio.get_event_loop()
+        self._task = current_task()
+        now = self._loop.time()
+        self._started = self._last_read = now
+        if self._timeout is not None:
+            self._deadline = now + self._timeout
+        self._schedule()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self.expired and exc_type is asyncio.CancelledError:
+            if hasattr(self._task, "uncancel"):
+                self._task.uncancel()
+            raise asyncio.TimeoutError(self.expired)
+        return False
+
+    def touch(self):
+        """Register new data from the channel"""
+        now = self._loop.time()
+        gap = now - self._last_read
+        if gap > self._max_gap:
+            self._max_gap = gap
+        self._chunks += 1
+        self._last_read = now
+
+    def stats(self, ended_by):
+        """Return statistics of the gaps between chunks"""
+        mean_gap = (self._last_read - self._started) / self._chunks if self._chunks else 0.0
+        elapsed = self._loop.time() - self._started
+        return ReadStats(self._chunks, elapsed, self._max_gap, mean_gap, ended_by)
+
+    def _schedule(self):
+        when = self._deadline
+        if self._idle_timeout is not None:
+            idle_deadline = self._last_read + self._idle_timeout
+            if when is None or idle_deadline < when:
+                when = idle_deadline
+        if when is not None:
+            self._handle = self._loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._handle = None
+        now = self._loop.time()
+        if self._deadline is not None and now >= self._deadline:
+            self.expired = "timeout"
+        elif self._idle_timeout is not None and now >= self._last_read + self._idle_timeout:
+            self.expired = "idle"
+        else:
+            self._schedule()
+            return
+        self._task.cancel()
@@ -6,6 +6,17 @@ TERM_WID = 2147483647
 TERM_LEN = 2147483647
 TERM_TYPE = 'vt100'
 
+# Maximum size of data for a single read from the channel
+MAX_BUFFER = 65535
+
+# Modes of the CLI session, classified by the prompt
+MODE_USER = "user"
+MODE_PRIVILEGED = "privileged"
+MODE_CONFIG = "config"
+MODE_SUB_CONFIG = "sub-config"
+MODE_SYSTEM_VIEW = "system-view"
+MODE_SHELL = "shell"
+
 # ansi codes
 CODE_SAVE_CURSOR = chr(27) + r"7"
 CODE_SCROLL_SCREEN = chr(27) + r"\[r"
@@ -23,3 +23,23 @@ class AsyncnetfsmCommitError(BaseAsyncnetfsmError):
 
 class AsyncnetfsmConnectionError(BaseAsyncnetfsmError):
     _error_name = 'connection'
+
+
+class AsyncnetfsmConfigError(BaseAsyncnetfsmError):
+    _error_name = 'config'
+
+    def __init__(self, ip_address, code, reason, command=None, output=""):
+        super().__init__(ip_address, code, reason)
+        self.command = command
+        """Configuration line which was rejected by the device"""
+
+        self.output = output
+        """Output of the configuration lines sent until the push stopped"""
+
+
+class AsyncnetfsmNetconfError(BaseAsyncnetfsmError):
+    _error_name = 'netconf'
+
+
+class AsyncnetfsmTransferError(BaseAsyncnetfsmError):
+    _error_name = 'transfer'
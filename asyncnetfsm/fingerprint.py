@@ -0,0 +1,123 @@
+"""
+Fingerprint Module, cache of the prompts discovered during session preparation
+"""
+import json
+import os
+import tempfile
+
+
+class Fingerprint(object):
+    """
+    Session information of the device discovered by the full session preparation
+
+    Paging and terminal width are settings of the session, not of the device,
+    so they aren't cached and their commands are sent on every connect.
+    """
+
+    def __init__(self, prompt, base_prompt=None, base_pattern=None, mode=None):
+        self.prompt = prompt
+        """Prompt printed by the device after login, with the terminator"""
+
+        self.base_prompt = base_prompt
+        """Base prompt derived from the prompt by the vendor class"""
+
+        self.base_pattern = base_pattern
+        """Base pattern derived from the prompt by the vendor class"""
+
+        self.mode = mode
+        """Mode of the session after login, one of the MODE constants, it tells if enable or cli is needed"""
+
+    def to_dict(self):
+        """Return dictionary for JSON serialization"""
+        return {"prompt": self.prompt, "base_prompt": self.base_prompt, "base_pattern": self.base_pattern,
+                "mode": self.mode}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create Fingerprint from the dictionary made by :meth:`to_dict`"""
+        return cls(data["prompt"], data.get("base_prompt"), data.get("base_pattern"), data.get("mode"))
+
+    def __eq__(self, other):
+        return isinstance(other, Fingerprint) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "Fingerprint(prompt={!r}, mode={!r})".format(self.prompt, self.mode)
+
+
+class FingerprintCache(object):
+    """
+    Cache of device fingerprints keyed by (host, port, username, device_type)
+
+    With path the cache is loaded from the JSON file and :meth:`save` writes it back.
+    Without path the cache lives only in memory.
+
+    Example::
+
+        cache = FingerprintCache("~/.asyncnetfsm_fingerprints.json")
+        async with asyncnetfsm.create(fingerprint_cache=cache, **params) as device:
+            ...
+        cache.save()
+    """
+
+    def __init__(self, path=None, autosave=False):
+        """
+        :param str path: JSON file for keeping the cache between runs
+        :param bool autosave: True for writing the file after every change
+        """
+        self._path = os.path.expanduser(path) if path else None
+        self._autosave = autosave
+        self._fingerprints = {}
+        self._changed = False
+        if self._path and os.path.isfile(self._path):
+            self.load()
+
+    @staticmethod
+    def key(host, port, username, device_type):
+        """Return key of the device"""
+        return "{}:{}:{}:{}".format(host, port, username, device_type)
+
+    def get(self, key):
+        """Return :class:`Fingerprint` of the device or None"""
+        return self._fingerprints.get(key)
+
+    def set(self, key, fingerprint):
+        """Save :class:`Fingerprint` of the device"""
+        if self._fingerprints.get(key) == fingerprint:
+            return
+        self._fingerprints[key] = fingerprint
+        self._changed = True
+        if self._autosave:
+            self.save()
+
+    def discard(self, key):
+        """Remove fingerprint of the device"""
+        if self._fingerprints.pop(key, None) is not None:
+            self._changed = True
+            if self._autosave:
+                self.save()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def load(self):
+        """Read the cache from the file"""
+        with open(self._path) as cache_file:
+            data = json.load(cache_file)
+        self._fingerprints = {key: Fingerprint.from_dict(value) for key, value in data.items()}
+        self._changed = False
+
+    def save(self):
+        """Write the cache to the file if it was changed. The file is replaced atomically"""
+        if not self._path or not self._changed:
+            return
+        data = {key: value.to_dict() for key, value in self._fingerprints.items()}
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".fingerprints")
+        try:
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(data, cache_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._changed = False
@@ -0,0 +1,247 @@
+"""
+Fleet Module, running a job on many devices with bounded concurrency
+"""
+import asyncio
+import time
+
+from asyncnetfsm.dispatcher import create
+from asyncnetfsm.exceptions import AsyncnetfsmConnectionError, AsyncnetfsmTimeoutError
+from asyncnetfsm.logger import logger
+from asyncnetfsm.ratelimit import RateLimiter
+
+
+class FleetResult(object):
+    """Result of the job on one device"""
+
+    def __init__(self, params, result=None, error=None, attempts=0, elapsed=0.0):
+        self.params = params
+        """Parameters of the device from the inventory"""
+
+        self.result = result
+        """Value returned by the job"""
+
+        self.error = error
+        """Exception of the last attempt or None"""
+
+        self.attempts = attempts
+        """Number of attempts"""
+
+        self.elapsed = elapsed
+        """Time in seconds spent on the device including retries, without waiting for the free slot"""
+
+    @property
+    def ok(self):
+        """True if the job succeeded"""
+        return self.error is None
+
+    def __repr__(self):
+        return "FleetResult(host={!r}, ok={}, attempts={}, elapsed={:.3f})".format(
+            self.params.get("ip") or self.params.get("host"), self.ok, self.attempts, self.elapsed
+        )
+
+
+class FleetStats(object):
+    """Aggregate statistics of the fleet run"""
+
+    def __init__(self):
+        self.succeeded = 0
+        """Number of devices where the job succeeded"""
+
+        self.failed = 0
+        """Number of devices where the job failed after all attempts"""
+
+        self.retries = 0
+        """Number of repeated attempts"""
+
+        self.elapsed = 0.0
+        """Time in seconds from the start of the run"""
+
+        self.latencies = []
+        """Times in seconds spent on the succeeded devices"""
+
+    @property
+    def completed(self):
+        """Number of finished devices"""
+        return self.succeeded + self.failed
+
+    @property
+    def throughput(self):
+        """Finished devices per second"""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        """
+        Return latency percentile of the succeeded devices
+
+        :param float percent: percentile from 0 to 100
+        :return: latency in seconds or None without succeeded devices
+        """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        index = int(round(percent / 100.0 * (len(latencies) - 1)))
+        return latencies[index]
+
+    def __repr__(self):
+        p50, p90, p99 = (self.percentile(p) or 0.0 for p in (50, 90, 99))
+        return (
+            "FleetStats(succeeded={}, failed={}, retries={}, elapsed={:.2f}s, throughput={:.1f}/s, "
+            "p50={:.3f}s, p90={:.3f}s, p99={:.3f}s)".format(
+                self.succeeded, self.failed, self.retries, self.elapsed, self.throughput, p50, p90, p99
+            )
+        )
+
+
+class FleetRunner(object):
+    """
+    Run async job on every device of the inventory with bounded concurrency
+
+    The job is called with connected device and its return value is the result for the device.
+    Results are yielded as soon as the devices finish::
+
+        async def job(device):
+            return await device.send_command("show version")
+
+        runner = FleetRunner(job, concurrency=200, connect_rate=50, timeout=60, retries=2)
+        async for result in runner.run(inventory):
+            print(result.params["ip"], result.ok)
+        print(runner.stats)
+    """
+
+    _retry_on = (AsyncnetfsmConnectionError, AsyncnetfsmTimeoutError, OSError, asyncio.TimeoutError)
+    """Exceptions after which the job is repeated, authentication or commit failures aren't transient"""
+
+    def __init__(
+            self,
+            job,
+            concurrency=100,
+            group_by=None,
+            group_limit=None,
+            group_limits=None,
+            connect_rate=None,
+            connect_burst=1,
+            timeout=None,
+            retries=0,
+            retry_delay=1,
+    ):
+        """
+        :param job: coroutine function called with connected device
+        :param int concurrency: maximum number of devices processed at once
+        :param group_by: function returning the group of the device from its parameters, for example site
+        :param int group_limit: maximum number of devices of one group processed at once
+        :param dict group_limits: limits for the specific groups, override group_limit
+        :param float connect_rate: maximum number of new connections per second. Default is no limit
+        :param int connect_burst: number of connections which can be opened at once within connect_rate
+        :param float timeout: time in seconds for one attempt on the device including connecting
+        :param int retries: number of repeated attempts after connection errors and timeouts
+        :param float retry_delay: delay in seconds before the first retry, doubled for every next retry
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be positive")
+        self._job = job
+        self._concurrency = concurrency
+        self._group_by = group_by
+        self._group_limit = group_limit
+        self._group_limits = group_limits or {}
+        self._connect_limiter = RateLimiter(connect_rate, connect_burst) if connect_rate else None
+        self._timeout = timeout
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._semaphore = None
+        self._group_semaphores = {}
+        self.stats = FleetStats()
+        """Statistics of the last run"""
+
+    async def run(self, inventory):
+        """
+        Run the job on the devices and yield :class:`FleetResult` as they complete
+
+        Leaving the iteration early cancels unfinished devices.
+
+        :param inventory: iterable of parameters for :func:`asyncnetfsm.create`
+        """
+        self.stats = FleetStats()
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        self._group_semaphores = {}
+        started = time.monotonic()
+        done = asyncio.Queue()
+        tasks = [asyncio.ensure_future(self._run_device(params, done)) for params in inventory]
+        try:
+            for _ in range(len(tasks)):
+                result = await done.get()
+                self.stats.elapsed = time.monotonic() - started
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.stats.elapsed = time.monotonic() - started
+
+    async def run_all(self, inventory):
+        """
+        Run the job on the devices and return list of :class:`FleetResult` in the completion order
+        """
+        return [result async for result in self.run(inventory)]
+
+    def _group_semaphore(self, params):
+        """Return semaphore of the device group or None"""
+        if self._group_by is None:
+            return None
+        group = self._group_by(params)
+        limit = self._group_limits.get(group, self._group_limit)
+        if limit is None:
+            return None
+        if group not in self._group_semaphores:
+            self._group_semaphores[group] = asyncio.Semaphore(limit)
+        return self._group_semaphores[group]
+
+    async def _run_device(self, params, done):
+        """Run the job on the device with retries and put the result to the queue"""
+        group_semaphore = self._group_semaphore(params)
+        result = FleetResult(params)
+        while True:
+            # Slots are held only during the attempt, so the backoff of a failing device doesn't block others.
+            # Group slot is taken first, so waiting for busy group doesn't hold the global slot
+            if group_semaphore is not None:
+                await group_semaphore.acquire()
+            try:
+                async with self._semaphore:
+                    started = time.monotonic()
+                    result.attempts += 1
+                    try:
+                        if self._timeout is None:
+                            result.result = await self._attempt(params)
+                        else:
+                            result.result = await asyncio.wait_for(self._attempt(params), self._timeout)
+                        result.error = None
+                    except Exception as e:
+                        result.error = e
+                    finally:
+                        result.elapsed += time.monotonic() - started
+            finally:
+                if group_semaphore is not None:
+                    group_semaphore.release()
+            # Only connection errors and timeouts are repeated
+            if not isinstance(result.error, self._retry_on) or result.attempts > self._retries:
+                break
+            logger.info("Host {}: Fleet: Retrying after {}".format(
+                params.get("ip") or params.get("host"), repr(result.error))
+            )
+            self.stats.retries += 1
+            delay = self._retry_delay * 2 ** (result.attempts - 1)
+            await asyncio.sleep(delay)
+            result.elapsed += delay
+
+        if result.ok:
+            self.stats.succeeded += 1
+            self.stats.latencies.append(result.elapsed)
+        else:
+            self.stats.failed += 1
+        done.put_nowait(result)
+
+    async def _attempt(self, params):
+        """Connect to the device and run the job"""
+        if self._connect_limiter is not None:
+            await self._connect_limiter.acquire()
+        async with create(**params) as device:
+            return await self._job(device)
@@ -0,0 +1,104 @@
+"""
+Multi Channel Module, spreading commands across several sessions on one SSH connection
+"""
+import asyncio
+
+from asyncnetfsm.dispatcher import create
+from asyncnetfsm.logger import logger
+
+
+class MultiChannelDevice(object):
+    """
+    Device handle with several prepared sessions on one SSH connection
+
+    Every session is prepared with the vendor session preparation and commands are sent
+    to the free sessions, so several commands run on the device at once. Platforms like
+    NX-OS, EOS and JunOS allow several shells per SSH connection.
+
+    Example::
+
+        async with MultiChannelDevice(channels=8, **params) as device:
+            outputs = await device.send_commands(commands)
+    """
+
+    def __init__(self, channels=4, **params):
+        """
+        :param int channels: number of sessions opened on the SSH connection
+        :param params: parameters of :func:`asyncnetfsm.create`
+        """
+        if channels < 1:
+            raise ValueError("channels must be positive")
+        self._channels = channels
+        self._params = params
+        self._devices = []
+        self._free = None
+
+    @property
+    def devices(self):
+        """Device objects of the sessions, the first one owns SSH connection"""
+        return list(self._devices)
+
+    async def __aenter__(self):
+        """Async Context Manager"""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async Context Manager"""
+        await self.disconnect()
+
+    async def connect(self):
+        """Connect to the device and open all sessions"""
+        device = create(**self._params)
+        await device.connect()
+        channels = await asyncio.gather(
+            *(device.open_channel() for _ in range(self._channels - 1)), return_exceptions=True
+        )
+        self._devices = [device] + [channel for channel in channels if not isinstance(channel, BaseException)]
+        errors = [channel for channel in channels if isinstance(channel, BaseException)]
+        if errors:
+            await self.disconnect()
+            raise errors[0]
+        self._free = asyncio.Queue()
+        for channel in self._devices:
+            self._free.put_nowait(channel)
+        logger.info("Host {}: Opened {} channels".format(device.host, len(self._devices)))
+
+    async def run(self, method, *args, **kwargs):
+        """
+        Call coroutine method of the device on the free session
+
+        :param str method: name of the device method, for example "send_command"
+        :return: result of the method
+        """
+        channel = await self._free.get()
+        try:
+            return await getattr(channel, method)(*args, **kwargs)
+        finally:
+            self._free.put_nowait(channel)
+
+    async def send_command(self, command_string, **kwargs):
+        """
+        Send command on the free session
+
+        :param str command_string: command for executing
+        :param kwargs: parameters of send_command of the device
+        :return: The output of the command
+        """
+        return await self.run("send_command", command_string, **kwargs)
+
+    async def send_commands(self, commands, **kwargs):
+        """
+        Send commands spread across all sessions
+
+        :param list commands: commands for executing
+        :param kwargs: parameters of send_command of the device
+        :return: list of outputs in the order of commands
+        """
+        return await asyncio.gather(*(self.send_command(command, **kwargs) for command in commands))
+
+    async def disconnect(self):
+        """Close sessions and then SSH connection"""
+        devices, self._devices = self._devices, []
+        for device in reversed(devices):
+            await device.disconnect()
@@ -0,0 +1,299 @@
+"""
+Device Pool Module, leasing of already connected and prepared device sessions
+"""
+import asyncio
+import collections
+
+from asyncnetfsm.dispatcher import create
+from asyncnetfsm.logger import logger
+
+
+class DevicePool(object):
+    """
+    Pool of connected devices keyed by (host, port, username, device_type)
+
+    Devices returned to the pool are reset to exec mode and kept open, so the next
+    lease of the same device skips SSH handshake, authentication and session preparation.
+
+    Example::
+
+        pool = DevicePool(max_per_host=2, max_size=1000, idle_ttl=300)
+        async with pool.acquire(**params) as device:
+            out = await device.send_command("show version")
+        await pool.close()
+    """
+
+    _default_ports = {"ssh": 22, "ssh_exec": 22, "telnet": 23}
+    """Ports of the protocols used when port isn't set"""
+
+    def __init__(self, max_per_host=1, max_size=100, idle_ttl=300, health_check_timeout=5, reset_timeout=15):
+        """
+        :param int max_per_host: maximum number of open sessions for one device key
+        :param int max_size: maximum number of open sessions in the pool
+        :param float idle_ttl: time in seconds after which idle session is closed
+        :param float health_check_timeout: time in seconds for checking the prompt of idle session on checkout.
+            None disables health check
+        :param float reset_timeout: time in seconds for returning session to exec mode on checkin
+        """
+        if max_per_host < 1 or max_size < 1:
+            raise ValueError("max_per_host and max_size must be positive")
+        self._max_per_host = max_per_host
+        self._max_size = max_size
+        self._idle_ttl = idle_ttl
+        self._health_check_timeout = health_check_timeout
+        self._reset_timeout = reset_timeout
+
+        self._idle = collections.OrderedDict()
+        """Idle devices by key: deque of (device, time of return)"""
+
+        self._counts = collections.Counter()
+        """Number of open and opening devices by key"""
+
+        self._total = 0
+        """Number of open and opening devices in the pool"""
+
+        self._leased = {}
+        """Keys of leased devices by id of the device"""
+
+        self._cond = None
+        self._reaper = None
+        self._closed = False
+
+    @property
+    def size(self):
+        """Number of open and opening devices in the pool"""
+        return self._total
+
+    @property
+    def idle(self):
+        """Number of idle devices in the pool"""
+        return sum(len(devices) for devices in self._idle.values())
+
+    @classmethod
+    def device_key(cls, params):
+        """Return (host, port, username, device_type) key for the device parameters"""
+        protocol = params.get("protocol", "ssh")
+        port = params.get("port") or cls._default_ports.get(protocol)
+        host = params.get("ip") or params.get("host")
+        return host, int(port), params.get("username", ""), params["device_type"]
+
+    def acquire(self, **params):
+        """
+        Lease the device as async context manager
+
+        Device is returned to the pool at the exit from the context.
+        If the block raises an exception the device is closed instead.
+
+        :param params: parameters of :func:`asyncnetfsm.create`
+        """
+        return _Lease(self, params)
+
+    async def checkout(self, **params):
+        """
+        Lease the device. The device must be given back by :meth:`checkin`
+
+        Idle device of the same key is checked by sending new line and reading the prompt.
+        A new device is connected if there is no healthy idle device.
+
+        :param params: parameters of :func:`asyncnetfsm.create`
+        :return: connected device
+        """
+        if self._closed:
+            raise RuntimeError("DevicePool is closed")
+        key = self.device_key(params)
+        cond = self._condition()
+        self._start_reaper()
+        while True:
+            device = None
+            async with cond:
+                while True:
+                    expired = self._pop_expired()
+                    if expired:
+                        break
+                    if self._idle.get(key):
+                        device = self._idle[key].pop()[0]
+                        if not self._idle[key]:
+                            del self._idle[key]
+                        break
+                    if self._counts[key] < self._max_per_host:
+                        if self._total < self._max_size:
+                            self._counts[key] += 1
+                            self._total += 1
+                            break
+                        oldest = self._pop_oldest_idle()
+                        if oldest is not None:
+                            expired = [oldest]
+                            break
+                    await cond.wait()
+            if expired:
+                await self._close_devices(expired)
+                continue
+            break
+
+        if device is not None and await self._is_healthy(device):
+            self._leased[id(device)] = key
+            logger.info("Host {}: Pool: Reusing idle session".format(key[0]))
+            return device
+        if device is not None:
+            await self._disconnect(device)
+
+        # The slot of the key is reserved, connect new device in it
+        logger.info("Host {}: Pool: Opening new session".format(key[0]))
+        device = create(**params)
+        try:
+            await device.connect()
+        except BaseException:
+            await self._release_slot(key)
+            raise
+        self._leased[id(device)] = key
+        return device
+
+    async def checkin(self, device, discard=False):
+        """
+        Return leased device to the pool
+
+        The device is returned to exec mode with exit_config_mode. It is closed if resetting fails,
+        discard is True or the pool is closed.
+
+        :param device: device returned by :meth:`checkout`
+        :param bool discard: True for closing the device instead of keeping it
+        """
+        key = self._leased.pop(id(device))
+        if not discard and not self._closed:
+            discard = not await self._reset(device)
+        if discard or self._closed:
+            await self._disconnect(device)
+            await self._release_slot(key)
+            return
+        async with self._condition():
+            self._idle.setdefault(key, collections.deque()).append((device, asyncio.get_event_loop().time()))
+            self._cond.notify_all()
+
+    async def evict_idle(self):
+        """Close devices which are idle longer than idle_ttl"""
+        async with self._condition():
+            expired = self._pop_expired()
+        await self._close_devices(expired)
+
+    async def close(self):
+        """Close all idle devices. Leased devices are closed when they are returned"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._condition():
+            devices = [(key, device) for key, items in self._idle.items() for device, _ in items]
+            self._idle.clear()
+        await self._close_devices(devices)
+
+    async def __aenter__(self):
+        """Async Context Manager"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async Context Manager"""
+        await self.close()
+
+    def _condition(self):
+        """Create condition lazily in the running loop"""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _start_reaper(self):
+        """Start background closing of expired idle devices"""
+        if self._reaper is None and self._idle_ttl is not None:
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def _reap(self):
+        """Close expired idle devices periodically"""
+        while True:
+            await asyncio.sleep(max(self._idle_ttl / 2, 1))
+            await self.evict_idle()
+
+    def _pop_expired(self):
+        """Remove idle devices which are older than idle_ttl and return list of (key, device)"""
+        if self._idle_ttl is None:
+            return []
+        deadline = asyncio.get_event_loop().time() - self._idle_ttl
+        expired = []
+        for key in list(self._idle):
+            devices = self._idle[key]
+            while devices and devices[0][1] <= deadline:
+                expired.append((key, devices.popleft()[0]))
+            if not devices:
+                del self._idle[key]
+        return expired
+
+    def _pop_oldest_idle(self):
+        """Remove the least recently returned idle device of any key and return (key, device)"""
+        oldest = None
+        for key, devices in self._idle.items():
+            if oldest is None or devices[0][1] < self._idle[oldest][0][1]:
+                oldest = key
+        if oldest is None:
+            return None
+        device = self._idle[oldest].popleft()[0]
+        if not self._idle[oldest]:
+            del self._idle[oldest]
+        return oldest, device
+
+    async def _close_devices(self, devices):
+        """Close removed idle devices and free their slots"""
+        for key, device in devices:
+            await self._disconnect(device)
+            await self._release_slot(key)
+
+    async def _release_slot(self, key):
+        """Free the slot of closed device and wake up waiters"""
+        async with self._condition():
+            self._counts[key] -= 1
+            if self._counts[key] <= 0:
+                del self._counts[key]
+            self._total -= 1
+            self._cond.notify_all()
+
+    async def _is_healthy(self, device):
+        """Check idle device by its stale flag and the liveness probe"""
+        if device.stale:
+            logger.info("Host {}: Pool: Session is stale".format(device.host))
+            return False
+        if self._health_check_timeout is None:
+            return True
+        return await device.is_alive(self._health_check_timeout)
+
+    async def _reset(self, device):
+        """Return the device to exec mode, return False if it fails"""
+        exit_config_mode = getattr(device, "exit_config_mode", None)
+        if exit_config_mode is None:
+            return True
+        try:
+            await asyncio.wait_for(exit_config_mode(), self._reset_timeout)
+        except Exception as e:
+            logger.info("Host {}: Pool: Reset failed: {}".format(device.host, repr(e)))
+            return False
+        return True
+
+    @staticmethod
+    async def _disconnect(device):
+        """Close the device ignoring errors"""
+        try:
+            await device.disconnect()
+        except Exception as e:
+            logger.debug("Host {}: Pool: Disconnect failed: {}".format(device.host, repr(e)))
+
+
+class _Lease(object):
+    """Async context manager of the device leased from :class:`DevicePool`"""
+
+    def __init__(self, pool, params):
+        self._pool = pool
+        self._params = params
+        self._device = None
+
+    async def __aenter__(self):
+        self._device = await self._pool.checkout(**self._params)
+        return self._device
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._pool.checkin(self._device, discard=exc_type is not None)
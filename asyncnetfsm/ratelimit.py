@@ -0,0 +1,54 @@
+"""
+Rate Limiter Module, token bucket for pacing connections and transfers
+"""
+import asyncio
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter
+
+    Tokens are added with the given rate up to burst. :meth:`acquire` waits until
+    enough tokens are available, so the long term rate doesn't exceed rate.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param float rate: number of tokens added per second
+        :param float burst: maximum number of tokens in the bucket
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = float(rate)
+        self._burst = max(float(burst), 1.0)
+        self._tokens = self._burst
+        self._updated = None
+        self._lock = None
+
+    @property
+    def rate(self):
+        """Number of tokens added per second"""
+        return self._rate
+
+    async def acquire(self, tokens=1):
+        """
+        Wait until tokens are available and take them
+
+        Requests bigger than burst are allowed, they wait for the missing tokens.
+
+        :param float tokens: number of tokens
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            now = loop.time()
+            if self._updated is not None:
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens < 0:
+                # Waiting under the lock keeps the order of the waiters
+                await asyncio.sleep(-self._tokens / self._rate)
+                self._tokens = 0.0
+                self._updated = loop.time()
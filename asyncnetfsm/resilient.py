@@ -0,0 +1,247 @@
+"""
+Resilient Device Module, reconnecting with backoff and resuming after transport failures
+"""
+import asyncio
+import random
+import re
+
+import asyncssh
+
+from asyncnetfsm.constants import MODE_CONFIG, MODE_SUB_CONFIG, MODE_SYSTEM_VIEW
+from asyncnetfsm.dispatcher import create
+from asyncnetfsm.exceptions import (
+    AsyncnetfsmAuthenticationError,
+    AsyncnetfsmConnectionError,
+    AsyncnetfsmTimeoutError,
+)
+from asyncnetfsm.logger import logger
+
+
+class ResilientDevice(object):
+    """
+    Device handle which reconnects when the transport fails
+
+    Lost connections and read timeouts close the session. The device is connected again with
+    exponential backoff and jitter, the session preparation runs again and configuration mode
+    or system view of the lost session is entered again. Idempotent commands are repeated
+    on the new session, other commands raise the error and the next call reconnects.
+
+    Example::
+
+        async with ResilientDevice(retries=5, **params) as device:
+            for command in commands:
+                outputs.append(await device.send_command(command))
+    """
+
+    _transport_errors = (
+        AsyncnetfsmConnectionError,
+        AsyncnetfsmTimeoutError,
+        asyncio.TimeoutError,
+        TimeoutError,
+        OSError,
+        asyncssh.Error,
+    )
+    """Exceptions after which the session is considered lost"""
+
+    _idempotent_pattern = r"^\s*(show|display|ping|traceroute)\b"
+    """Commands matching this pattern are repeated by send_command and send_commands without idempotent flag"""
+
+    def __init__(self, retries=3, backoff=1, max_backoff=30, jitter=0.5, **params):
+        """
+        :param int retries: number of reconnects for one call
+        :param float backoff: delay in seconds before the first reconnect, doubled for every next one
+        :param float max_backoff: maximum delay in seconds between reconnects
+        :param float jitter: part of the delay which is random, from 0 (fixed delays) to 1
+        :param params: parameters of :func:`asyncnetfsm.create`
+        """
+        if retries < 0:
+            raise ValueError("retries must not be negative")
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._params = params
+        self._device = None
+        self._lost = False
+        self._mode = None
+        self.reconnects = 0
+        """Number of reconnects since the creation"""
+
+    @property
+    def device(self):
+        """Connected device object, it's replaced after every reconnect"""
+        return self._device
+
+    @property
+    def host(self):
+        """Hostname or ip address of the device"""
+        return self._params.get("ip") or self._params.get("host")
+
+    async def __aenter__(self):
+        """Async Context Manager"""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async Context Manager"""
+        await self.disconnect()
+
+    async def connect(self):
+        """Connect to the device, failed attempts are repeated with backoff"""
+        attempt = 0
+        while True:
+            try:
+                await self._connect()
+                return
+            except AsyncnetfsmAuthenticationError:
+                raise
+            except self._transport_errors as e:
+                attempt += 1
+                if attempt > self._retries:
+                    raise self._exhausted(e)
+                await self._sleep(attempt, e)
+
+    async def run(self, method, *args, idempotent=False, **kwargs):
+        """
+        Call coroutine method of the device, reconnecting if the session is lost
+
+        :param str method: name of the device method, for example "send_command"
+        :param bool idempotent: True if the call can be repeated on the new session after a failure
+        :return: result of the method
+        """
+        attempt = 0
+        while True:
+            if self._lost or self._device is None:
+                # Nothing was sent yet, so reconnecting is repeated for any call
+                try:
+                    await self._connect()
+                except AsyncnetfsmAuthenticationError:
+                    raise
+                except self._transport_errors as e:
+                    attempt += 1
+                    if attempt > self._retries:
+                        raise self._exhausted(e)
+                    await self._sleep(attempt, e)
+                    continue
+            try:
+                result = await getattr(self._device, method)(*args, **kwargs)
+            except AsyncnetfsmAuthenticationError:
+                raise
+            except self._transport_errors as e:
+                self._lost = True
+                await self._close()
+                attempt += 1
+                if not idempotent or attempt > self._retries:
+                    raise self._exhausted(e)
+                await self._sleep(attempt, e)
+                continue
+            if self._device.mode is not None:
+                self._mode = self._device.mode
+            return result
+
+    async def send_command(self, command_string, idempotent=None, **kwargs):
+        """
+        Send command, reconnecting if the session is lost
+
+        :param str command_string: command for executing
+        :param bool idempotent: True if the command can be repeated after a failure.
+            Default is matching the command with _idempotent_pattern
+        :param kwargs: parameters of send_command of the device
+        :return: The output of the command
+        """
+        if idempotent is None:
+            idempotent = self._is_idempotent(command_string)
+        return await self.run("send_command", command_string, idempotent=idempotent, **kwargs)
+
+    async def send_commands(self, commands, idempotent=None, **kwargs):
+        """
+        Send batch of commands, reconnecting if the session is lost
+
+        :param list commands: commands for executing
+        :param bool idempotent: True if the batch can be repeated after a failure.
+            Default is matching every command with _idempotent_pattern
+        :param kwargs: parameters of send_commands of the device
+        :return: list of outputs in the order of commands
+        """
+        if idempotent is None:
+            idempotent = all(self._is_idempotent(command) for command in commands)
+        return await self.run("send_commands", commands, idempotent=idempotent, **kwargs)
+
+    async def send_config_set(self, config_commands=None, idempotent=False, **kwargs):
+        """
+        Send configuration commands, reconnecting if the session is lost
+
+        :param list config_commands: configuration commands
+        :param bool idempotent: True if the commands can be applied again after a failure
+        :param kwargs: parameters of send_config_set of the device
+        :return: The output of the commands
+        """
+        return await self.run("send_config_set", config_commands, idempotent=idempotent, **kwargs)
+
+    async def disconnect(self):
+        """Close the session"""
+        await self._close()
+        self._lost = False
+
+    def _is_idempotent(self, command):
+        """Check the command with _idempotent_pattern"""
+        return re.match(type(self)._idempotent_pattern, command) is not None
+
+    async def _connect(self):
+        """Connect new device object and restore the mode of the lost session"""
+        reconnect = self._lost
+        device = create(**self._params)
+        try:
+            await device.connect()
+            if reconnect:
+                await self._restore_mode(device, self._mode)
+        except BaseException:
+            await self._disconnect(device)
+            raise
+        self._device = device
+        self._lost = False
+        if reconnect:
+            self.reconnects += 1
+            logger.info("Host {}: Resilient: Reconnected".format(self.host))
+
+    @staticmethod
+    async def _restore_mode(device, mode):
+        """Enter configuration mode or system view if the lost session was in it"""
+        if mode in (MODE_CONFIG, MODE_SUB_CONFIG) and hasattr(device, "config_mode"):
+            # The sub configuration context can't be known, top level configuration mode is entered
+            await device.config_mode()
+        elif mode == MODE_SYSTEM_VIEW and hasattr(device, "_system_view"):
+            await device._system_view()
+
+    async def _close(self):
+        """Close the current device object ignoring errors"""
+        device, self._device = self._device, None
+        if device is not None:
+            await self._disconnect(device)
+
+    @staticmethod
+    async def _disconnect(device):
+        """Close the device ignoring errors"""
+        try:
+            await device.disconnect()
+        except Exception as e:
+            logger.debug("Host {}: Resilient: Disconnect failed: {}".format(device.host, repr(e)))
+
+    async def _sleep(self, attempt, error):
+        """Wait before the next attempt with exponential backoff and jitter"""
+        delay = min(self._backoff * 2 ** (attempt - 1), self._max_backoff)
+        delay *= 1 - self._jitter * random.random()
+        logger.info("Host {}: Resilient: Attempt {} failed: {}, retrying in {:.2f}s".format(
+            self.host, attempt, repr(error), delay)
+        )
+        await asyncio.sleep(delay)
+
+    def _exhausted(self, error):
+        """Convert the last error to AsyncnetfsmTimeoutError or AsyncnetfsmConnectionError"""
+        if isinstance(error, (AsyncnetfsmTimeoutError, AsyncnetfsmConnectionError)):
+            return error
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            return AsyncnetfsmTimeoutError(self.host, None, "timeout while reading from the device")
+        return AsyncnetfsmConnectionError(self.host, getattr(error, "code", None), str(error) or repr(error))
@@ -0,0 +1,70 @@
+"""
+Transfer Module, staging files on many devices with bounded concurrency and shared bandwidth
+"""
+from asyncnetfsm.fleet import FleetRunner
+from asyncnetfsm.ratelimit import RateLimiter
+
+
+async def distribute_file(
+        inventory,
+        local_path,
+        remote_path,
+        bandwidth=None,
+        concurrency=50,
+        retries=2,
+        retry_delay=1,
+        timeout=None,
+        verify=False,
+        md5=None,
+        block_size=65536,
+        max_requests=16,
+        **kwargs
+):
+    """
+    Upload the file to every device of the inventory and yield results as the devices finish
+
+    All uploads share one token bucket in bytes, so the total rate doesn't exceed bandwidth.
+    The first attempt on every device copies the whole file. With verify failed uploads are repeated
+    with resume, so the retry continues from the part copied by the previous attempt.
+
+    Example::
+
+        async for result in distribute_file(inventory, "nxos.bin", "bootflash:nxos.bin",
+                                            bandwidth=100 * 1024 ** 2, concurrency=100, verify=True):
+            print(result.params["ip"], result.ok, result.result or result.error)
+
+    :param inventory: iterable of parameters for :func:`asyncnetfsm.create`
+    :param str local_path: path of the local file
+    :param str remote_path: path of the file on the devices
+    :param float bandwidth: maximum total rate in bytes per second. Default is no limit
+    :param int concurrency: maximum number of devices uploading at once
+    :param int retries: number of repeated attempts after connection errors and timeouts
+    :param float retry_delay: delay in seconds before the first retry, doubled for every next retry
+    :param float timeout: time in seconds for one attempt on the device including connecting
+    :param bool verify: True for comparing MD5 computed by the device after the upload, it's required for resume
+    :param str md5: expected MD5 hex digest of the local file
+    :param int block_size: size of one request in bytes
+    :param int max_requests: number of block requests in flight per device
+    :param kwargs: other parameters of :class:`FleetRunner <asyncnetfsm.FleetRunner>`
+    :return: async iterator over :class:`FleetResult <asyncnetfsm.FleetResult>` with
+        :class:`TransferResult <asyncnetfsm.connections.TransferResult>` as result
+    """
+    # The burst allows every transfer to have its requests in flight
+    limiter = RateLimiter(bandwidth, burst=block_size * max_requests) if bandwidth else None
+    # Devices with a started upload, an existing file on other devices can be unrelated to this one
+    started = set()
+
+    async def job(device):
+        key = (device.host, device._port)
+        resume = verify and key in started
+        started.add(key)
+        return await device.put_file(
+            local_path, remote_path, resume=resume, md5=md5, verify=verify, block_size=block_size,
+            max_requests=max_requests, limiter=limiter
+        )
+
+    runner = FleetRunner(
+        job, concurrency=concurrency, timeout=timeout, retries=retries, retry_delay=retry_delay, **kwargs
+    )
+    async for result in runner.run(inventory):
+        yield result
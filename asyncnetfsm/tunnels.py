@@ -0,0 +1,181 @@
+"""
+Tunnels Module, shared SSH connections to jump hosts
+"""
+import asyncio
+
+import asyncssh
+
+from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError
+from asyncnetfsm.logger import logger
+
+
+class _BastionConnection(object):
+    """SSH connection to the jump host and number of device connections tunneled over it"""
+
+    def __init__(self, conn, limit):
+        self.conn = conn
+        self.channels = 0
+        self.limit = limit
+
+
+class TunnelLease(object):
+    """SSH connection to the jump host leased for one device connection"""
+
+    def __init__(self, manager, name, bastion):
+        self._manager = manager
+        self._name = name
+        self._bastion = bastion
+
+    @property
+    def conn(self):
+        """:class:`asyncssh.SSHClientConnection` for using as tunnel"""
+        return self._bastion.conn
+
+    def release(self, rejected=False):
+        """
+        Give the channel slot back
+
+        :param bool rejected: True if the jump host refused to open the channel, for example because of
+            MaxSessions. The connection isn't used for more channels than it has now
+        """
+        if self._bastion is not None:
+            self._manager._release(self._bastion, rejected)
+            self._bastion = None
+
+
+class TunnelManager(object):
+    """
+    Pool of SSH connections to jump hosts shared by device connections
+
+    Device connections are multiplexed over a few connections to every jump host up to max_channels
+    device connections per jump host connection. Closed jump host connections are opened again on demand.
+
+    Example::
+
+        tunnels = TunnelManager(max_channels=8, max_connections=4)
+        tunnels.add_bastion("dc1", host="jump.dc1", username="user", password="pass")
+        async with asyncnetfsm.create(via="dc1", tunnel_manager=tunnels, **params) as device:
+            ...
+        await tunnels.close()
+    """
+
+    def __init__(self, max_channels=8, max_connections=4, timeout=30):
+        """
+        :param int max_channels: maximum number of device connections over one jump host connection
+        :param int max_connections: maximum number of connections to one jump host
+        :param float timeout: timeout in seconds for connecting to the jump host
+        """
+        if max_channels < 1 or max_connections < 1:
+            raise ValueError("max_channels and max_connections must be positive")
+        self._max_channels = max_channels
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._params = {}
+        self._connections = {}
+        self._connecting = {}
+        self._cond = None
+
+    def add_bastion(self, name, host, port=22, username=None, password=None, known_hosts=None, **kwargs):
+        """
+        Register jump host
+
+        :param str name: name of the jump host for the via parameter of the devices
+        :param str host: jump host hostname or ip address
+        :param int port: ssh port of the jump host
+        :param str username: username for the jump host
+        :param str password: password for the jump host
+        :param known_hosts: file with known hosts. Default is None (no policy)
+        :param kwargs: other parameters of :func:`asyncssh.connect`
+        """
+        params = dict(kwargs, host=host, port=int(port), known_hosts=known_hosts)
+        if username is not None:
+            params["username"] = username
+        if password is not None:
+            params["password"] = password
+        self._params[name] = params
+        self._connections.setdefault(name, [])
+        self._connecting.setdefault(name, 0)
+
+    async def acquire(self, name):
+        """
+        Lease jump host connection with a free channel slot
+
+        Waits if all connections to the jump host are full and their number reached max_connections.
+
+        :param str name: name of the jump host
+        :return: :class:`TunnelLease`
+        """
+        if name not in self._params:
+            raise ValueError("Unknown jump host: {}".format(name))
+        cond = self._condition()
+        async with cond:
+            while True:
+                bastions = self._connections[name]
+                bastions[:] = [bastion for bastion in bastions if not bastion.conn.is_closed()]
+                free = [bastion for bastion in bastions if bastion.channels < bastion.limit]
+                if free:
+                    # The most loaded connection is filled first, so the others can become idle
+                    bastion = max(free, key=lambda item: item.channels)
+                    bastion.channels += 1
+                    return TunnelLease(self, name, bastion)
+                if len(bastions) + self._connecting[name] < self._max_connections:
+                    self._connecting[name] += 1
+                    break
+                await cond.wait()
+
+        try:
+            conn = await self._connect(name)
+        finally:
+            async with cond:
+                self._connecting[name] -= 1
+                cond.notify_all()
+        bastion = _BastionConnection(conn, self._max_channels)
+        bastion.channels = 1
+        async with cond:
+            self._connections[name].append(bastion)
+            cond.notify_all()
+        return TunnelLease(self, name, bastion)
+
+    async def close(self):
+        """Close all jump host connections"""
+        connections = [bastion.conn for bastions in self._connections.values() for bastion in bastions]
+        for bastions in self._connections.values():
+            bastions.clear()
+        for conn in connections:
+            conn.close()
+        for conn in connections:
+            await conn.wait_closed()
+
+    def _condition(self):
+        """Create condition lazily in the running loop"""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _connect(self, name):
+        """Open new connection to the jump host"""
+        params = self._params[name]
+        logger.info("Host {}: Tunnel: Connecting to jump host {}".format(params["host"], name))
+        try:
+            return await asyncio.wait_for(asyncssh.connect(**params), self._timeout)
+        except asyncssh.DisconnectError as e:
+            raise AsyncnetfsmAuthenticationError(params["host"], e.code, e.reason)
+        except asyncio.TimeoutError:
+            raise AsyncnetfsmTimeoutError(params["host"], None, 'timeout while connecting to %r' % params["host"])
+
+    def _release(self, bastion, rejected):
+        """Free the channel slot and wake up waiters"""
+        if rejected:
+            bastion.limit = max(bastion.channels - 1, 1)
+        bastion.channels -= 1
+        if self._cond is not None:
+            asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        """Wake up waiters for the channel slots"""
+        async with self._cond:
+            self._cond.notify_all()
+
+
+default_manager = TunnelManager()
+"""Tunnel manager used by devices created with via parameter and without tunnel_manager"""
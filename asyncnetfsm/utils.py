@@ -1,10 +1,35 @@
 """
 Utilities Module.
 """
+import asyncio
+import json
 import re
 import os
-from clitable import CliTable, CliTableError
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import textfsm
+import texttable
+from clitable import CliTable, CliTableError, IndexTable
 from .constants import CODE_SET, CODE_NEXT_LINE
+from .logger import logger
+
+try:
+    import orjson as _json_decoder
+except ImportError:
+    _json_decoder = json
+
+ANSI_ESCAPE_CODES = re.compile("|".join(CODE_SET))
+LINEFEEDS = re.compile(r"(\r\r\n|\r\n|\n\r)")
+BACKSPACE = "\x08"
+JSON_START = re.compile(r"^\s*[{\[]", re.MULTILINE)
+
+TEXTFSM_INDEX_CACHE_SIZE = 8
+"""Number of parsed TextFSM index files kept in the process-wide cache"""
+
+TEXTFSM_TEMPLATE_CACHE_SIZE = 256
+"""Number of compiled TextFSM templates kept in the process-wide cache"""
 
 
 def strip_ansi_escape_codes(string):
@@ -36,25 +61,238 @@ def strip_ansi_escape_codes(string):
         Mikrotik
     """
 
-    output = string
-    for ansi_esc_code in CODE_SET:
-        output = re.sub(ansi_esc_code, "", output)
+    output = ANSI_ESCAPE_CODES.sub("", string)
 
     # CODE_NEXT_LINE must substitute with '\n'
-    output = re.sub(CODE_NEXT_LINE, "\n", output)
+    if CODE_NEXT_LINE in output:
+        output = output.replace(CODE_NEXT_LINE, "\n")
 
     return output
 
 
-def get_template_dir():
-    """Find and return the ntc-templates/templates dir."""
-    try:
-        template_dir = os.environ["NET_TEXTFSM"]
+def normalize_linefeeds(string):
+    """Convert '\r\r\n','\r\n', '\n\r' to '\n"""
+    if "\n\r" not in string and "\r\r" not in string:
+        # Only '\r\n' can be found, plain replace is much faster than regex
+        return string.replace("\r\n", "\n")
+    return LINEFEEDS.sub("\n", string)
+
+
+class OutputProcessor(object):
+    """
+    Post-processing of the command output
+
+    Strips ANSI escape codes, normalizes linefeeds and cuts the command echo and the
+    trailing prompt. Every step runs once over the whole output: all ANSI codes are removed
+    by one compiled regular expression, and the echo and the prompt are cut by a single slice.
+    """
+
+    def __init__(self, normalize_linefeeds=normalize_linefeeds):
+        """
+        :param normalize_linefeeds: function for normalizing linefeeds, it's platform specific
+        """
+        self._normalize_linefeeds = normalize_linefeeds
+
+    def process(self, output, ansi_escape_codes=False, command_string=None, prompt=None):
+        """
+        Process the output of the command
+
+        :param str output: raw output from the channel
+        :param bool ansi_escape_codes: True for stripping ANSI escape codes
+        :param str command_string: command for stripping from the beginning of the output. None for no stripping
+        :param str prompt: prompt for stripping from the last line of the output. None for no stripping
+        :return: processed output
+        """
+        if ansi_escape_codes:
+            output = strip_ansi_escape_codes(output)
+        output = self._normalize_linefeeds(output)
+
+        start = 0
+        end = len(output)
+        if prompt is not None:
+            last_line = output.rfind("\n")
+            if prompt in output[last_line + 1:]:
+                end = max(last_line, 0)
+        if command_string is not None:
+            if output.find(BACKSPACE, 0, end) != -1:
+                # Cisco IOS adds backspaces into output for long commands (i.e. for commands that line wrap)
+                output = output[:end].replace(BACKSPACE, "")
+                first_line = output.find("\n")
+                return output[first_line + 1:] if first_line != -1 else ""
+            start = len(command_string)
+        if start or end != len(output):
+            output = output[start:end]
+        return output
+
+
+class LRUCache(object):
+    """Thread-safe mapping which evicts the least recently used items"""
+
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, factory=None):
+        """
+        Return the item for key, the item is created by factory() if it isn't cached
+
+        Without factory None is returned for the missing item
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        if factory is None:
+            return None
+        value = factory()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """Put the item for key into the cache"""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def resize(self, maxsize):
+        """Change the maximum number of items, the least recently used items are evicted if it's smaller"""
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+
+_template_dirs = {}
+_index_cache = LRUCache(TEXTFSM_INDEX_CACHE_SIZE)
+_template_cache = LRUCache(TEXTFSM_TEMPLATE_CACHE_SIZE)
+_lookup_cache = LRUCache(TEXTFSM_TEMPLATE_CACHE_SIZE)
+
+
+class _CompiledTemplate(object):
+    """Compiled TextFSM template, the FSM is reset before every parsing"""
+
+    def __init__(self, path):
+        with open(path) as template_file:
+            self.fsm = textfsm.TextFSM(template_file)
+        self.keys = set(self.fsm.GetValuesByAttrib("Key"))
+        self.lock = threading.Lock()
+
+    def parse_records(self, text):
+        """Parse text and return the list of records"""
+        with self.lock:
+            self.fsm.Reset()
+            return self.fsm.ParseText(text)
+
+    def parse(self, text):
+        """Parse text and return TextTable with the records"""
+        table = texttable.TextTable()
+        table.header = self.fsm.header
+        for record in self.parse_records(text):
+            table.Append(record)
+        return table
+
+
+class CachedCliTable(CliTable):
+    """
+    CliTable which takes the index and the templates from the process-wide cache
+
+    The index file and the templates are parsed only once, they are parsed again
+    only if their modification time is changed.
+    """
+
+    def ReadIndex(self, index_file=None):
+        """Reads the IndexTable index file of commands and templates from the cache"""
+        self.index_file = index_file or self.index_file
+        fullpath = os.path.join(self.template_dir, self.index_file)
+        self._index_key = (fullpath, os.stat(fullpath).st_mtime)
+        self.index = _index_cache.get(
+            self._index_key,
+            lambda: IndexTable(self._PreParse, self._PreCompile, fullpath)
+        )
+        if "Template" not in self.index.index.header:
+            raise CliTableError("Index file does not have 'Template' column.")
+
+    def ParseCmd(self, cmd_input, attributes=None, templates=None):
+        """Creates a TextTable table of values from cmd_input string using the compiled templates"""
+        self.raw = cmd_input
+        if not templates:
+            templates = self.get_templates(attributes)
+
+        compiled = [self._get_template(name) for name in templates.split(":")]
+        self.Reset()
+        self._keys = set(compiled[0].keys)
+        self.table = compiled[0].parse(self.raw)
+        # Add additional columns from any additional tables.
+        for template in compiled[1:]:
+            self.extend(template.parse(self.raw), set(self._keys))
+
+    def get_templates(self, attributes):
+        """Return templates of the index row matching attributes, the lookups are cached"""
+        key = (self._index_key, tuple(sorted(attributes.items())))
+
+        def lookup():
+            row_idx = self.index.GetRowMatch(attributes)
+            return self.index.index[row_idx]["Template"] if row_idx else None
+
+        templates = _lookup_cache.get(key, lookup)
+        if not templates:
+            raise CliTableError('No template found for attributes: "%s"' % attributes)
+        return templates
+
+    def parse_to_dict(self, cmd_input, attributes):
+        """
+        Parse cmd_input and return list of dictionaries
+
+        Output parsed with a single template is converted directly to dictionaries without building TextTable
+        """
+        templates = self.get_templates(attributes)
+        if ":" in templates:
+            self.ParseCmd(cmd_input, attributes, templates)
+            return clitable_to_dict(self)
+        template = self._get_template(templates)
+        header = [name.lower() for name in template.fsm.header]
+        return [dict(zip(header, record)) for record in template.parse_records(cmd_input)]
+
+    def _get_template(self, name):
+        path = os.path.join(self.template_dir, name)
+        return _template_cache.get(
+            (path, os.stat(path).st_mtime),
+            lambda: _CompiledTemplate(path)
+        )
+
+
+def get_template_dir(template_dir=None):
+    """
+    Find and return the ntc-templates/templates dir.
+
+    :param str template_dir: path of ntc-templates or its templates dir.
+        Default is NET_TEXTFSM environment variable or ~/ntc-templates
+    """
+    if template_dir is None:
+        template_dir = os.environ.get("NET_TEXTFSM")
+    if template_dir not in _template_dirs:
+        _template_dirs[template_dir] = _find_template_dir(template_dir)
+    return _template_dirs[template_dir]
+
+
+def _find_template_dir(template_dir=None):
+    """Find ntc-templates/templates dir in the file system."""
+    if template_dir is not None:
         index = os.path.join(template_dir, "index")
         if not os.path.isfile(index):
             # Assume only base ./ntc-templates specified
             template_dir = os.path.join(template_dir, "templates")
-    except KeyError:
+    else:
         # Construct path ~/ntc-templates/templates
         home_dir = os.path.expanduser("~")
         template_dir = os.path.join(home_dir, "ntc-templates", "templates")
@@ -80,17 +318,119 @@ def clitable_to_dict(cli_table):
     return objs
 
 
-def get_structured_data(raw_output, platform, command):
-    """Convert raw CLI output to structured data using TextFSM template."""
-    template_dir = get_template_dir()
-    index_file = os.path.join(template_dir, "index")
-    textfsm_obj = CliTable(index_file, template_dir)
+def get_structured_data(raw_output, platform, command, template_dir=None):
+    """
+    Convert raw CLI output to structured data using TextFSM template.
+
+    Parsed index and compiled templates are cached in the process.
+    """
+    path = get_template_dir(template_dir)
+    index_file = os.path.join(path, "index")
+    try:
+        textfsm_obj = CachedCliTable(index_file, path)
+    except OSError:
+        # Templates were moved, find them again
+        _template_dirs.clear()
+        path = get_template_dir(template_dir)
+        index_file = os.path.join(path, "index")
+        textfsm_obj = CachedCliTable(index_file, path)
     attrs = {"Command": command, "Platform": platform}
     try:
         # Parse output through template
-        textfsm_obj.ParseCmd(raw_output, attrs)
-        structured_data = clitable_to_dict(textfsm_obj)
+        structured_data = textfsm_obj.parse_to_dict(raw_output, attrs)
         output = raw_output if structured_data == [] else structured_data
         return output
     except CliTableError:
         return raw_output
+
+
+def get_json_data(raw_output):
+    """
+    Convert JSON output of the command to python objects
+
+    orjson is used when it's installed, otherwise the json module. Text around the document,
+    for example "{master:0}" line of Junos, is ignored.
+
+    :param str raw_output: output of the command with JSON modifier
+    :return: dictionary or list
+    :raises ValueError: if the output isn't JSON, for example the error of the unsupported command
+    """
+    match = JSON_START.search(raw_output)
+    if match is None:
+        raise ValueError("output isn't JSON")
+    start = match.end() - 1
+    end = max(raw_output.rfind("}"), raw_output.rfind("]")) + 1
+    try:
+        return _json_decoder.loads(raw_output[start:end])
+    except ValueError:
+        # Trailing text with brackets, the document ends earlier
+        return json.JSONDecoder().raw_decode(raw_output, start)[0]
+
+
+async def parse_output(raw_output, platform, command, executor=None, loop=None, template_dir=None):
+    """
+    Convert raw CLI output to structured data using TextFSM template outside of the event loop
+
+    :param str raw_output: output of the command
+    :param str platform: device type of the device
+    :param str command: command which was sent to the device
+    :param executor: :class:`concurrent.futures.Executor` for parsing. Default is the loop default executor
+    :param loop: asyncio loop object
+    :param str template_dir: path of the templates. Default is found by :func:`get_template_dir`
+    :return: list of dictionaries or raw_output if the template wasn't found
+    """
+    loop = loop or asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, get_structured_data, raw_output, platform, command, template_dir)
+
+
+def warm_textfsm_cache(template_dir=None, platforms=None):
+    """
+    Parse the index and compile its templates in the current process
+
+    Used as initializer of worker processes, so the first parsing in the worker is fast.
+    The template cache is enlarged to keep all compiled templates. A template which
+    can't be compiled is skipped, the error is raised when it's used for parsing.
+
+    :param str template_dir: path of the templates. Default is found by :func:`get_template_dir`
+    :param list platforms: device types whose templates are compiled, for example ["cisco_ios"].
+        Default is all templates of the index
+    """
+    template_dir = get_template_dir(template_dir)
+    textfsm_obj = CachedCliTable(os.path.join(template_dir, "index"), template_dir)
+    names = OrderedDict()
+    for row, compiled_row in zip(textfsm_obj.index.index, textfsm_obj.index.compiled):
+        platform = compiled_row["Platform"] if "Platform" in compiled_row.header else None
+        if platforms is not None and platform and not any(platform.match(name) for name in platforms):
+            continue
+        for name in row["Template"].split(":"):
+            names[name] = None
+
+    if len(names) > TEXTFSM_TEMPLATE_CACHE_SIZE:
+        _template_cache.resize(len(names))
+    for name in names:
+        try:
+            textfsm_obj._get_template(name)
+        except Exception as e:
+            logger.warning("TextFSM template {} can't be compiled: {}".format(name, repr(e)))
+
+
+def create_textfsm_executor(max_workers=None, platforms=None, template_dir=None):
+    """
+    Create process pool for parsing TextFSM templates with warm template caches in the workers
+
+    :param int max_workers: number of worker processes. Default is the number of processors
+    :param list platforms: device types whose templates are compiled in the workers, for example
+        ["cisco_ios", "cisco_nxos"]. Default is all templates of the index
+    :param str template_dir: path of the templates used in the workers. Default is found by :func:`get_template_dir`
+    :return: :class:`concurrent.futures.ProcessPoolExecutor`
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_textfsm_worker, initargs=(get_template_dir(template_dir), platforms)
+    )
+
+
+def _init_textfsm_worker(template_dir, platforms):
+    """Make the templates the default of the worker process and compile them"""
+    # Parsing in the worker doesn't get template_dir, it's the default only in this process
+    os.environ["NET_TEXTFSM"] = template_dir
+    warm_textfsm_cache(template_dir, platforms)
@@ -26,6 +26,12 @@ class AristaEOS(IOSLikeDevice):
     _config_check = ")#"
     """Checking string in prompt. If it's exist im prompt - we are in configuration mode"""
 
+    _json_command_suffix = "| json"
+    """Modifier for JSON output of show commands"""
+
+    _file_md5_command = "verify /md5 {}"
+    """Command printing MD5 of the file on the device"""
+
     async def exit_config_mode(self):
         """Exit from configuration mode"""
         logger.info("Host {}: Exiting from configuration mode".format(self._host))
@@ -40,14 +46,10 @@ class AristaEOS(IOSLikeDevice):
                 raise ValueError("Failed to exit from configuration mode")
         return output
 
-    async def check_config_mode(self):
-        """Checks if the device is in configuration mode or not"""
-        logger.info("Host {}: Checking configuration mode".format(self._host))
-        check_string = type(self)._config_check
-        self._conn.send(self._normalize_cmd("\n"))
-        output = await self._conn.read_until_prompt()
-        output = output.replace("(s1)", "")
-        output = output.replace("(s2)", "")
-        return check_string in output
+    def _classify_prompt(self, prompt):
+        """Return the mode of the session for the prompt line"""
+        prompt = prompt.replace("(s1)", "")
+        prompt = prompt.replace("(s2)", "")
+        return super()._classify_prompt(prompt)
 
     pass
@@ -5,15 +5,22 @@ Connections Method are based upon AsyncSSH and should be running in asyncio loop
 """
 
 import asyncio
+import copy
 import re
 import time
 
 import asyncssh
 
+from asyncnetfsm.constants import MAX_BUFFER
 from asyncnetfsm.exceptions import AsyncnetfsmAuthenticationError, AsyncnetfsmTimeoutError,AsyncnetfsmConnectionError
+from asyncnetfsm.exceptions import AsyncnetfsmConfigError, AsyncnetfsmTransferError
 from asyncnetfsm.logger import logger
-from asyncnetfsm import utils
-from asyncnetfsm.connections import TelnetConnection, SSHConnection
+from asyncnetfsm import tunnels, utils
+from asyncnetfsm.connections import TelnetConnection, SSHConnection, SSHExecConnection, SFTPTransfer
+from asyncnetfsm.connections.buffer import OutputBuffer
+from asyncnetfsm.connections.matcher import PatternMatcher
+from asyncnetfsm.connections.timer import ReadTimer
+from asyncnetfsm.fingerprint import Fingerprint, FingerprintCache
 
 
 class BaseDevice(object):
@@ -47,6 +54,14 @@ class BaseDevice(object):
             mac_algs=(),
             compression_algs=(),
             signature_algs=(),
+            textfsm_executor=None,
+            via=None,
+            tunnel_manager=None,
+            fingerprint_cache=None,
+            keepalive_interval=None,
+            keepalive_count_max=3,
+            health_check_interval=None,
+            health_check_timeout=5,
     ):
         """
         Initialize base class for asynchronous working with network devices
@@ -55,6 +70,8 @@ class BaseDevice(object):
         :param username: username for logging to device
         :param password: user password for logging to device
         :param port: ssh port for connection. Default is 22
+        :param protocol: 'ssh', 'telnet' or 'ssh_exec'. With 'ssh_exec' every command runs in own SSH exec
+            channel without PTY, session preparation is skipped and the output ends with the channel
         :param device_type: network device type
         :param timeout: timeout in second for getting information from channel
         :param loop: asyncio loop object
@@ -97,6 +114,23 @@ class BaseDevice(object):
             A list of public key signature algorithms to use during the SSH
             handshake, taken from `signature algorithms
             <https://asyncssh.readthedocs.io/en/latest/api.html#signaturealgs>`_
+        :param textfsm_executor:
+            Executor for parsing output with TextFSM outside of the event loop.
+            Default is None, output is parsed in the event loop.
+            :func:`create_textfsm_executor <asyncnetfsm.utils.create_textfsm_executor>`
+            creates process pool with warm template caches
+        :param via: name of the jump host registered in the tunnel manager. The connection to the device
+            is tunneled over a shared connection to this jump host
+        :param tunnel_manager: manager of the jump host connections. Default is
+            :data:`asyncnetfsm.tunnels.default_manager`
+        :param fingerprint_cache: cache of the discovered prompts. When the device prints the cached prompt
+            after login, prompt discovery and mode checks of the session preparation are skipped
+        :param keepalive_interval: time in seconds between SSH keepalive requests. Default is None (disabled)
+        :param keepalive_count_max: number of unanswered SSH keepalive requests after which the connection is closed
+        :param health_check_interval: time in seconds between liveness probes of the idle session made by
+            background task. The session which fails the probe is marked stale and closed,
+            so the next command fails at once. Default is None (disabled)
+        :param health_check_timeout: time in seconds for the prompt in the liveness probe
 
 
         :type host: str
@@ -126,6 +160,14 @@ class BaseDevice(object):
         :type mac_algs: list[str]
         :type compression_algs: list[str]
         :type signature_algs: list[str]
+        :type textfsm_executor: :class:`Executor <concurrent.futures.Executor>`
+        :type via: str
+        :type tunnel_manager: :class:`TunnelManager <asyncnetfsm.tunnels.TunnelManager>`
+        :type fingerprint_cache: :class:`FingerprintCache <asyncnetfsm.fingerprint.FingerprintCache>`
+        :type keepalive_interval: float
+        :type keepalive_count_max: int
+        :type health_check_interval: float
+        :type health_check_timeout: float
         """
         if ip:
             self._host = ip
@@ -141,7 +183,7 @@ class BaseDevice(object):
             self._loop = loop
 
         """Convert needed connect params to a dictionary for simplicity"""
-        if self._protocol == 'ssh':
+        if self._protocol in ('ssh', 'ssh_exec'):
             self._port = port or 22
             self._port = int(self._port)
             self._connect_params_dict = {
@@ -165,6 +207,9 @@ class BaseDevice(object):
                 "compression_algs": compression_algs,
                 "signature_algs": signature_algs,
             }
+            if keepalive_interval:
+                self._connect_params_dict["keepalive_interval"] = keepalive_interval
+                self._connect_params_dict["keepalive_count_max"] = keepalive_count_max
         elif self._protocol == 'telnet':
             self._port = port or 23
             self._port = int(self._port)
@@ -175,7 +220,7 @@ class BaseDevice(object):
                 "password": password,
             }
         else:
-            raise ValueError("unknown protocol {} , only telnet and ssh supported".format(self._protocol))
+            raise ValueError("unknown protocol {} , only telnet, ssh and ssh_exec supported".format(self._protocol))
         self.current_terminal = None
 
         if pattern is not None:
@@ -184,10 +229,28 @@ class BaseDevice(object):
         # Filling internal vars
         # self._stdin = self._stdout = self._stderr = self._conn = None
         # self._base_prompt = self._base_pattern = ""
-        self._MAX_BUFFER = 65535
+        self._MAX_BUFFER = MAX_BUFFER
         self.device_prompt = ''
         self.prompt_pattern = ''
         self._ansi_escape_codes = False
+        self._textfsm_executor = textfsm_executor
+        if via is not None and self._protocol == 'telnet':
+            raise ValueError("only SSH connection can be tunneled")
+        self._via = via
+        self._tunnel_manager = tunnel_manager or tunnels.default_manager
+        self._tunnel_lease = None
+        self._fingerprint_cache = fingerprint_cache
+        self._fingerprint = None
+        self._discovering_prompt = False
+        self._discovered_prompt = None
+        self._health_check_interval = health_check_interval
+        self._health_check_timeout = health_check_timeout
+        self._health_monitor = None
+        self._stale = False
+        self.last_exit_status = None
+        """Exit status of the last command executed with protocol 'ssh_exec'"""
+
+        self._json_unsupported = set()
 
     _delimiter_list = [">", "#"]
     """All this characters will stop reading from buffer. It mean the end of device prompt"""
@@ -198,6 +261,48 @@ class BaseDevice(object):
     _disable_paging_command = "terminal length 0"
     """Command for disabling paging"""
 
+    _output_processors = {}
+    """Output processors of vendor classes"""
+
+    _tunnel_attempts = 3
+    """Number of attempts to open the connection over the jump host"""
+
+    _pipeline_commands = True
+    """Commands of send_commands are written at once. Devices which echo or drop typed ahead input set it False"""
+
+    _pipeline_echo_length = 20
+    """Number of characters of the command echo which must follow the prompt in send_commands and windowed config"""
+
+    _exec_max_channels = 8
+    """Maximum number of exec channels opened at once by send_commands with protocol 'ssh_exec'"""
+
+    _config_error_patterns = [r"% Invalid input", r"Error:"]
+    """Markers of the configuration line rejected by the device, they are searched in the output of every line"""
+
+    _json_command_suffix = None
+    """Modifier appended to the command for JSON output, None if the platform can't return JSON"""
+
+    _file_md5_command = None
+    """Command printing MD5 of the file on the device, {} is replaced with the path. None if it's unknown"""
+
+    _file_md5_pattern = r"\b([0-9a-fA-F]{32})\b"
+    """Pattern for searching MD5 in the output of _file_md5_command"""
+
+    @property
+    def last_read_stats(self):
+        """Statistics of the gaps between chunks during the last read from the channel"""
+        return self._conn.last_read_stats
+
+    @property
+    def stale(self):
+        """True if the health monitor found the session dead. Stale session must be connected again"""
+        return self._stale
+
+    @property
+    def mode(self):
+        """Mode of the session classified by the last prompt, None when it's unknown"""
+        return self._conn.mode
+
     @property
     def base_prompt(self):
          """Returning base prompt for this network device"""
@@ -229,7 +334,9 @@ class BaseDevice(object):
             await self._establish_connection()
         except OSError as e:
             raise AsyncnetfsmConnectionError(self.host, None, str(e))
-        await self._session_preparation()
+        if self._protocol != 'ssh_exec':
+            await self._session_preparation()
+            self._save_fingerprint()
         logger.info("Has connected to the device")
 
     async def _establish_connection(self):
@@ -238,20 +345,125 @@ class BaseDevice(object):
         # initiate SSH connection
         if self._protocol == 'ssh':
             conn = SSHConnection(**self._connect_params_dict)
+        elif self._protocol == 'ssh_exec':
+            conn = SSHExecConnection(**self._connect_params_dict)
         elif self._protocol == 'telnet':
             conn = TelnetConnection(**self._connect_params_dict)
         else:
             raise ValueError("only SSH connection is supported")
 
-        await conn.connect()
+        if self._via is None:
+            await conn.connect()
+        else:
+            await self._connect_via(conn)
+        conn.set_prompt_classifier(self._classify_prompt)
         self._conn = conn
+        self._stale = False
+        if self._health_check_interval and self._health_monitor is None:
+            self._health_monitor = asyncio.ensure_future(self._monitor_health())
         logger.info("Connection is established")
         return self._conn
 
+    async def _connect_via(self, conn):
+        """
+        Connect over the shared connection to the jump host
+
+        Connecting is repeated with another jump host connection if the jump host connection was closed
+        or the jump host refused to open the channel.
+        """
+        attempts = type(self)._tunnel_attempts
+        for attempt in range(attempts):
+            lease = await self._tunnel_manager.acquire(self._via)
+            conn._conn_dict["tunnel"] = lease.conn
+            try:
+                await conn.connect()
+            except Exception as e:
+                closed = lease.conn.is_closed()
+                rejected = isinstance(e, asyncssh.ChannelOpenError) and not closed
+                lease.release(rejected=rejected)
+                if attempt < attempts - 1 and (closed or rejected):
+                    logger.info("Host {}: Reconnecting via {}: {}".format(self._host, self._via, repr(e)))
+                    continue
+                if isinstance(e, asyncssh.ChannelOpenError):
+                    raise AsyncnetfsmConnectionError(self._host, e.code, e.reason)
+                raise
+            self._tunnel_lease = lease
+            return
+
     async def _session_preparation(self):
         """ Prepare session before start using it """
         await self._flush_buffer()
-        await self._set_base_prompt()
+        if self._fingerprint is None:
+            await self._set_base_prompt()
+
+    async def open_channel(self):
+        """
+        Open new prepared session of this device on the same SSH connection
+
+        Returned device object shares SSH connection with this one, disconnecting it closes only its session.
+        Device must be connected and support several sessions per SSH connection.
+
+        :return: device object of the same class with its own session
+        """
+        if self._protocol != 'ssh':
+            raise ValueError("only SSH connection supports several sessions")
+        logger.info("Host {}: Opening new channel".format(self._host))
+        device = copy.copy(self)
+        device._tunnel_lease = None
+        # Sessions on the same SSH connection rely on the monitor of the owner
+        device._health_monitor = None
+        device._conn = await self._conn.open_session()
+        device._conn.set_prompt_classifier(device._classify_prompt)
+        await device._session_preparation()
+        return device
+
+    async def is_alive(self, timeout=None):
+        """
+        Check the session by sending new line and reading the prompt
+
+        Commands started by other coroutines during the check wait for its end.
+
+        :param float timeout: time in seconds for the prompt. Default is health_check_timeout
+        :return: True if the prompt came back in time
+        """
+        if self._conn is None or self._conn.is_closed():
+            return False
+        if self._protocol == 'ssh_exec':
+            return True
+        if timeout is None:
+            timeout = self._health_check_timeout
+        try:
+            await self._conn.probe(self._normalize_cmd("\n"), timeout=timeout)
+        except Exception as e:
+            logger.info("Host {}: Liveness probe failed: {}".format(self._host, repr(e)))
+            return False
+        return True
+
+    async def _monitor_health(self):
+        """
+        Mark the session stale when the transport is closed or the idle session fails the liveness probe
+
+        Only the session waiting at the prompt longer than health_check_interval is probed,
+        so running commands aren't disturbed. Commands started during the probe are held until it ends.
+        Stale session is closed, pending and next reads fail at once.
+        """
+        interval = self._health_check_interval
+        while True:
+            await asyncio.sleep(interval)
+            conn = self._conn
+            if conn.is_closed():
+                alive = False
+            elif conn.prompt is not None and self._loop.time() - conn.last_activity >= interval:
+                alive = await self.is_alive()
+            else:
+                continue
+            if not alive:
+                logger.warning("Host {}: Session is stale".format(self._host))
+                self._stale = True
+                self._health_monitor = None
+                if not conn.is_closed():
+                    conn.abort()
+                return
 
     async def _set_base_prompt(self):
         """
@@ -284,6 +496,22 @@ class BaseDevice(object):
         self.prompt_pattern = base_pattern
         self._conn.set_base_pattern(base_pattern)
 
+    def _classify_prompt(self, prompt):
+        """
+        Return the mode of the session for the prompt line
+
+        :param str prompt: the last line of the output where the base pattern was found
+        :return: one of the MODE constants or None if the mode is unknown
+        """
+        return None
+
+    async def _get_mode(self):
+        """Return the mode of the session, the prompt is checked by sending new line only when the mode is unknown"""
+        if self._conn.mode is None:
+            self._conn.send(self._normalize_cmd("\n"))
+            await self._conn.read_until_prompt()
+        return self._conn.mode
+
     async def _find_prompt(self):
         """Finds the current network device prompt, last line only"""
         logger.info("Host {}: Finding prompt".format(self._host))
@@ -300,37 +528,61 @@ class BaseDevice(object):
                 "Host {}: Unable to find prompt: {}".format(self._host, repr(prompt))
             )
         logger.debug("Host {}: Found Prompt: {}".format(self._host, repr(prompt)))
+        if self._discovering_prompt:
+            # The first prompt after login is saved to the cache after the session preparation
+            self._discovering_prompt = False
+            self._discovered_prompt = prompt
         return prompt
 
     async def send_command_expect(self, command,
                                   pattern='',
                                   re_flags=0, dont_read=False,
-                                  read_for=0):
-        """ Send a single line of command and readuntil prompte"""
+                                  read_for=0, timeout=None, idle_timeout=None):
+        """
+        Send a single line of command and readuntil prompte
+
+        :param float timeout: total time in seconds for reading the output. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        """
         self._conn.send(self._normalize_cmd(command))
         if dont_read:
             return ''
         if pattern:
-            output = await self._conn.read_until_prompt_or_pattern(pattern, re_flags)
+            output = await self._conn.read_until_prompt_or_pattern(
+                pattern, re_flags, timeout=timeout, idle_timeout=idle_timeout
+            )
 
         else:
-            output = await self._conn.read_until_prompt(read_for=read_for)
+            output = await self._conn.read_until_prompt(
+                read_for=read_for, timeout=timeout, idle_timeout=idle_timeout
+            )
 
         return output
 
     async def send_command_timing(self,
                                   command_string,
-                                  read_for_seconds=2):
+                                  read_for_seconds=2,
+                                  idle_gap=None):
         """
         send command and keep reading for the specified time in wait or until_prompt
+
+        With idle_gap the output is returned as soon as the channel was idle for idle_gap seconds,
+        read_for_seconds is the upper bound of the whole reading then.
+        Statistics of the gaps between chunks are available in last_read_stats
+
         :param command_string: command
         :type command_string: str
         :param read_for_seconds: seconds of reading
         :type read_for_seconds: int
+        :param idle_gap: seconds of silence in the channel which end the reading, for example 0.3
+        :type idle_gap: float
         :return: command output
         """
 
-        output = await self.send_command_expect(command_string, read_for=read_for_seconds)
+        if idle_gap:
+            output = await self.send_command_expect(command_string, read_for=idle_gap, timeout=read_for_seconds)
+        else:
+            output = await self.send_command_expect(command_string, read_for=read_for_seconds)
         return output
 
     async def send_command(
@@ -340,7 +592,10 @@ class BaseDevice(object):
             re_flags=0,
             strip_command=True,
             strip_prompt=True,
-            use_textfsm=False
+            use_textfsm=False,
+            timeout=None,
+            idle_timeout=None,
+            structured=None
     ):
         """
         Sending command to device (support interactive commands with pattern)
@@ -350,42 +605,409 @@ class BaseDevice(object):
         :param re.flags re_flags: re flags for pattern
         :param bool strip_command: True or False for stripping command from output
         :param bool strip_prompt: True or False for stripping ending device prompt
+        :param bool use_textfsm: True for converting the output to structured data with TextFSM template
+        :param float timeout: total time in seconds for reading the output. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param str structured: 'native' for sending the command with the JSON modifier of the platform
+            (_json_command_suffix) and decoding the JSON output. Platforms without JSON, commands with pipes
+            and commands which don't return JSON fall back to TextFSM. 'textfsm' is the same as use_textfsm
         :return: The output of the command
         """
         logger.info("Host {}: Sending command".format(self._host))
+        if structured not in (None, "native", "textfsm"):
+            raise ValueError("structured must be 'native' or 'textfsm'")
+        if structured == "native" and not pattern:
+            data = await self._send_command_json(command_string, timeout, idle_timeout)
+            if data is not None:
+                return data
+        if structured is not None:
+            use_textfsm = True
+        if self._protocol == 'ssh_exec':
+            output = (await self.exec_command(command_string, timeout, idle_timeout)).stdout
+            if use_textfsm:
+                output = await self._parse_textfsm(output, command_string)
+            return output
         output = ""
         command_string = self._normalize_cmd(command_string)
         logger.info(
             "Host {}: Send command: {}".format(self._host, repr(command_string))
         )
         # self._conn.send(command_string)
-        output = await self.send_command_expect(command_string, pattern, re_flags)
+        output = await self.send_command_expect(
+            command_string, pattern, re_flags, timeout=timeout, idle_timeout=idle_timeout
+        )
 
-        # Some platforms have ansi_escape codes
-        if self._ansi_escape_codes:
-            output = self._strip_ansi_escape_codes(output)
-        output = self._normalize_linefeeds(output)
-        if strip_prompt:
-            output = self._strip_prompt(output)
-        if strip_command:
-            output = self._strip_command(command_string, output)
+        output = self._process_output(output, command_string, strip_command, strip_prompt)
 
         if use_textfsm:
-            logger.info("parsing output using texfsm, command=%r," % command_string)
-            output = utils.get_structured_data(output, self._device_type, command_string)
+            output = await self._parse_textfsm(output, command_string)
         logger.info(
             "Host {}: Send command output: {}".format(self._host, repr(output))
         )
         return output
 
+    async def send_commands(
+            self,
+            commands,
+            strip_command=True,
+            strip_prompt=True,
+            use_textfsm=False,
+            timeout=None,
+            idle_timeout=None
+    ):
+        """
+        Sending batch of exec commands to device
+
+        All commands are written to the channel at once and the output is split by the prompts
+        followed by the echo of the next command, so the batch costs about one round trip.
+        Devices with _pipeline_commands False get the commands one by one.
+
+        :param list commands: commands for executing basically in privilege mode
+        :param bool strip_command: True or False for stripping command from output
+        :param bool strip_prompt: True or False for stripping ending device prompt
+        :param bool use_textfsm: True for converting the outputs to structured data with TextFSM template
+        :param float timeout: total time in seconds for reading all outputs. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :return: list of outputs in the order of commands
+        """
+        logger.info("Host {}: Sending {} commands".format(self._host, len(commands)))
+        if self._protocol == 'ssh_exec':
+            return await self._send_commands_exec(commands, use_textfsm, timeout, idle_timeout)
+        commands = [self._normalize_cmd(command) for command in commands]
+        if not commands:
+            return []
+        if not type(self)._pipeline_commands:
+            outputs = []
+            deadline = None if timeout is None else self._loop.time() + timeout
+            for command in commands:
+                if deadline is not None:
+                    timeout = max(deadline - self._loop.time(), 0)
+                outputs.append(await self.send_command(
+                    command, strip_command=strip_command, strip_prompt=strip_prompt, use_textfsm=use_textfsm,
+                    timeout=timeout, idle_timeout=idle_timeout
+                ))
+            return outputs
+
+        prompt = self._conn._base_pattern
+        patterns = [
+            "(?:{})(?={})".format(prompt, re.escape(command.strip()[:type(self)._pipeline_echo_length]))
+            for command in commands[1:]
+        ]
+        patterns.append(prompt)
+        logger.debug("Host {}: Send commands: {}".format(self._host, repr(commands)))
+        self._conn.send("".join(commands))
+        outputs = await self._conn.read_until_pattern_sequence(
+            patterns, timeout=timeout, idle_timeout=idle_timeout
+        )
+        outputs = [
+            self._process_output(output, command, strip_command, strip_prompt)
+            for output, command in zip(outputs, commands)
+        ]
+        if use_textfsm:
+            outputs = [await self._parse_textfsm(output, command) for output, command in zip(outputs, commands)]
+        logger.info(
+            "Host {}: Send commands output: {}".format(self._host, repr(outputs))
+        )
+        return outputs
+
+    async def exec_command(self, command_string, timeout=None, idle_timeout=None):
+        """
+        Execute command in own SSH exec channel, the device must be connected with protocol 'ssh_exec'
+
+        :param str command_string: command for executing
+        :param float timeout: total time in seconds for the command. Default is no limit
+        :param float idle_timeout: time in seconds without any output. Default is device timeout
+        :return: :class:`ExecResult <asyncnetfsm.connections.ExecResult>` with output and exit status
+        """
+        if self._protocol != 'ssh_exec':
+            raise ValueError("exec_command requires protocol 'ssh_exec'")
+        command_string = command_string.strip()
+        logger.info("Host {}: Exec command: {}".format(self._host, repr(command_string)))
+        result = await self._conn.run(command_string, timeout=timeout, idle_timeout=idle_timeout)
+        self.last_exit_status = result.exit_status
+        return result
+
+    async def get_file(self, remote_path, local_path, resume=False, md5=None, block_size=65536, max_requests=16,
+                       limiter=None):
+        """
+        Download file from the device over SFTP on the SSH connection of this device
+
+        Binary files are copied as is, up to max_requests block requests are in flight at once.
+
+        :param str remote_path: path of the file on the device, for example "bootflash:image.bin"
+        :param str local_path: path of the local file
+        :param bool resume: True for continuing the download from the size of the existing local file,
+            which was left by the interrupted download of the same file. It requires md5.
+            Default is copying the whole file
+        :param str md5: expected MD5 hex digest of the file, the mismatching file is removed
+        :param int block_size: size of one request in bytes
+        :param int max_requests: number of block requests in flight
+        :param limiter: :class:`RateLimiter <asyncnetfsm.RateLimiter>` in bytes per second for capping bandwidth
+        :return: :class:`TransferResult <asyncnetfsm.connections.TransferResult>`
+        """
+        transfer = self._sftp_transfer(block_size, max_requests, limiter)
+        return await transfer.get(remote_path, local_path, resume=resume, md5=md5)
+
+    async def put_file(self, local_path, remote_path, resume=False, md5=None, verify=False, block_size=65536,
+                       max_requests=16, limiter=None):
+        """
+        Upload file to the device over SFTP on the SSH connection of this device
+
+        :param str local_path: path of the local file
+        :param str remote_path: path of the file on the device, for example "bootflash:image.bin"
+        :param bool resume: True for continuing the upload from the size of the existing remote file,
+            which was left by the interrupted upload of the same file. It requires verify.
+            Default is copying the whole file
+        :param str md5: expected MD5 hex digest of the local file, it's checked before the upload
+        :param bool verify: True for comparing MD5 computed by the device with the local file after the upload,
+            the mismatching file is removed. The platform must have _file_md5_command
+        :param int block_size: size of one request in bytes
+        :param int max_requests: number of block requests in flight
+        :param limiter: :class:`RateLimiter <asyncnetfsm.RateLimiter>` in bytes per second for capping bandwidth
+        :return: :class:`TransferResult <asyncnetfsm.connections.TransferResult>`
+        """
+        if verify and type(self)._file_md5_command is None:
+            raise ValueError("{} can't compute MD5 of the file".format(type(self).__name__))
+        transfer = self._sftp_transfer(block_size, max_requests, limiter)
+        return await transfer.put(
+            local_path, remote_path, resume=resume, md5=md5, verify=self.file_md5 if verify else None
+        )
+
+    async def file_md5(self, path):
+        """
+        Return MD5 hex digest of the file on the device computed by the device
+
+        :param str path: path of the file on the device
+        :return: MD5 in lower case
+        """
+        command = type(self)._file_md5_command
+        if command is None:
+            raise ValueError("{} can't compute MD5 of the file".format(type(self).__name__))
+        output = await self.send_command(command.format(path), timeout=self._timeout * 20)
+        match = re.search(type(self)._file_md5_pattern, output)
+        if match is None:
+            raise AsyncnetfsmTransferError(self._host, None, "MD5 of {} not found: {}".format(path, output.strip()))
+        return match.group(1).lower()
+
+    def _sftp_transfer(self, block_size, max_requests, limiter):
+        """Create SFTP transfer on the SSH connection"""
+        if self._protocol not in ('ssh', 'ssh_exec'):
+            raise ValueError("file transfer requires SSH connection")
+        return SFTPTransfer(
+            self._conn._conn, host=self._host, block_size=block_size, max_requests=max_requests, limiter=limiter
+        )
+
+    async def _send_commands_exec(self, commands, use_textfsm=False, timeout=None, idle_timeout=None):
+        """Run commands in parallel exec channels, at most _exec_max_channels at once"""
+        semaphore = asyncio.Semaphore(type(self)._exec_max_channels)
+
+        async def run(command):
+            async with semaphore:
+                output = (await self.exec_command(command, timeout, idle_timeout)).stdout
+            if use_textfsm:
+                output = await self._parse_textfsm(output, command)
+            return output
+
+        return list(await asyncio.gather(*(run(command) for command in commands)))
+
+    async def _send_command_json(self, command_string, timeout=None, idle_timeout=None):
+        """
+        Send the command with the JSON modifier and decode the output
+
+        Commands without JSON output are remembered, so their fallback costs one round trip only once.
+
+        :return: decoded output or None if the command can't return JSON
+        """
+        suffix = type(self)._json_command_suffix
+        command = command_string.strip()
+        if suffix is None or "|" in command or command in self._json_unsupported:
+            return None
+        output = await self.send_command(
+            "{} {}".format(command, suffix), timeout=timeout, idle_timeout=idle_timeout
+        )
+        try:
+            return utils.get_json_data(output)
+        except ValueError:
+            logger.info("Host {}: Command {} has no JSON output, falling back to TextFSM".format(
+                self._host, repr(command))
+            )
+            self._json_unsupported.add(command)
+            return None
+
+    async def _parse_textfsm(self, output, command_string):
+        """Convert output to structured data with TextFSM template, in the executor if it's set"""
+        logger.info("parsing output using texfsm, command=%r," % command_string)
+        if self._textfsm_executor is None:
+            return utils.get_structured_data(output, self._device_type, command_string)
+        return await utils.parse_output(
+            output, self._device_type, command_string, self._textfsm_executor, self._loop
+        )
+
+    async def send_command_stream(
+            self,
+            command_string,
+            strip_command=True,
+            strip_prompt=True
+    ):
+        """
+        Sending command to device and yielding lines of the output as they arrive
+
+        The stream ends when the device prompt is found. ANSI escape codes are stripped
+        and linefeeds are normalized for every chunk, so the whole output is never kept in memory.
+        The rest of the output is read until the prompt when the stream is closed early.
+        A loop left by break doesn't close the stream, the garbage collector closes it later
+        and the next command can race with it. Close the stream explicitly before sending
+        other commands::
+
+            stream = device.send_command_stream("show logging")
+            try:
+                async for line in stream:
+                    if "error" in line:
+                        break
+            finally:
+                await stream.aclose()
+
+        or use ``async with contextlib.aclosing(device.send_command_stream(...)) as stream`` in Python 3.10+.
+
+        :param str command_string: command for executing basically in privilege mode
+        :param bool strip_command: True or False for stripping command from output
+        :param bool strip_prompt: True or False for stripping ending device prompt
+        :return: async iterator over the lines of the output
+        """
+        logger.info("Host {}: Sending command stream".format(self._host))
+        command_string = self._normalize_cmd(command_string)
+        logger.info(
+            "Host {}: Send command: {}".format(self._host, repr(command_string))
+        )
+        self._conn.send(command_string)
+
+        matcher = PatternMatcher(self._conn._get_pattern_set([self._conn._base_pattern]))
+        pending = ""
+        line_start = False
+        skip_echo = strip_command
+        found = False
+        failed = False
+        try:
+            while not found:
+                try:
+                    with ReadTimer(idle_timeout=self._timeout):
+                        chunk = await self._conn.read()
+                except asyncio.TimeoutError:
+                    failed = True
+                    raise TimeoutError(self._host)
+                except (Exception, asyncio.CancelledError):
+                    failed = True
+                    raise
+                if not chunk:
+                    failed = True
+                    raise AsyncnetfsmConnectionError(self._host, None, "connection closed by remote host")
+                found = bool(matcher.feed(chunk))
+                pending += chunk
+                if line_start and pending:
+                    # '\n\r' was split between two chunks
+                    if pending[0] == "\r":
+                        pending = pending[1:]
+                    line_start = False
+
+                if found:
+                    complete, pending = pending, ""
+                else:
+                    end = pending.rfind("\n")
+                    if end == -1:
+                        continue
+                    complete, pending = pending[:end + 1], pending[end + 1:]
+                    line_start = True
+
+                lines = self._process_stream_chunk(complete).split("\n")
+                last_line = lines.pop()
+                if found and not (strip_prompt and self._conn._base_prompt in last_line):
+                    lines.append(last_line)
+                for line in lines:
+                    if skip_echo:
+                        skip_echo = False
+                        continue
+                    yield line
+        finally:
+            # The stream was closed before the prompt, the rest of the output belongs to it
+            if not found and not failed:
+                await self._conn.read_until_prompt()
+
+    def _process_stream_chunk(self, chunk):
+        """Strip ANSI escape codes and normalize linefeeds in a chunk of the output"""
+        return self._output_processor().process(chunk, self._ansi_escape_codes)
+
+    def _process_output(self, output, command_string, strip_command=True, strip_prompt=True):
+        """
+        Post-process the output of the command in a single pipeline
+
+        Some platforms have ansi_escape codes, they are stripped together with normalizing linefeeds,
+        stripping the trailing prompt and the command
+        """
+        return self._output_processor().process(
+            output,
+            self._ansi_escape_codes,
+            command_string if strip_command else None,
+            self._conn._base_prompt if strip_prompt else None,
+        )
+
+    @classmethod
+    def _output_processor(cls):
+        """Return output processor of this class, it's created once per vendor class"""
+        processor = BaseDevice._output_processors.get(cls)
+        if processor is None:
+            processor = utils.OutputProcessor(cls._normalize_linefeeds)
+            BaseDevice._output_processors[cls] = processor
+        return processor
+
     async def _flush_buffer(self):
-        """ flush unnecessary data """
+        """
+        flush unnecessary data
+
+        With fingerprint cache the output is read until the cached prompt or any delimiter.
+        If the cached prompt is found, the cached base prompt, base pattern and mode are set,
+        so _set_base_prompt isn't needed and the mode checks don't send anything
+        """
         logger.debug("Flushing buffers")
 
         delimiters = map(re.escape, type(self)._delimiter_list)
         delimiters = r"|".join(delimiters)
         # await self.send_new_line(pattern=delimiters)
-        await self._conn.read_until_pattern(delimiters)
+        self._fingerprint = self._discovered_prompt = None
+        fingerprint = self._fingerprint_cache.get(self._fingerprint_key) if self._fingerprint_cache else None
+        self._discovering_prompt = self._fingerprint_cache is not None
+        if fingerprint is None or fingerprint.base_pattern is None:
+            # Vendors which don't set the base pattern of the connection can't skip the discovery
+            await self._conn.read_until_pattern(delimiters)
+            return
+        await self._conn.read_until_pattern([re.escape(fingerprint.prompt), delimiters])
+        if self._conn.last_match.index == 0:
+            logger.info("Host {}: Found cached prompt: {}".format(self._host, repr(fingerprint.prompt)))
+            self._fingerprint = fingerprint
+            self._discovering_prompt = False
+            self.device_prompt = fingerprint.base_prompt
+            self.prompt_pattern = fingerprint.base_pattern
+            self._conn.set_base_prompt(fingerprint.base_prompt)
+            self._conn.set_base_pattern(fingerprint.base_pattern)
+            if self._conn.mode is None:
+                self._conn.mode = fingerprint.mode
+        else:
+            logger.info("Host {}: Cached prompt wasn't found, discovering prompt".format(self._host))
+
+    def _save_fingerprint(self):
+        """Save the prompt discovered by the session preparation and its derived settings to the cache"""
+        if self._discovered_prompt is None:
+            return
+        prompt, self._discovered_prompt = self._discovered_prompt, None
+        self._fingerprint_cache.set(self._fingerprint_key, Fingerprint(
+            prompt, self._conn._base_prompt, self._conn._base_pattern, self._classify_prompt(prompt)
+        ))
+
+    @property
+    def _fingerprint_key(self):
+        """Key of the device in the fingerprint cache"""
+        return FingerprintCache.key(
+            self._host, self._port, self._connect_params_dict["username"], self._device_type
+        )
 
     def _strip_prompt(self, a_string):
         """Strip the trailing router prompt from the output"""
@@ -427,8 +1049,7 @@ class BaseDevice(object):
     @staticmethod
     def _normalize_linefeeds(a_string):
         """Convert '\r\r\n','\r\n', '\n\r' to '\n"""
-        newline = re.compile(r"(\r\r\n|\r\n|\n\r)")
-        return newline.sub("\n", a_string)
+        return utils.normalize_linefeeds(a_string)
 
     @staticmethod
     def _normalize_cmd(command):
@@ -437,13 +1058,19 @@ class BaseDevice(object):
         command += "\n"
         return command
 
-    async def send_config_set(self, config_commands=None):
+    async def send_config_set(self, config_commands=None, timeout=None, idle_timeout=None, window=None):
         """
         Sending configuration commands to device
 
         The commands will be executed one after the other.
+        With window up to window lines are sent ahead without waiting for the prompt,
+        the output of every line is checked for _config_error_patterns and the push stops at the first error.
 
         :param list config_commands: iterable string list with commands for applying to network device
+        :param float timeout: total time in seconds for sending all commands. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param int window: maximum number of lines sent but not yet echoed by the device. Default is waiting
+            for the prompt after every line without checking errors
         :return: The output of this commands
         """
         logger.info("Host {}: Sending configuration settings".format(self._host))
@@ -458,19 +1085,109 @@ class BaseDevice(object):
 
         # Send config commands
         logger.debug("Host {}: Config commands: {}".format(self._host, config_commands))
-        output = ""
+        if window is not None:
+            return await self._send_config_window(list(config_commands), window, timeout, idle_timeout)
+        output = OutputBuffer()
         config_commands = ['\n'] + config_commands
+        deadline = None
+        if timeout is not None:
+            deadline = self._loop.time() + timeout
         for cmd in config_commands:
             # self._conn.send(self._normalize_cmd(cmd))
-            output += await self.send_command_expect(cmd)
+            if deadline is not None:
+                timeout = max(deadline - self._loop.time(), 0)
+            output.append(await self.send_command_expect(cmd, timeout=timeout, idle_timeout=idle_timeout))
 
-        if self._ansi_escape_codes:
-            output = self._strip_ansi_escape_codes(output)
+        output = self._output_processor().process(output.getvalue(), self._ansi_escape_codes)
+        logger.debug(
+            "Host {}: Config commands output: {}".format(self._host, repr(output))
+        )
+        return output
+
+    async def _send_config_window(self, config_commands, window, timeout=None, idle_timeout=None):
+        """
+        Send configuration lines keeping up to window lines in flight
 
-        output = self._normalize_linefeeds(output)
-        print(
+        A line is acknowledged when its echo after the prompt comes back, the text between two echoes
+        is the output of the previous line. New lines are sent only for acknowledged ones, so the input
+        buffer of the device never holds more than window lines. After the first rejected line nothing
+        more is sent, the lines in flight are read out and :class:`AsyncnetfsmConfigError` is raised.
+        """
+        if window < 1:
+            raise ValueError("window must be positive")
+        if not config_commands:
+            return ""
+        if idle_timeout is None:
+            idle_timeout = self._timeout
+
+        prompt = self._conn._base_pattern
+        echoes = [re.escape(cmd.strip()[:type(self)._pipeline_echo_length]) for cmd in config_commands]
+        # The prompt before the first line was read already, its echo is the first data in the channel
+        acks = [echoes[0]] + [r"(?:{})[ \t]*{}".format(prompt, echo) for echo in echoes[1:]]
+        errors = self._conn._get_pattern_set(type(self)._config_error_patterns, re.MULTILINE)
+
+        full_output = OutputBuffer()
+        output = OutputBuffer()
+        sent = acked = 0
+        failed = None
+        done = False
+
+        def fill_window():
+            """Send lines while the window has a place and return matcher of the next acknowledgement"""
+            nonlocal sent
+            while failed is None and sent < len(config_commands) and sent - acked < window:
+                self._conn.send(self._normalize_cmd(config_commands[sent]))
+                sent += 1
+            if acked < sent:
+                # Every echo pattern is used once, so it isn't kept in the pattern cache of the session
+                return PatternMatcher([acks[acked]], overlap=self._conn._PATTERN_OVERLAP)
+            return PatternMatcher(self._conn._get_pattern_set([prompt]), overlap=self._conn._PATTERN_OVERLAP)
+
+        matcher = fill_window()
+        timer = ReadTimer(timeout=timeout, idle_timeout=idle_timeout)
+        try:
+            with timer:
+                while not done:
+                    chunk = await self._conn.read()
+                    if not chunk:
+                        raise AsyncnetfsmConnectionError(self._host, None, "connection closed by remote host")
+                    timer.touch()
+                    output.append(chunk)
+                    match = matcher.feed(chunk)
+                    while match:
+                        # Offsets of the match count from the beginning of the current output,
+                        # the match can end in the data read earlier
+                        text = output.getvalue()
+                        text, rest = text[:match.end], text[match.end:]
+                        full_output.append(text)
+                        if acked and failed is None:
+                            error = errors.search(text)
+                            if error:
+                                failed = (config_commands[acked - 1], error[1])
+                        if acked == sent:
+                            self._conn._track_prompt(text, match)
+                            done = True
+                            break
+                        # Acknowledged line frees a place in the window
+                        acked += 1
+                        matcher = fill_window()
+                        output = OutputBuffer(rest)
+                        match = matcher.feed(rest) if rest else None
+        except asyncio.TimeoutError:
+            raise TimeoutError(self._host)
+
+        output = self._output_processor().process(full_output.getvalue(), self._ansi_escape_codes)
+        logger.debug(
             "Host {}: Config commands output: {}".format(self._host, repr(output))
         )
+        if failed is not None:
+            command, error = failed
+            line_start = error.string.rfind("\n", 0, error.start()) + 1
+            line_end = error.string.find("\n", error.end())
+            reason = "Command {!r} failed: {}".format(
+                command.strip(), error.string[line_start:line_end if line_end != -1 else None].strip()
+            )
+            raise AsyncnetfsmConfigError(self._host, None, reason, command=command, output=output)
         return output
 
     @staticmethod
@@ -505,36 +1222,7 @@ class BaseDevice(object):
         logger.info("Stripping ansi escape codes")
         logger.debug("Unstripped output: {}".format(repr(string_buffer)))
 
-        code_save_cursor = chr(27) + r"7"
-        code_scroll_screen = chr(27) + r"\[r"
-        code_restore_cursor = chr(27) + r"8"
-        code_cursor_up = chr(27) + r"\[\d+A"
-        code_cursor_down = chr(27) + r"\[\d+B"
-
-        code_position_cursor = chr(27) + r"\[\d+;\d+H"
-        code_show_cursor = chr(27) + r"\[\?25h"
-        code_next_line = chr(27) + r"E"
-        code_erase_line = chr(27) + r"\[2K"
-        code_enable_scroll = chr(27) + r"\[\d+;\d+r"
-
-        code_set = [
-            code_save_cursor,
-            code_scroll_screen,
-            code_restore_cursor,
-            code_cursor_up,
-            code_cursor_down,
-            code_position_cursor,
-            code_show_cursor,
-            code_erase_line,
-            code_enable_scroll,
-        ]
-
-        output = string_buffer
-        for ansi_esc_code in code_set:
-            output = re.sub(ansi_esc_code, "", output)
-
-        # CODE_NEXT_LINE must substitute with '\n'
-        output = re.sub(code_next_line, "\n", output)
+        output = utils.strip_ansi_escape_codes(string_buffer)
 
         logger.debug("Stripped output: {}".format(repr(output)))
 
@@ -566,6 +1254,15 @@ class BaseDevice(object):
     async def disconnect(self):
         """ Gracefully close the SSH connection """
         logger.info("Host {}: Disconnecting".format(self._host))
-        await self._cleanup()
-        await self._conn.close()
+        if self._health_monitor is not None:
+            self._health_monitor.cancel()
+            self._health_monitor = None
+        if self._protocol != 'ssh_exec':
+            await self._cleanup()
+        try:
+            await self._conn.close()
+        finally:
+            if self._tunnel_lease is not None:
+                self._tunnel_lease.release()
+                self._tunnel_lease = None
         # await self._conn.wait_closed()
@@ -29,6 +29,9 @@ class CiscoASA(IOSLikeDevice):
 
     _disable_paging_command = "terminal pager 0"
 
+    _file_md5_command = "verify /md5 {}"
+    """Command printing MD5 of the file on the device"""
+
     @property
     def multiple_mode(self):
         """ Returning Bool True if ASA in multiple mode"""
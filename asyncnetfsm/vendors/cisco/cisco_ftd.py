@@ -2,7 +2,6 @@
 import re
 from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 from asyncnetfsm.logger import logger
-from asyncnetfsm import utils
 
 
 class CiscoFTD(IOSLikeDevice):
@@ -15,9 +14,13 @@ class CiscoFTD(IOSLikeDevice):
 
     _disable_paging_command = "terminal pager 0"
 
+    _pipeline_commands = False
+    """FTD has own send_command which strips the output differently, so commands are sent one by one"""
+
     async def _session_preparation(self):
         await self._flush_buffer()
-        await self._set_base_prompt()
+        if self._fingerprint is None:
+            await self._set_base_prompt()
 
     async def send_command(
             self,
@@ -26,7 +29,10 @@ class CiscoFTD(IOSLikeDevice):
             re_flags=0,
             strip_command=True,
             strip_prompt=True,
-            use_textfsm=False
+            use_textfsm=False,
+            timeout=None,
+            idle_timeout=None,
+            structured=None
     ):
         """
         Sending command to device (support interactive commands with pattern)
@@ -36,29 +42,27 @@ class CiscoFTD(IOSLikeDevice):
         :param re.flags re_flags: re flags for pattern
         :param bool strip_command: True or False for stripping command from output
         :param bool strip_prompt: True or False for stripping ending device prompt
+        :param float timeout: total time in seconds for reading the output. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param str structured: 'native' or 'textfsm', FTD has no JSON output so both parse with TextFSM
         :return: The output of the command
         """
         logger.info("Host {}: Sending command".format(self._host))
+        use_textfsm = use_textfsm or structured is not None
         output = ""
         command_string = self._normalize_cmd(command_string)
         logger.info(
             "Host {}: Send command: {}".format(self._host, repr(command_string))
         )
         self._conn.send(command_string)
-        output = await self._conn.read_until_pattern('>', re_flags=0, read_for=0)
+        output = await self._conn.read_until_pattern(
+            '>', re_flags=0, read_for=0, timeout=timeout, idle_timeout=idle_timeout
+        )
 
-        # Some platforms have ansi_escape codes
-        if self._ansi_escape_codes:
-            output = self._strip_ansi_escape_codes(output)
-        output = self._normalize_linefeeds(output)
-        if strip_prompt:
-            output = self._strip_prompt(output)
-        if strip_command:
-            output = self._strip_command(command_string, output)
+        output = self._process_output(output, command_string, strip_command, strip_prompt)
 
         if use_textfsm:
-            logger.info("parsing output using texfsm, command=%r," % command_string)
-            output = utils.get_structured_data(output, self._device_type, command_string)
+            output = await self._parse_textfsm(output, command_string)
         logger.info(
             "Host {}: Send command output: {}".format(self._host, repr(output))
         )
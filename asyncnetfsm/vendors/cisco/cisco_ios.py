@@ -4,4 +4,5 @@ from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 class CiscoIOS(IOSLikeDevice):
     """Class for working with Cisco IOS/IOS XE"""
 
-    pass
+    _file_md5_command = "verify /md5 {}"
+    """Command printing MD5 of the file on the device"""
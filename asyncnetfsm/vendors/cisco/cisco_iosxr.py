@@ -1,4 +1,8 @@
-from asyncnetfsm.exceptions import AsyncnetfsmCommitError
+import os
+import re
+
+from asyncnetfsm.connections.buffer import OutputBuffer
+from asyncnetfsm.exceptions import AsyncnetfsmCommitError, AsyncnetfsmConfigError
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 
@@ -21,12 +25,30 @@ class CiscoIOSXR(IOSLikeDevice):
     _show_commit_changes = "show configuration commit changes"
     """Command for showing the other commit which have occurred during our session"""
 
+    _config_file_dir = "harddisk:/"
+    """File system for the configuration file uploaded by load_config_file"""
+
+    _config_file_delete_command = "delete /noprompt {}"
+    """Command for removing the configuration file uploaded by load_config_file"""
+
+    _load_command = "load {}"
+    """Command for loading the configuration file into the target configuration"""
+
+    _load_failed_pattern = r"errors in one or more commands|Couldn't open file|No such file"
+    """Marker of the failed load in the output of _load_command"""
+
+    _show_load_failed = "show configuration failed load"
+    """Command for showing the lines rejected by load"""
+
     async def send_config_set(
         self,
         config_commands=None,
         with_commit=True,
         commit_comment="",
         exit_config_mode=True,
+        timeout=None,
+        idle_timeout=None,
+        window=None,
     ):
         """
         Sending configuration commands to device
@@ -36,6 +58,10 @@ class CiscoIOSXR(IOSLikeDevice):
         :param bool with_commit: if true it commit all changes after applying all config_commands
         :param string commit_comment: message for configuration commit
         :param bool exit_config_mode: If true it will quit from configuration mode automatically
+        :param float timeout: total time in seconds for sending all config_commands. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param int window: maximum number of lines sent ahead, the push stops at the first rejected line.
+            Default is waiting for the prompt after every line
         :return: The output of these commands
         """
 
@@ -45,30 +71,10 @@ class CiscoIOSXR(IOSLikeDevice):
         # Send config commands
         output = await self.config_mode()
         output += await super(IOSLikeDevice, self).send_config_set(
-            config_commands=config_commands
+            config_commands=config_commands, timeout=timeout, idle_timeout=idle_timeout, window=window
         )
         if with_commit:
-            commit = type(self)._commit_command
-            if commit_comment:
-                commit = type(self)._commit_comment_command.format(commit_comment)
-
-            self._conn.send(self._normalize_cmd(commit))
-            output += await self._conn.read_until_prompt_or_pattern(
-                r"Do you wish to proceed with this commit anyway\?"
-            )
-            if "Failed to commit" in output:
-                show_config_failed = type(self)._show_config_failed
-                reason = await self.send_command(
-                    self._normalize_cmd(show_config_failed)
-                )
-                raise AsyncnetfsmCommitError(self._host, reason)
-            if "One or more commits have occurred" in output:
-                show_commit_changes = type(self)._show_commit_changes
-                self._conn.send(self._normalize_cmd("no"))
-                reason = await self.send_command(
-                    self._normalize_cmd(show_commit_changes)
-                )
-                raise AsyncnetfsmCommitError(self._host, reason)
+            output += await self._commit(commit_comment)
 
         if exit_config_mode:
             output += await self.exit_config_mode()
@@ -79,6 +85,108 @@ class CiscoIOSXR(IOSLikeDevice):
         )
         return output
 
+    async def load_config_file(
+        self,
+        local_path,
+        remote_path=None,
+        with_commit=True,
+        commit_comment="",
+        exit_config_mode=True,
+        timeout=None,
+        idle_timeout=None,
+    ):
+        """
+        Upload configuration file over SFTP, load it into the target configuration and commit it
+
+        The device parses the whole file at once, so the push doesn't wait for the prompt after every line.
+        If the device rejects any line, the target configuration is aborted and nothing is committed.
+        The uploaded file is removed from the device at the end.
+
+        :param str local_path: path of the configuration file
+        :param str remote_path: path of the file on the device. Default is the name of the local file
+            in _config_file_dir
+        :param bool with_commit: if true it commit the loaded configuration
+        :param string commit_comment: message for configuration commit
+        :param bool exit_config_mode: If true it will quit from configuration mode automatically
+        :param float timeout: total time in seconds for the load and for the commit. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout,
+            big files can need more
+        :return: The output of the load and the commit
+        """
+        if remote_path is None:
+            remote_path = type(self)._config_file_dir + os.path.basename(local_path)
+        await self.put_file(local_path, remote_path, resume=False)
+        try:
+            return await self._load_config_file(
+                remote_path, with_commit, commit_comment, exit_config_mode, timeout, idle_timeout
+            )
+        finally:
+            await self._delete_config_file(remote_path)
+
+    async def _load_config_file(self, remote_path, with_commit, commit_comment, exit_config_mode, timeout,
+                                idle_timeout):
+        """Load the uploaded configuration file into the target configuration and commit it"""
+        output = OutputBuffer()
+        output.append(await self.config_mode())
+        command = self._normalize_cmd(type(self)._load_command.format(remote_path))
+        logger.info("Host {}: Loading configuration file: {}".format(self._host, repr(command)))
+        self._conn.send(command)
+        load_output = await self._conn.read_until_prompt(timeout=timeout, idle_timeout=idle_timeout)
+        output.append(load_output)
+        if re.search(type(self)._load_failed_pattern, load_output):
+            reason = await self.send_command(type(self)._show_load_failed)
+            # Lines loaded before the error must not stay in the target configuration
+            self._conn.send(self._normalize_cmd(type(self)._abort_command))
+            output.append(await self._conn.read_until_prompt())
+            raise AsyncnetfsmConfigError(
+                self._host, None, "Loading {} failed: {}".format(remote_path, reason.strip()),
+                output=self._normalize_linefeeds(output.getvalue())
+            )
+        if with_commit:
+            output.append(await self._commit(commit_comment, timeout=timeout, idle_timeout=idle_timeout))
+
+        if exit_config_mode:
+            output.append(await self.exit_config_mode())
+
+        output = self._normalize_linefeeds(output.getvalue())
+        logger.debug(
+            "Host {}: Load configuration file output: {}".format(self._host, repr(output))
+        )
+        return output
+
+    async def _commit(self, commit_comment="", timeout=None, idle_timeout=None):
+        """
+        Commit the target configuration
+
+        :param string commit_comment: message for configuration commit
+        :param float timeout: total time in seconds for the commit. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :return: The output of the commit
+        """
+        commit = type(self)._commit_command
+        if commit_comment:
+            commit = type(self)._commit_comment_command.format(commit_comment)
+
+        self._conn.send(self._normalize_cmd(commit))
+        output = await self._conn.read_until_prompt_or_pattern(
+            r"Do you wish to proceed with this commit anyway\?", timeout=timeout, idle_timeout=idle_timeout
+        )
+        if "Failed to commit" in output:
+            show_config_failed = type(self)._show_config_failed
+            reason = await self.send_command(
+                self._normalize_cmd(show_config_failed)
+            )
+            raise AsyncnetfsmCommitError(self._host, None, reason)
+        if self._conn.last_match and self._conn.last_match.index > 0:
+            show_commit_changes = type(self)._show_commit_changes
+            self._conn.send(self._normalize_cmd("no"))
+            await self._conn.read_until_prompt()
+            reason = await self.send_command(
+                self._normalize_cmd(show_commit_changes)
+            )
+            raise AsyncnetfsmCommitError(self._host, None, reason)
+        return output
+
     async def exit_config_mode(self):
         """Exit from configuration mode"""
         logger.info("Host {}: Exiting from configuration mode".format(self._host))
@@ -89,7 +197,7 @@ class CiscoIOSXR(IOSLikeDevice):
             output = await self._conn.read_until_prompt_or_pattern(
                 r"Uncommitted changes found"
             )
-            if "Uncommitted changes found" in output:
+            if self._conn.last_match and self._conn.last_match.index > 0:
                 self._conn.send(self._normalize_cmd("no"))
                 output += await self._conn.read_until_prompt()
             if await self.check_config_mode():
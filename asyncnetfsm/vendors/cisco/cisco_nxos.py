@@ -1,5 +1,3 @@
-import re
-
 from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 
 
@@ -7,11 +5,25 @@ class CiscoNXOS(IOSLikeDevice):
     """Class for working with Cisco Nexus/NX-OS"""
     _disable_paging_command = "terminal length 0"
 
+    _json_command_suffix = "| json"
+    """Modifier for JSON output of show commands"""
+
+    _file_md5_command = "show file {} md5sum"
+    """Command printing MD5 of the file on the device"""
+
+    _config_file_dir = "bootflash:"
+    """File system for the configuration file uploaded by load_config_file"""
+
+    _config_file_delete_command = "delete {} no-prompt"
+    """Command for removing the configuration file uploaded by load_config_file"""
+
+    _config_error_patterns = IOSLikeDevice._config_error_patterns + [r"% Invalid command"]
+    """Markers of the configuration line rejected by the device"""
+
     @staticmethod
     def _normalize_linefeeds(a_string):
         """
         Convert '\r\n' or '\r\r\n' to '\n, and remove extra '\r's in the text
         """
-        newline = re.compile(r"(\r\r\n|\r\n)")
-
-        return newline.sub("\n", a_string).replace("\r", "")
+        # Removing every '\r' converts '\r\n' and '\r\r\n' to '\n' too
+        return a_string.replace("\r", "")
@@ -6,6 +6,7 @@ Connection Method are based upon AsyncSSH and should be running in asyncio loop
 
 import re
 
+from asyncnetfsm.constants import MODE_SYSTEM_VIEW, MODE_USER
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.base import BaseDevice
 
@@ -41,6 +42,12 @@ class ComwareLikeDevice(BaseDevice):
     _system_view_check = "]"
     """Checking string in prompt. If it's exist im prompt - we are in system view"""
 
+    _config_error_patterns = [
+        r"% Unrecognized command", r"% Incomplete command", r"% Wrong parameter", r"% Too many parameters",
+        r"% Ambiguous command", r"Error:",
+    ]
+    """Markers of the configuration line rejected by the device"""
+
     async def _set_base_prompt(self):
         """
         Setting two important vars
@@ -66,15 +73,22 @@ class ComwareLikeDevice(BaseDevice):
         )
         logger.debug("Host {}: Base Prompt: {}".format(self._host, self._base_prompt))
         logger.debug("Host {}: Base Pattern: {}".format(self._host, self._base_pattern))
+        self.device_prompt = self._base_prompt
+        self.prompt_pattern = self._base_pattern
+        self._conn.set_base_prompt(self._base_prompt)
+        self._conn.set_base_pattern(self._base_pattern)
         return self._base_prompt
 
+    def _classify_prompt(self, prompt):
+        """Return the mode of the session for the prompt line"""
+        if type(self)._system_view_check in prompt:
+            return MODE_SYSTEM_VIEW
+        return MODE_USER
+
     async def _check_system_view(self):
         """Check if we are in system view. Return boolean"""
         logger.info("Host {}: Checking system view".format(self._host))
-        check_string = type(self)._system_view_check
-        self._stdin.write(self._normalize_cmd("\n"))
-        output = await self._read_until_prompt()
-        return check_string in output
+        return await self._get_mode() == MODE_SYSTEM_VIEW
 
     async def _system_view(self):
         """Enter to system view"""
@@ -82,8 +96,8 @@ class ComwareLikeDevice(BaseDevice):
         output = ""
         system_view_enter = type(self)._system_view_enter
         if not await self._check_system_view():
-            self._stdin.write(self._normalize_cmd(system_view_enter))
-            output += await self._read_until_prompt()
+            self._conn.send(self._normalize_cmd(system_view_enter))
+            output += await self._conn.read_until_prompt()
             if not await self._check_system_view():
                 raise ValueError("Failed to enter to system view")
         return output
@@ -94,19 +108,25 @@ class ComwareLikeDevice(BaseDevice):
         output = ""
         system_view_exit = type(self)._system_view_exit
         if await self._check_system_view():
-            self._stdin.write(self._normalize_cmd(system_view_exit))
-            output += await self._read_until_prompt()
+            self._conn.send(self._normalize_cmd(system_view_exit))
+            output += await self._conn.read_until_prompt()
             if await self._check_system_view():
                 raise ValueError("Failed to exit from system view")
         return output
 
-    async def send_config_set(self, config_commands=None, exit_system_view=False):
+    async def send_config_set(
+            self, config_commands=None, exit_system_view=False, timeout=None, idle_timeout=None, window=None
+    ):
         """
         Sending configuration commands to device
         Automatically exits/enters system-view.
 
         :param list config_commands: iterable string list with commands for applying to network devices in system view
         :param bool exit_system_view: If true it will quit from system view automatically
+        :param float timeout: total time in seconds for sending all config_commands. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param int window: maximum number of lines sent ahead, the push stops at the first rejected line.
+            Default is waiting for the prompt after every line
         :return: The output of this commands
         """
 
@@ -115,7 +135,9 @@ class ComwareLikeDevice(BaseDevice):
 
         # Send config commands
         output = await self._system_view()
-        output += await super().send_config_set(config_commands=config_commands)
+        output += await super().send_config_set(
+            config_commands=config_commands, timeout=timeout, idle_timeout=idle_timeout, window=window
+        )
 
         if exit_system_view:
             output += await self._exit_system_view()
@@ -3,12 +3,16 @@ from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 
 class FortinetFortigate(IOSLikeDevice):
 
+    _pipeline_commands = False
+    """FortiOS discards the input typed ahead while the command is running"""
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     async def _session_preparation(self):
         await self._flush_buffer()
-        await self._set_base_prompt()
+        if self._fingerprint is None:
+            await self._set_base_prompt()
 
     async def config_mode(self, config_command=""):
         """No config mode for Fortinet devices."""
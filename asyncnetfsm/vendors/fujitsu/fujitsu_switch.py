@@ -2,6 +2,7 @@
 
 import re
 
+from asyncnetfsm import utils
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.ios_like import IOSLikeDevice
 
@@ -44,5 +45,4 @@ class FujitsuSwitch(IOSLikeDevice):
         """
         Convert '\r\r\n','\r\n', '\n\r' to '\n and remove extra '\n\n' in the text
         """
-        newline = re.compile(r"(\r\r\n|\r\n|\n\r)")
-        return newline.sub("\n", a_string).replace("\n\n", "\n")
+        return utils.normalize_linefeeds(a_string).replace("\n\n", "\n")
@@ -61,6 +61,9 @@ class HW1000(BaseDevice):
     _shell_enter_message = "Are you sure you want to exit to the Linux system shell?"
     """Confirmation message for entering Linux shell"""
 
+    _pipeline_commands = False
+    """Commands may ask for confirmation, so they are sent one by one"""
+
     async def connect(self):
         """
         Basic asynchronous connection method for HW1000 devices
@@ -71,11 +74,14 @@ class HW1000(BaseDevice):
         * _establish_connection() for connecting to device
         * _set_base_prompt() for finding and setting device prompt
         * _enable() for getting privilege exec mode
+
+        With protocol 'ssh_exec' there is no interactive session, so only the connection is established
         """
         logger.info("Host {}: Trying to connect to the device".format(self._host))
         await self._establish_connection()
-        await self._set_base_prompt()
-        await self.enable_mode()
+        if self._protocol != 'ssh_exec':
+            await self._set_base_prompt()
+            await self.enable_mode()
         logger.info("Host {}: Has connected to the device".format(self._host))
 
     async def check_enable_mode(self):
@@ -4,8 +4,12 @@ IOSLikeDevice Class is abstract class for using in Cisco IOS like devices
 Connection Method are based upon AsyncSSH and should be running in asyncio loop
 """
 
+import os
 import re
 
+from asyncnetfsm.connections.buffer import OutputBuffer
+from asyncnetfsm.constants import MODE_CONFIG, MODE_PRIVILEGED, MODE_SUB_CONFIG, MODE_USER
+from asyncnetfsm.exceptions import AsyncnetfsmConfigError
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.base import BaseDevice
 
@@ -62,36 +66,59 @@ class IOSLikeDevice(BaseDevice):
     _disable_width_command = "terminal width 511"
     """Command for disabling paging"""
 
+    _config_error_patterns = [r"% Invalid input", r"% Incomplete command", r"% Ambiguous command", r"^% ?Error"]
+    """Markers of the configuration line rejected by the device"""
+
+    _config_file_dir = "flash:"
+    """File system for the configuration file uploaded by load_config_file"""
+
+    _config_copy_command = "copy {} running-config"
+    """Command for merging the configuration file into running configuration"""
+
+    _config_copy_questions = [r"Destination filename \[.*?\]\?", r"\[confirm\]"]
+    """Questions of the copy command which are answered with the default"""
+
+    _config_copy_error = r"^% ?Error[^\r\n]*\r?\n"
+    """Error line of the failed copy command, for example missing file"""
+
+    _config_file_delete_command = "delete /force {}"
+    """Command for removing the configuration file uploaded by load_config_file"""
+
     async def _session_preparation(self):
         await super()._session_preparation()
         await self.enable_mode()
         await self._disable_paging()
         await self._disable_width()
 
+    def _classify_prompt(self, prompt):
+        """Return the mode of the session for the prompt line"""
+        if type(self)._config_check in prompt:
+            return MODE_SUB_CONFIG if "(config-" in prompt else MODE_CONFIG
+        if type(self)._priv_check in prompt:
+            return MODE_PRIVILEGED
+        return MODE_USER
+
     async def check_enable_mode(self):
         """Check if we are in privilege exec. Return boolean"""
         logger.info("Host {}: Checking privilege exec".format(self._host))
-        check_string = type(self)._priv_check
-        self._conn.send(self._normalize_cmd("\n"))
-        output = await self._conn.read_until_prompt()
-        return check_string in output
+        return await self._get_mode() in (MODE_PRIVILEGED, MODE_CONFIG, MODE_SUB_CONFIG)
 
     async def enable_mode(self, pattern="password", re_flags=re.IGNORECASE):
         """Enter to privilege exec"""
         logger.info("Host {}: Entering to privilege exec".format(self._host))
-        output = ""
+        output = OutputBuffer()
         enable_command = type(self)._priv_enter
         if not await self.check_enable_mode():
             self._conn.send(self._normalize_cmd(enable_command))
-            output += await self._conn.read_until_prompt_or_pattern(
+            output.append(await self._conn.read_until_prompt_or_pattern(
                 pattern=pattern, re_flags=re_flags
-            )
-            if re.search(pattern, output, re_flags):
+            ))
+            if self._conn.last_match and self._conn.last_match.index > 0:
                 self._conn.send(self._normalize_cmd(self._secret))
-                output += await self._conn.read_until_prompt()
+                output.append(await self._conn.read_until_prompt())
             if not await self.check_enable_mode():
                 raise ValueError("Failed to enter to privilege exec")
-        return output
+        return output.getvalue()
 
     async def exit_enable_mode(self):
         """Exit from privilege exec"""
@@ -100,7 +127,7 @@ class IOSLikeDevice(BaseDevice):
         exit_enable = type(self)._priv_exit
         if await self.check_enable_mode():
             self._conn.send(self._normalize_cmd(exit_enable))
-            output += await self._conn.read_until_prompt()
+            output = await self._conn.read_until_prompt()
             if await self.check_enable_mode():
                 raise ValueError("Failed to exit from privilege exec")
         return output
@@ -108,10 +135,7 @@ class IOSLikeDevice(BaseDevice):
     async def check_config_mode(self):
         """Checks if the device is in configuration mode or not"""
         logger.info("Host {}: Checking configuration mode".format(self._host))
-        check_string = type(self)._config_check
-        self._conn.send(self._normalize_cmd("\n"))
-        output = await self._conn.read_until_prompt()
-        return check_string in output
+        return await self._get_mode() in (MODE_CONFIG, MODE_SUB_CONFIG)
 
     async def config_mode(self):
         """Enter into config_mode"""
@@ -137,13 +161,19 @@ class IOSLikeDevice(BaseDevice):
                 raise ValueError("Failed to exit from configuration mode")
         return output
 
-    async def send_config_set(self, config_commands=None, exit_config_mode=True):
+    async def send_config_set(
+            self, config_commands=None, exit_config_mode=True, timeout=None, idle_timeout=None, window=None
+    ):
         """
         Sending configuration commands to Cisco IOS like devices
         Automatically exits/enters configuration mode.
 
         :param list config_commands: iterable string list with commands for applying to network devices in conf mode
         :param bool exit_config_mode: If true it will quit from configuration mode automatically
+        :param float timeout: total time in seconds for sending all config_commands. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param int window: maximum number of lines sent ahead, the push stops at the first rejected line.
+            Default is waiting for the prompt after every line
         :return: The output of this commands
         """
 
@@ -152,18 +182,100 @@ class IOSLikeDevice(BaseDevice):
 
         # Send config commands
         await self.config_mode()
-        output = ''
-        output += await super().send_config_set(config_commands=config_commands)
+        output = OutputBuffer()
+        output.append(await super().send_config_set(
+            config_commands=config_commands, timeout=timeout, idle_timeout=idle_timeout, window=window
+        ))
 
         if exit_config_mode:
-            output += await self.exit_config_mode()
+            output.append(await self.exit_config_mode())
 
-        output = self._normalize_linefeeds(output)
+        output = self._normalize_linefeeds(output.getvalue())
         logger.debug(
             "Host {}: Config commands output: {}".format(self._host, repr(output))
         )
         return output
 
+    async def load_config_file(self, local_path, remote_path=None, timeout=None, idle_timeout=None):
+        """
+        Upload configuration file over SFTP and merge it into running configuration with one copy command
+
+        The device applies the whole file at once, so the push doesn't wait for the prompt after every line.
+        Lines rejected by the device don't stop the copy, the first of them is reported after it.
+        The failed copy is reported as soon as its error line arrives. The uploaded file is removed
+        from the device at the end.
+
+        :param str local_path: path of the configuration file
+        :param str remote_path: path of the file on the device. Default is the name of the local file
+            in _config_file_dir
+        :param float timeout: total time in seconds for the copy command. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout,
+            big files can need more
+        :return: The output of the copy command
+        """
+        if remote_path is None:
+            remote_path = type(self)._config_file_dir + os.path.basename(local_path)
+        await self.put_file(local_path, remote_path, resume=False)
+        try:
+            output = await self._copy_config_file(remote_path, timeout, idle_timeout)
+        finally:
+            await self._delete_config_file(remote_path)
+        return output
+
+    async def _copy_config_file(self, remote_path, timeout=None, idle_timeout=None):
+        """Merge the uploaded configuration file into running configuration and return the output"""
+        if await self.check_config_mode():
+            await self.exit_config_mode()
+
+        command = self._normalize_cmd(type(self)._config_copy_command.format(remote_path))
+        logger.info("Host {}: Loading configuration file: {}".format(self._host, repr(command)))
+        self._conn.send(command)
+        # The echo of the command can contain the hostname, for example in the file name,
+        # so the prompt is the whole base pattern at the beginning of the line
+        prompt = r"^(?:{})".format(self._conn._base_pattern)
+        patterns = [prompt, type(self)._config_copy_error] + type(self)._config_copy_questions
+        output = OutputBuffer()
+        while True:
+            output.append(await self._conn.read_until_pattern(
+                patterns, re_flags=re.MULTILINE, timeout=timeout, idle_timeout=idle_timeout
+            ))
+            match = self._conn.last_match
+            if not match or match.index == 0:
+                break
+            if match.index == 1:
+                # The copy is aborted, the prompt follows the error
+                output.append(await self._conn.read_until_prompt(timeout=timeout, idle_timeout=idle_timeout))
+                raise AsyncnetfsmConfigError(
+                    self._host, None, "Loading {} failed: {}".format(remote_path, match.text.strip()),
+                    output=self._normalize_linefeeds(output.getvalue())
+                )
+            self._conn.send(self._normalize_cmd(""))
+
+        output = self._normalize_linefeeds(output.getvalue())
+        logger.debug("Host {}: Load configuration file output: {}".format(self._host, repr(output)))
+        found = self._conn._get_pattern_set(type(self)._config_error_patterns, re.MULTILINE).search(output)
+        if found:
+            error = found[1]
+            line_start = output.rfind("\n", 0, error.start()) + 1
+            line_end = output.find("\n", error.end())
+            reason = "Loading {} failed: {}".format(
+                remote_path, output[line_start:line_end if line_end != -1 else None].strip()
+            )
+            raise AsyncnetfsmConfigError(self._host, None, reason, output=output)
+        return output
+
+    async def _delete_config_file(self, path):
+        """Remove the uploaded configuration file from the device, the failure is only logged"""
+        command = type(self)._config_file_delete_command.format(path)
+        try:
+            if await self.check_config_mode():
+                command = "do " + command
+            logger.info("Host {}: Deleting configuration file: {}".format(self._host, repr(command)))
+            self._conn.send(self._normalize_cmd(command))
+            await self._conn.read_until_prompt()
+        except Exception as e:
+            logger.warning("Host {}: Deleting {} failed: {}".format(self._host, path, repr(e)))
+
     async def _disable_paging(self):
         """Disable paging method"""
         logger.info("Host {}: Trying to disable paging".format(self._host))
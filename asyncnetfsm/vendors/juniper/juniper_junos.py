@@ -1,3 +1,5 @@
+from asyncnetfsm.connections import NetconfSession
+from asyncnetfsm.constants import MODE_USER
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.junos_like import JunOSLikeDevice
 
@@ -16,19 +18,37 @@ class JuniperJunOS(JunOSLikeDevice):
 
     _disable_width_command = "terminal width 10000"
 
+    _json_command_suffix = "| display json"
+    """Modifier for JSON output of operational commands"""
+
+    _file_md5_command = "file checksum md5 {}"
+    """Command printing MD5 of the file on the device"""
+
     async def _session_preparation(self):
         """ Prepare session before start using it """
         await super()._session_preparation()
         await self.cli_mode()
         await self._disable_paging()
 
+    async def netconf(self):
+        """
+        Open NETCONF session in the netconf subsystem of the SSH connection of this device
+
+        The device must be connected with protocol 'ssh' or 'ssh_exec' and have netconf over ssh enabled
+        (set system services netconf ssh). The session should be closed after use.
+
+        :return: :class:`NetconfSession <asyncnetfsm.connections.NetconfSession>` after hello exchange
+        """
+        if self._protocol not in ('ssh', 'ssh_exec'):
+            raise ValueError("NETCONF requires SSH connection")
+        session = NetconfSession(self._conn._conn, host=self._host, timeout=self._timeout)
+        await session.connect()
+        return session
+
     async def check_cli_mode(self):
         """Check if we are in cli mode. Return boolean"""
         logger.info("Host {}: Checking shell mode".format(self._host))
-        cli_check = type(self)._cli_check
-        self._conn.send(self._normalize_cmd("\n"))
-        output = await self._conn.read_until_prompt()
-        return cli_check in output
+        return await self._get_mode() == MODE_USER
 
     async def cli_mode(self):
         """Enter to cli mode"""
@@ -4,11 +4,15 @@ JunOSLikeDevice Class is abstract class for using in Juniper JunOS like devices
 Connection Method are based upon AsyncSSH and should be running in asyncio loop
 """
 
+import asyncio
 import re
 
+from asyncnetfsm.connections.buffer import OutputBuffer
+from asyncnetfsm.connections.timer import ReadTimer
+from asyncnetfsm.constants import MODE_CONFIG, MODE_SHELL, MODE_USER
+from asyncnetfsm.exceptions import AsyncnetfsmCommitError, AsyncnetfsmConfigError, AsyncnetfsmConnectionError
 from asyncnetfsm.logger import logger
 from asyncnetfsm.vendors.base import BaseDevice
-from asyncnetfsm import utils
 
 
 class JunOSLikeDevice(BaseDevice):
@@ -47,61 +51,45 @@ class JunOSLikeDevice(BaseDevice):
 
     _commit_comment_command = "commit comment {}"
     """Command for committing changes with comment"""
-    async def _session_preparation(self):
-        """ Prepare session before start using it """
-        await self._flush_buffer()
-        await self._set_base_prompt()
 
-    async def _flush_buffer(self):
-        """ flush unnecessary data """
-        logger.debug("Flushing buffers")
-        delimiters = map(re.escape, type(self)._delimiter_list)
-        delimiters = r"|".join(delimiters)
-        await self._conn.read_until_pattern(delimiters)
+    _config_error_patterns = [r"^\s*syntax error", r"^\s*unknown command", r"^\s*error:", r"^\s*missing argument"]
+    """Markers of the configuration line rejected by the device"""
 
-    async def send_command(
-        self,
-        command_string,
-        pattern="",
-        re_flags=0,
-        strip_command=True,
-        strip_prompt=True,
-        use_textfsm=False
-    ):
-        """
-        Sending command to device (support interactive commands with pattern)
-
-        :param str command_string: command for executing basically in privilege mode
-        :param str pattern: pattern for waiting in output (for interactive commands)
-        :param re.flags re_flags: re flags for pattern
-        :param bool strip_command: True or False for stripping command from output
-        :param bool strip_prompt: True or False for stripping ending device prompt
-        :return: The output of the command
-        """
-        logger.info("Host {}: Sending command".format(self._host))
-        output = ""
-        command_string = self._normalize_cmd(command_string)
-        logger.info(
-            "Host {}: Send command: {}".format(self._host, repr(command_string))
-        )
-        output = await self.send_command_expect(command_string, pattern, re_flags)
+    _load_command = "load {} terminal"
+    """Command for loading configuration typed in the terminal, {} is 'set' or 'merge'"""
 
-        # Some platforms have ansi_escape codes
-        if self._ansi_escape_codes:
-            output = self._strip_ansi_escape_codes(output)
-        output = self._normalize_linefeeds(output)
-        if strip_prompt:
-            output = self._strip_prompt(output)
-        if strip_command:
-            output = self._strip_command(command_string, output)
-
-        if use_textfsm:
-            logger.info("parsing output using texfsm, command=%r," % command_string)
-            output = utils.get_structured_data(output, self._device_type, command_string)
-        logger.info(
-            "Host {}: Send command output: {}".format(self._host, repr(output))
-        )
-        return output
+    _load_ready_pattern = r"\[Type \^D at a new line to end input\]\r*\n"
+    """Line of the device waiting for the configuration after _load_command, its line feed isn't echo of the payload"""
+
+    _load_end = "\x04"
+    """Ctrl-D ending the input of _load_command"""
+
+    _load_chunk_size = 16384
+    """Number of bytes sent in load terminal before waiting for their echo"""
+
+    _load_summary_pattern = r"load complete(?: \((\d+) errors?\))?"
+    """Summary of load terminal with the number of errors"""
+
+    _load_error_pattern = r"^terminal:\d+:.*$"
+    """Lines rejected by load terminal"""
+
+    _commit_check_command = "commit check"
+    """Command for validating the candidate configuration"""
+
+    _commit_check_success = "configuration check succeeds"
+    """Output of the successful commit check"""
+
+    _commit_success = "commit complete"
+    """Output of the successful commit"""
+
+    _rollback_command = "rollback 0"
+    """Command for discarding the changes of the candidate configuration"""
+
+    async def _session_preparation(self):
+        """ Prepare session before start using it """
+        await self._flush_buffer()
+        if self._fingerprint is None:
+            await self._set_base_prompt()
 
     async def _set_base_prompt(self):
         """
@@ -134,13 +122,18 @@ class JunOSLikeDevice(BaseDevice):
         self.prompt_pattern = base_pattern
         self._conn.set_base_pattern(base_pattern)
 
+    def _classify_prompt(self, prompt):
+        """Return the mode of the session for the prompt line, operational mode is MODE_USER"""
+        if type(self)._config_check in prompt:
+            return MODE_CONFIG
+        if ">" in prompt:
+            return MODE_USER
+        return MODE_SHELL
+
     async def check_config_mode(self):
         """Check if are in configuration mode. Return boolean"""
         logger.info("Host {}: Checking configuration mode".format(self._host))
-        check_string = type(self)._config_check
-        self._conn.send(self._normalize_cmd("\n"))
-        output = await self._conn.read_until_prompt()
-        return check_string in output
+        return await self._get_mode() == MODE_CONFIG
 
     async def config_mode(self):
         """Enter to configuration mode"""
@@ -149,7 +142,7 @@ class JunOSLikeDevice(BaseDevice):
         config_enter = type(self)._config_enter
         if not await self.check_config_mode():
             self._conn.send(self._normalize_cmd(config_enter))
-            output += await self._conn.read_until_prompt()
+            output = await self._conn.read_until_prompt()
             if not await self.check_config_mode():
                 raise ValueError("Failed to enter to configuration mode")
         return output
@@ -161,7 +154,7 @@ class JunOSLikeDevice(BaseDevice):
         config_exit = type(self)._config_exit
         if await self.check_config_mode():
             self._conn.send(self._normalize_cmd(config_exit))
-            output += await self._conn.read_until_prompt()
+            output = await self._conn.read_until_prompt()
             if await self.check_config_mode():
                 raise ValueError("Failed to exit from configuration mode")
         return output
@@ -172,38 +165,179 @@ class JunOSLikeDevice(BaseDevice):
         with_commit=True,
         commit_comment="",
         exit_config_mode=True,
+        timeout=None,
+        idle_timeout=None,
+        window=None,
+        load=None,
     ):
         """
         Sending configuration commands to device
         By default automatically exits/enters configuration mode.
 
+        With load the commands are sent at once with "load set terminal" or "load merge terminal"
+        instead of waiting for the prompt after every line. Rejected lines, failed commit check
+        or failed commit roll the candidate configuration back and raise an error.
+
         :param list config_commands: iterable string list with commands for applying to network devices in system view
         :param bool with_commit: if true it commit all changes after applying all config_commands
         :param string commit_comment: message for configuration commit
         :param bool exit_config_mode: If true it will quit from configuration mode automatically
+        :param float timeout: total time in seconds for sending all config_commands. Default is no limit
+        :param float idle_timeout: time in seconds without any data from the channel. Default is device timeout
+        :param int window: maximum number of lines sent ahead, the push stops at the first rejected line.
+            Default is waiting for the prompt after every line
+        :param str load: 'set' for set commands or 'merge' for configuration in curly brace format
         :return: The output of these commands
         """
 
         if config_commands is None:
             return ""
+        if load is not None:
+            if load not in ("set", "merge"):
+                raise ValueError("load must be 'set' or 'merge'")
+            if window is not None:
+                raise ValueError("window can't be used with load")
+            return await self._send_config_load(
+                config_commands, load, with_commit, commit_comment, exit_config_mode, timeout, idle_timeout
+            )
 
         # Send config commands
         await self.config_mode()
-        output = ''
-        output += await super().send_config_set(config_commands=config_commands)
+        output = OutputBuffer()
+        output.append(await super().send_config_set(
+            config_commands=config_commands, timeout=timeout, idle_timeout=idle_timeout, window=window
+        ))
         if with_commit:
             commit = type(self)._commit_command
             if commit_comment:
                 commit = type(self)._commit_comment_command.format(commit_comment)
 
             self._conn.send(self._normalize_cmd(commit))
-            output += await self._conn.read_until_prompt()
+            output.append(await self._conn.read_until_prompt())
 
         if exit_config_mode:
-            output += await self.exit_config_mode()
+            output.append(await self.exit_config_mode())
 
-        output = self._normalize_linefeeds(output)
+        output = self._normalize_linefeeds(output.getvalue())
         logger.debug(
             "Host {}: Config commands output: {}".format(self._host, repr(output))
         )
         return output
+
+    async def _send_config_load(
+            self, config_commands, action, with_commit, commit_comment, exit_config_mode, timeout, idle_timeout
+    ):
+        """
+        Send the commands with load terminal, check and commit them
+
+        The payload is written in chunks of _load_chunk_size bytes, the next chunk is written after
+        the device echoed as many lines as the previous one has, so the input of the device never holds
+        more than one chunk. Lines like "}" repeat in the payload, so their text can't mark the chunk end.
+        On failure the candidate is rolled back and configuration mode is left if exit_config_mode is set.
+        """
+        if isinstance(config_commands, str):
+            config_commands = config_commands.splitlines()
+        lines = [command.rstrip("\n") for command in config_commands]
+        deadline = None if timeout is None else self._loop.time() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - self._loop.time(), 0)
+
+        await self.config_mode()
+        output = OutputBuffer()
+        command = self._normalize_cmd(type(self)._load_command.format(action))
+        logger.info("Host {}: Loading {} lines: {}".format(self._host, len(lines), repr(command)))
+        self._conn.send(command)
+        output.append(await self._conn.read_until_pattern(
+            type(self)._load_ready_pattern, timeout=remaining(), idle_timeout=idle_timeout
+        ))
+
+        chunk = []
+        size = 0
+        for index, line in enumerate(lines):
+            chunk.append(line)
+            size += len(line) + 1
+            if size < type(self)._load_chunk_size and index < len(lines) - 1:
+                continue
+            self._conn.send("\n".join(chunk) + "\n")
+            output.append(await self._read_echo_lines(len(chunk), timeout=remaining(), idle_timeout=idle_timeout))
+            chunk = []
+            size = 0
+
+        self._conn.send(type(self)._load_end)
+        load_output = await self._conn.read_until_prompt(timeout=remaining(), idle_timeout=idle_timeout)
+        output.append(load_output)
+        summary = re.search(type(self)._load_summary_pattern, load_output)
+        if summary is None or summary.group(1) is not None:
+            errors = re.findall(type(self)._load_error_pattern, load_output, re.MULTILINE)
+            reason = "; ".join(error.strip() for error in errors) or (
+                summary.group(0) if summary else "load didn't complete"
+            )
+            await self._rollback(output, exit_config_mode)
+            raise AsyncnetfsmConfigError(
+                self._host, None, "Load failed: {}".format(reason), output=self._normalize_linefeeds(output.getvalue())
+            )
+
+        if with_commit:
+            self._conn.send(self._normalize_cmd(type(self)._commit_check_command))
+            check_output = await self._conn.read_until_prompt(timeout=remaining(), idle_timeout=idle_timeout)
+            output.append(check_output)
+            if type(self)._commit_check_success not in check_output:
+                await self._rollback(output, exit_config_mode)
+                raise AsyncnetfsmCommitError(self._host, None, self._commit_errors(check_output))
+
+            commit = type(self)._commit_command
+            if commit_comment:
+                commit = type(self)._commit_comment_command.format(commit_comment)
+            self._conn.send(self._normalize_cmd(commit))
+            commit_output = await self._conn.read_until_prompt(timeout=remaining(), idle_timeout=idle_timeout)
+            output.append(commit_output)
+            if type(self)._commit_success not in commit_output:
+                await self._rollback(output, exit_config_mode)
+                raise AsyncnetfsmCommitError(self._host, None, self._commit_errors(commit_output))
+
+        if exit_config_mode:
+            output.append(await self.exit_config_mode())
+
+        output = self._normalize_linefeeds(output.getvalue())
+        logger.debug(
+            "Host {}: Config load output: {}".format(self._host, repr(output))
+        )
+        return output
+
+    async def _read_echo_lines(self, count, timeout=None, idle_timeout=None):
+        """
+        Read the channel until the device echoed count lines
+
+        Wrapped echo of a long line only adds line feeds, so the read never waits for more than count lines.
+        """
+        if idle_timeout is None:
+            idle_timeout = self._timeout
+        output = OutputBuffer()
+        timer = ReadTimer(timeout=timeout, idle_timeout=idle_timeout)
+        try:
+            with timer:
+                while count > 0:
+                    chunk = await self._conn.read()
+                    if not chunk:
+                        raise AsyncnetfsmConnectionError(self._host, None, "connection closed by remote host")
+                    timer.touch()
+                    output.append(chunk)
+                    count -= chunk.count("\n")
+        except asyncio.TimeoutError:
+            raise TimeoutError(self._host)
+        return output.getvalue()
+
+    async def _rollback(self, output, exit_config_mode=False):
+        """Discard the changes of the candidate configuration and exit configuration mode if it's required"""
+        logger.info("Host {}: Rolling back the candidate configuration".format(self._host))
+        self._conn.send(self._normalize_cmd(type(self)._rollback_command))
+        output.append(await self._conn.read_until_prompt())
+        if exit_config_mode:
+            output.append(await self.exit_config_mode())
+
+    def _commit_errors(self, output):
+        """Return error lines of commit or commit check output"""
+        output = self._normalize_linefeeds(output)
+        errors = [line.strip() for line in output.splitlines() if re.match(r"\s*error:", line)]
+        return "; ".join(errors) or output.strip()
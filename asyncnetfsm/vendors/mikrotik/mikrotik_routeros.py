@@ -40,6 +40,9 @@ class MikrotikRouterOS(BaseDevice):
 
     _pattern = r"\[.*?\] (\/.*?)?\>"
 
+    _pipeline_commands = False
+    """RouterOS redraws the prompt with the typed ahead input, so commands are sent one by one"""
+
     async def connect(self):
         """
         Async Connection method
@@ -48,8 +51,14 @@ class MikrotikRouterOS(BaseDevice):
 
         * _establish_connection() for connecting to device
         * _set_base_prompt() for finding and setting device prompt
+
+        With protocol 'ssh_exec' there is no interactive session, so only the connection is established
         """
         logger.info("Host {}: Connecting to device".format(self._host))
+        if self._protocol == 'ssh_exec':
+            await super()._establish_connection()
+            logger.info("Host {}: Connected to device".format(self._host))
+            return
         await self._establish_connection()
         await self._set_base_prompt()
         logger.info("Host {}: Connected to device".format(self._host))
@@ -35,6 +35,9 @@ class Terminal(BaseDevice):
     _pattern = r"[{delimiters}]"
     """Pattern for using in reading buffer. When it found processing ends"""
 
+    _pipeline_commands = False
+    """Delimiters can appear in any output, so the outputs of written at once commands can't be split"""
+
     async def connect(self):
         """
         Async Connection method
@@ -46,7 +49,8 @@ class Terminal(BaseDevice):
         """
         logger.info("Host {}: Connecting to device".format(self._host))
         await self._establish_connection()
-        await self._set_base_prompt()
+        if self._protocol != 'ssh_exec':
+            await self._set_base_prompt()
         logger.info("Host {}: Connected to device".format(self._host))
 
     async def _set_base_prompt(self):
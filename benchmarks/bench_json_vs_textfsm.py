@@ -0,0 +1,88 @@
+"""
+Parsing time of NX-OS "show interface brief" as TextFSM table and as native JSON output
+
+send_command(structured="native") appends "| json" and decodes the reply with get_json_data,
+send_command(use_textfsm=True) parses the text output with the TextFSM template.
+The benchmark compares only the parsing, wall time and CPU time of the process.
+
+Usage: python -m benchmarks.bench_json_vs_textfsm
+"""
+import json
+import os
+import tempfile
+import time
+
+from asyncnetfsm import utils
+
+TEMPLATE = r"""Value INTERFACE (\S+)
+Value VLAN (\S+)
+Value TYPE (\S+)
+Value MODE (\S+)
+Value STATUS (\S+)
+Value REASON (.+?)
+Value SPEED (\S+)
+Value PORT (\S+)
+
+Start
+  ^${INTERFACE}\s+${VLAN}\s+${TYPE}\s+${MODE}\s+${STATUS}\s+${REASON}\s+${SPEED}\s+${PORT}\s*$$ -> Record
+"""
+COMMAND = "show interface brief"
+REPEAT = 5
+
+
+def make_outputs(count):
+    """Return the text and the JSON output of the command for count interfaces"""
+    rows = [
+        dict(interface="Eth1/{}".format(number), vlan=str(number % 4000 + 1), type="eth", mode="access",
+             status="up", reason="none", speed="10G(D)", port="--")
+        for number in range(1, count + 1)
+    ]
+    text = "".join(
+        "{interface:<14}{vlan:<9}{type:<6}{mode:<7}{status:<7}{reason:<24}{speed:<8}{port}\n".format(**row)
+        for row in rows
+    )
+    return text, json.dumps({"TABLE_interface": {"ROW_interface": rows}}, indent=2) + "\n"
+
+
+def measure(parse):
+    """Return the best wall time and CPU time of REPEAT runs in milliseconds"""
+    walls, cpus = [], []
+    for _ in range(REPEAT):
+        wall, cpu = time.perf_counter(), time.process_time()
+        parse()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    return min(walls) * 1000, min(cpus) * 1000
+
+
+def run():
+    decoder = utils._json_decoder
+    print("{:>8} {:>20} {:>20} {:>20}".format("rows", "textfsm, ms", "json, ms", decoder.__name__ + ", ms"))
+    for count in (500, 2000, 8000):
+        text, document = make_outputs(count)
+        assert len(utils.get_structured_data(text, "cisco_nxos", COMMAND)) == count
+        textfsm = measure(lambda: utils.get_structured_data(text, "cisco_nxos", COMMAND))
+        utils._json_decoder = json
+        try:
+            stdlib = measure(lambda: utils.get_json_data(document))
+        finally:
+            utils._json_decoder = decoder
+        fast = measure(lambda: utils.get_json_data(document))
+        print("{:>8} {:>20} {:>20} {:>20}".format(
+            count, *("{:.1f} / {:.1f} cpu".format(*result) for result in (textfsm, stdlib, fast))
+        ))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as template_dir:
+        with open(os.path.join(template_dir, "cisco_nxos_show_interface_brief.textfsm"), "w") as f:
+            f.write(TEMPLATE)
+        with open(os.path.join(template_dir, "index"), "w") as f:
+            f.write("Template, Hostname, Platform, Command\n\n")
+            f.write("cisco_nxos_show_interface_brief.textfsm, .*, cisco_nxos, sh[[ow]] int[[erface]] br[[ief]]\n")
+        os.environ["NET_TEXTFSM"] = template_dir
+        run()
+
+
+if __name__ == "__main__":
+    main()
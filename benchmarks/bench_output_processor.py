@@ -0,0 +1,63 @@
+"""
+Time of the output post-processing for large Mikrotik and HP outputs
+
+OutputProcessor strips all ANSI escape codes with one compiled regular expression and cuts
+the echo and the prompt with one slice. The old chain ran re.sub for every code,
+then split and joined the whole output for stripping the prompt.
+
+Usage: python -m benchmarks.bench_output_processor
+"""
+import re
+import time
+
+from asyncnetfsm.constants import CODE_NEXT_LINE, CODE_SET
+from asyncnetfsm.utils import OutputProcessor
+
+ESC = chr(27)
+COMMAND = "show interfaces\n"
+PROMPT = "router1"
+LINES = {
+    # Mikrotik moves the cursor down before every line
+    "mikrotik": ESC + "[9999B 0  R  ;;; uplink ether1 10.0.0.1/24 10.0.0.0 bridge-local\r\n",
+    # HP uses ESC E as the line feed and erases the line after the pager
+    "hp": " GigabitEthernet1/0/1   UP   1G(a)   F(a)   A    1  description" + ESC + "E" + ESC + "[42D" + ESC + "[2K",
+    "plain": " plain line without codes, a usual line of show running-config\r\n",
+}
+
+
+def process_old(output, command_string, prompt):
+    """Strip chain of BaseDevice before OutputProcessor"""
+    for code in CODE_SET:
+        output = re.sub(code, "", output)
+    output = re.sub(CODE_NEXT_LINE, "\n", output)
+    output = re.compile(r"(\r\r\n|\r\n|\n\r)").sub("\n", output)
+    lines = output.split("\n")
+    if prompt in lines[-1]:
+        output = "\n".join(lines[:-1])
+    return output[len(command_string):]
+
+
+def measure(process, data):
+    started = time.perf_counter()
+    output = process(data, COMMAND, PROMPT)
+    return time.perf_counter() - started, output
+
+
+def main():
+    processor = OutputProcessor()
+
+    def process_new(output, command_string, prompt):
+        return processor.process(output, True, command_string, prompt)
+
+    print("{:>10} {:>6} {:>12} {:>12}".format("output", "MB", "new, ms", "old, ms"))
+    for name, line in LINES.items():
+        for size in (1, 4, 16):
+            data = COMMAND.replace("\n", "\r\n") + line * (size * 2 ** 20 // len(line)) + PROMPT + "#"
+            new, new_output = measure(process_new, data)
+            old, old_output = measure(process_old, data)
+            assert new_output == old_output
+            print("{:>10} {:>6} {:>12.1f} {:>12.1f}".format(name, size, new * 1000, old * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Time of read_until_pattern for growing outputs
+
+The incremental matcher scans every chunk once, so the time grows linearly with the size of the output.
+The old loop searched the whole collected output after every chunk, its time grows quadratically.
+
+Usage: python -m benchmarks.bench_read_until_pattern
+"""
+import asyncio
+import re
+import time
+
+from asyncnetfsm.connections.base import BaseConnection
+
+PROMPT = r"router1.*?(\(.*?\))?[>#]"
+LINE = "interface GigabitEthernet0/0 description uplink to core switch\r\n"
+
+
+class ChunkConnection(BaseConnection):
+    """Connection returning the output in chunks of the given size"""
+
+    def __init__(self, data, chunk_size):
+        super().__init__()
+        self._host = "bench"
+        self._timeout = 60
+        self._chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        self._chunks.reverse()
+
+    async def read(self):
+        return self._chunks.pop() if self._chunks else ""
+
+
+async def read_until_pattern_old(conn, pattern):
+    """read_until_pattern before the incremental matcher"""
+    output = ""
+    while True:
+        output += await conn.read()
+        if re.search(pattern, output):
+            return output
+
+
+def measure(read, data, chunk_size):
+    conn = ChunkConnection(data, chunk_size)
+    started = time.perf_counter()
+    output = asyncio.run(read(conn))
+    elapsed = time.perf_counter() - started
+    assert output == data
+    return elapsed
+
+
+def main():
+    # SSH channel reads usually return about 4 KB
+    chunk_size = 4096
+    print("{:>6} {:>12} {:>12}".format("MB", "new, s", "old, s"))
+    for size in (1, 2, 4, 8):
+        data = LINE * (size * 2 ** 20 // len(LINE)) + "router1#"
+        new = measure(lambda conn: conn.read_until_pattern(PROMPT), data, chunk_size)
+        old = measure(lambda conn: read_until_pattern_old(conn, PROMPT), data, chunk_size) if size <= 4 else None
+        print("{:>6} {:>12.3f} {:>12}".format(size, new, "{:.3f}".format(old) if old is not None else "-"))
+
+
+if __name__ == "__main__":
+    main()
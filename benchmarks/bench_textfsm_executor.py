@@ -0,0 +1,89 @@
+"""
+Event loop lag while many sessions parse output with TextFSM
+
+Parsing in the event loop blocks all other sessions for the whole parsing time.
+With the process pool from create_textfsm_executor the loop only waits for the results,
+so the lag stays small while the parsing runs in the workers with warm template caches.
+
+Usage: python -m benchmarks.bench_textfsm_executor
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from asyncnetfsm import utils
+
+TEMPLATE = """Value INTERFACE (\\S+)
+Value STATUS (up|down)
+Value DESCRIPTION (.*)
+
+Start
+  ^${INTERFACE}\\s+${STATUS}\\s+${DESCRIPTION} -> Record
+"""
+OUTPUT = "GigabitEthernet0/{} up uplink to core switch\n"
+SESSIONS = 200
+COMMANDS = 5
+
+
+async def lag_probe(stop, lags, interval=0.005):
+    """Measure how late the loop wakes up the sleeping task"""
+    loop = asyncio.get_event_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+
+
+async def session(raw, executor):
+    for _ in range(COMMANDS):
+        # Reading the output from the device
+        await asyncio.sleep(0.001)
+        if executor is None:
+            utils.get_structured_data(raw, "cisco_ios", "show interfaces description")
+        else:
+            await utils.parse_output(raw, "cisco_ios", "show interfaces description", executor)
+
+
+async def measure(raw, executor):
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.ensure_future(lag_probe(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(session(raw, executor) for _ in range(SESSIONS)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags.sort()
+    return elapsed, lags[len(lags) // 2], lags[int(len(lags) * 0.99)], lags[-1]
+
+
+async def run(raw):
+    executor = utils.create_textfsm_executor(max_workers=4, platforms=["cisco_ios"])
+    try:
+        # Start the workers before measuring
+        await utils.parse_output(raw, "cisco_ios", "show interfaces description", executor)
+        print("{:>10} {:>10} {:>12} {:>12} {:>12}".format("mode", "total, s", "lag p50, ms", "lag p99, ms", "max, ms"))
+        for name, pool in (("loop", None), ("executor", executor)):
+            elapsed, p50, p99, worst = await measure(raw, pool)
+            print("{:>10} {:>10.2f} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                name, elapsed, p50 * 1000, p99 * 1000, worst * 1000)
+            )
+    finally:
+        executor.shutdown()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as template_dir:
+        with open(os.path.join(template_dir, "cisco_ios_show_interfaces_description.textfsm"), "w") as f:
+            f.write(TEMPLATE)
+        with open(os.path.join(template_dir, "index"), "w") as f:
+            f.write("Template, Hostname, Platform, Command\n\n")
+            f.write("cisco_ios_show_interfaces_description.textfsm, .*, cisco_ios, sh[[ow]] int[[erfaces]] des[[cription]]\n")
+        os.environ["NET_TEXTFSM"] = template_dir
+        raw = "".join(OUTPUT.format(number) for number in range(500))
+        asyncio.run(run(raw))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Helpers for the tests, connection replaying chunks of output without network
+"""
+from asyncnetfsm.connections.base import BaseConnection
+
+
+class ReplayConnection(BaseConnection):
+    """Connection which returns the given chunks from read and records sent data"""
+
+    def __init__(self, chunks, timeout=5):
+        super().__init__()
+        self._host = "replay"
+        self._timeout = timeout
+        self._chunks = list(chunks)
+        self.sent = []
+
+    def send(self, cmd):
+        self.sent.append(cmd)
+
+    async def read(self):
+        if not self._chunks:
+            return ""
+        return self._chunks.pop(0)
+
+    def is_closed(self):
+        return False
+
+    def abort(self):
+        pass
+
+
+def split_at(data, offsets):
+    """Split data into chunks at the offsets"""
+    chunks = []
+    start = 0
+    for offset in sorted(offsets):
+        if start < offset < len(data):
+            chunks.append(data[start:offset])
+            start = offset
+    chunks.append(data[start:])
+    return chunks
+
+
+def replay_device(chunks, device_class=None, prompt="router1"):
+    """Make the device with ReplayConnection and the found prompt"""
+    from asyncnetfsm.vendors.base import BaseDevice
+
+    device = (device_class or BaseDevice)(ip="replay", username="user", password="password")
+    conn = ReplayConnection(chunks)
+    conn._base_prompt = prompt
+    conn._base_pattern = r"{}.*?[>#]".format(prompt)
+    device._conn = conn
+    return device
@@ -0,0 +1,35 @@
+from asyncnetfsm.connections.buffer import OutputBuffer
+
+
+def test_getvalue_joins_chunks():
+    output = OutputBuffer("a")
+    for chunk in ("bc", "", "def"):
+        output.append(chunk)
+    assert output.getvalue() == "abcdef"
+    assert len(output) == 6
+    assert str(output) == "abcdef"
+
+
+def test_append_after_getvalue():
+    output = OutputBuffer()
+    output.append("ab")
+    output.append("cd")
+    assert output.getvalue() == "abcd"
+    output.append("ef")
+    assert output.getvalue() == "abcdef"
+
+
+def test_tail_spans_several_chunks():
+    output = OutputBuffer()
+    for chunk in ("abc", "de", "f"):
+        output.append(chunk)
+    assert output.tail(4) == "cdef"
+    assert output.tail(100) == "abcdef"
+    assert output.tail(0) == ""
+
+
+def test_empty_buffer():
+    output = OutputBuffer()
+    assert output.getvalue() == ""
+    assert output.tail(5) == ""
+    assert len(output) == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+from asyncnetfsm.constants import MODE_PRIVILEGED
+from asyncnetfsm.fingerprint import Fingerprint, FingerprintCache
+from asyncnetfsm.vendors.cisco import CiscoIOS
+from tests.helpers import ReplayConnection
+
+PAGING = "terminal length 0\r\nR1#"
+
+
+def prepare(chunks, cache):
+    async def main():
+        device = CiscoIOS(ip="10.0.0.1", username="user", password="password", fingerprint_cache=cache)
+        device._conn = ReplayConnection(chunks)
+        device._conn.set_prompt_classifier(device._classify_prompt)
+        await device._session_preparation()
+        device._save_fingerprint()
+        return device
+
+    return asyncio.run(main())
+
+
+def test_discovered_session_is_cached():
+    cache = FingerprintCache()
+    device = prepare(["Welcome\r\nR1#", "\r\nR1#", PAGING, PAGING], cache)
+    assert device._conn.sent[0] == "\n"
+    fingerprint = cache.get(device._fingerprint_key)
+    assert fingerprint == Fingerprint("R1#", "R1", device._conn._base_pattern, MODE_PRIVILEGED)
+
+
+def test_cached_session_skips_discovery():
+    cache = FingerprintCache()
+    cold = prepare(["Welcome\r\nR1#", "\r\nR1#", PAGING, PAGING], cache)
+    device = prepare(["Welcome\r\nR1#", PAGING, PAGING], cache)
+    # Paging is set on every connect, prompt discovery and privilege check are skipped
+    assert device._conn.sent == ["terminal length 0\n", "terminal length 0\n"]
+    assert device._conn._base_pattern == cold._conn._base_pattern
+    assert device._conn.mode == MODE_PRIVILEGED
+    assert device.device_prompt == "R1"
+
+
+def test_changed_prompt_is_discovered_again():
+    cache = FingerprintCache()
+    prepare(["Welcome\r\nR1#", "\r\nR1#", PAGING, PAGING], cache)
+    paging = "terminal length 0\r\nR2#"
+    device = prepare(["Welcome\r\nR2#", "\r\nR2#", paging, paging], cache)
+    assert device._conn.sent[0] == "\n"
+    assert cache.get(device._fingerprint_key).base_prompt == "R2"
+
+
+def test_cache_file_round_trip(tmp_path):
+    path = tmp_path / "fingerprints.json"
+    cache = FingerprintCache(str(path))
+    key = FingerprintCache.key("10.0.0.1", 22, "user", "cisco_ios")
+    cache.set(key, Fingerprint("R1#", "R1", r"R1.*?(\(.*?\))?[\>\#]", MODE_PRIVILEGED))
+    cache.save()
+    assert FingerprintCache(str(path)).get(key) == cache.get(key)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from asyncnetfsm.exceptions import (
+    AsyncnetfsmAuthenticationError, AsyncnetfsmCommitError, AsyncnetfsmConfigError, AsyncnetfsmConnectionError,
+    AsyncnetfsmTimeoutError,
+)
+from asyncnetfsm.fleet import FleetRunner
+
+
+def run_failing(error):
+    runner = FleetRunner(None, retries=2, retry_delay=0)
+
+    async def attempt(params):
+        raise error
+
+    runner._attempt = attempt
+    results = asyncio.run(runner.run_all([{"ip": "10.0.0.1"}]))
+    return results[0]
+
+
+@pytest.mark.parametrize("error", [
+    AsyncnetfsmConnectionError("10.0.0.1", None, "connection lost"),
+    AsyncnetfsmTimeoutError("10.0.0.1", None, "timeout"),
+    ConnectionResetError(),
+    asyncio.TimeoutError(),
+])
+def test_transient_errors_are_retried(error):
+    assert run_failing(error).attempts == 3
+
+
+@pytest.mark.parametrize("error", [
+    AsyncnetfsmAuthenticationError("10.0.0.1", None, "bad password"),
+    AsyncnetfsmConfigError("10.0.0.1", None, "invalid input"),
+    AsyncnetfsmCommitError("10.0.0.1", None, "commit failed"),
+])
+def test_permanent_errors_are_not_retried(error):
+    result = run_failing(error)
+    assert result.attempts == 1
+    assert result.error is error
+
+
+def test_backoff_releases_concurrency_slot():
+    runner = FleetRunner(None, concurrency=1, retries=1, retry_delay=0.5)
+    finished = {}
+
+    async def attempt(params):
+        if params["ip"] == "10.0.0.1" and "10.0.0.1" not in finished:
+            finished["10.0.0.1"] = None
+            raise AsyncnetfsmConnectionError("10.0.0.1", None, "connection lost")
+        finished[params["ip"]] = asyncio.get_event_loop().time()
+        return params["ip"]
+
+    async def main():
+        runner._attempt = attempt
+        started = asyncio.get_event_loop().time()
+        results = await runner.run_all([{"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}])
+        return results, started
+
+    results, started = asyncio.run(main())
+    # The healthy device runs while the failed one waits for its retry
+    assert finished["10.0.0.2"] - started < 0.25
+    assert [result.params["ip"] for result in results] == ["10.0.0.2", "10.0.0.1"]
+    assert results[1].attempts == 2
+    assert results[1].elapsed >= 0.5
@@ -0,0 +1,84 @@
+import asyncio
+
+from asyncnetfsm.connections.base import BaseConnection
+from tests.helpers import replay_device
+
+
+class DeviceConnection(BaseConnection):
+    """
+    Connection answering every line with its echo, output and the prompt after a delay
+
+    Answers arriving close to each other are read as one chunk. Like SSH channel,
+    it doesn't allow concurrent reads
+    """
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self._host = "device"
+        self._timeout = 5
+        self._delay = delay
+        self._output = asyncio.Queue()
+        self._reading = False
+        self.written = []
+
+    def send(self, cmd):
+        if self._hold(cmd):
+            return
+        self.reset_prompt()
+        self.written.append(cmd)
+        asyncio.get_event_loop().call_later(self._delay, self._answer, cmd)
+
+    def _answer(self, cmd):
+        command = cmd.strip()
+        output = "{}\r\noutput of {}\r\n".format(command, command) if command else "\r\n"
+        self._output.put_nowait(output + "router1#")
+
+    def read(self):
+        if self._waits_for_probe():
+            return self._read_after_probe()
+        return self._read_chunk()
+
+    async def _read_chunk(self):
+        assert not self._reading, "concurrent read"
+        self._reading = True
+        try:
+            chunk = await self._output.get()
+            await asyncio.sleep(self._delay / 2)
+            while not self._output.empty():
+                chunk += self._output.get_nowait()
+            return chunk
+        finally:
+            self._reading = False
+
+    def is_closed(self):
+        return False
+
+    def abort(self):
+        pass
+
+
+async def probe_and_command(start_delay):
+    device = replay_device([])
+    conn = device._conn = DeviceConnection()
+    conn._base_prompt = "router1"
+    conn._base_pattern = r"router1.*?[>#]"
+
+    async def command():
+        await asyncio.sleep(start_delay)
+        return await device.send_command("show clock")
+
+    alive, output = await asyncio.gather(device.is_alive(), command())
+    return alive, output, conn.written
+
+
+def test_command_started_during_probe_waits_for_it():
+    alive, output, written = asyncio.run(probe_and_command(0.01))
+    assert alive
+    assert output == "output of show clock"
+    assert written == ["\n", "show clock\n"]
+
+
+def test_probe_before_command():
+    alive, output, written = asyncio.run(probe_and_command(0.1))
+    assert alive
+    assert output == "output of show clock"
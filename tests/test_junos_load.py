@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from asyncnetfsm.exceptions import AsyncnetfsmConfigError
+from asyncnetfsm.vendors.juniper import JuniperJunOS
+from tests.helpers import ReplayConnection, replay_device
+
+PROMPT = "\r\n[edit]\r\nuser@router1# "
+
+MERGE = [
+    "interfaces {",
+    "    ge-0/0/0 {",
+    "        description uplink;",
+    "    }",
+    "    ge-0/0/1 {",
+    "        description downlink;",
+    "    }",
+    "}",
+    "protocols {",
+    "    lldp {",
+    "        interface all;",
+    "    }",
+    "}",
+]
+
+
+class LoadConnection(ReplayConnection):
+    """
+    Connection answering load terminal like Junos
+
+    The echo of the payload is returned in small pieces, the payload must not be written
+    before the echo of the previous one is read.
+    """
+
+    def __init__(self, load_result="load complete"):
+        super().__init__([])
+        self._load_result = load_result
+        self.config = True
+
+    def send(self, cmd):
+        super().send(cmd)
+        if cmd.startswith("load "):
+            # The line feed of the message comes separately, it must not be taken for the echo
+            self._chunks.extend([cmd.strip() + "\r\n[Type ^D at a new line to end input]", "\r\n"])
+        elif cmd == "\x04":
+            self._chunks.append("\r\n" + self._load_result + PROMPT)
+        elif cmd == "rollback 0\n":
+            self._chunks.append("rollback 0\r\nload complete" + PROMPT)
+        elif cmd == "exit configuration-mode\n":
+            self.config = False
+            self._chunks.append("exit configuration-mode\r\nExiting configuration mode\r\n\r\nuser@router1> ")
+        elif cmd.startswith("commit"):
+            result = "configuration check succeeds" if cmd.startswith("commit check") else "commit complete"
+            self._chunks.append(cmd.strip() + "\r\n" + result + PROMPT)
+        else:
+            assert not self._chunks, "payload written before the echo of the previous one"
+            echo = cmd.replace("\n", "\r\n")
+            self._chunks.extend(echo[offset:offset + 7] for offset in range(0, len(echo), 7))
+
+
+def load(conn, chunk_size, **kwargs):
+    class Device(JuniperJunOS):
+        _load_chunk_size = chunk_size
+
+    async def main():
+        device = replay_device([], device_class=Device)
+        device._conn = conn
+        conn._base_prompt = "router1"
+        conn._base_pattern = r"router1.*?[>#]"
+
+        async def config_mode():
+            return ""
+
+        async def check_config_mode():
+            return conn.config
+
+        device.config_mode = config_mode
+        device.check_config_mode = check_config_mode
+        return await device.send_config_set(MERGE, load="merge", **kwargs)
+
+    return asyncio.run(main())
+
+
+def test_next_chunk_waits_for_whole_echo():
+    for chunk_size in (1, 20, 40, 80, 16384):
+        conn = LoadConnection()
+        output = load(conn, chunk_size)
+        assert "".join(conn.sent[1:-4]) == "\n".join(MERGE) + "\n", chunk_size
+        assert conn.sent[-1] == "exit configuration-mode\n"
+        assert "commit complete" in output
+
+
+def test_failed_load_exits_config_mode():
+    conn = LoadConnection("terminal:3:syntax error\r\nload complete (1 errors)")
+    with pytest.raises(AsyncnetfsmConfigError) as e:
+        load(conn, 40)
+    assert "terminal:3:syntax error" in str(e.value)
+    assert conn.sent[-2:] == ["rollback 0\n", "exit configuration-mode\n"]
+    assert not conn.config
+
+
+def test_failed_load_keeps_config_mode():
+    conn = LoadConnection("terminal:3:syntax error\r\nload complete (1 errors)")
+    with pytest.raises(AsyncnetfsmConfigError):
+        load(conn, 40, exit_config_mode=False)
+    assert conn.sent[-1] == "rollback 0\n"
+    assert conn.config
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from asyncnetfsm.exceptions import AsyncnetfsmConfigError
+from asyncnetfsm.vendors.cisco import CiscoIOS
+from tests.helpers import replay_device, split_at
+
+ECHO = "copy flash:R1.cfg running-config\r\n"
+QUESTION = "Destination filename [running-config]? "
+DONE = "\r\n1024 bytes copied in 0.120 secs (8533 bytes/sec)\r\nR1#"
+DELETE = "delete /force flash:R1.cfg\r\nR1#"
+
+
+def load(chunks, sent=None):
+    async def main():
+        device = replay_device(chunks, device_class=CiscoIOS, prompt="R1")
+        device._conn._base_pattern = r"R1.*?(\(.*?\))?[>#]"
+
+        async def put_file(*args, **kwargs):
+            pass
+
+        async def check_config_mode():
+            return False
+
+        device.put_file = put_file
+        device.check_config_mode = check_config_mode
+        if sent is not None:
+            device._conn.sent = sent
+        output = await device.load_config_file("/tmp/R1.cfg")
+        return output, device._conn.sent
+
+    return asyncio.run(main())
+
+
+def test_hostname_in_echo_is_not_prompt():
+    for offset in range(1, len(ECHO + QUESTION)):
+        output, sent = load(split_at(ECHO + QUESTION, [offset]) + [DONE, DELETE])
+        assert sent == ["copy flash:R1.cfg running-config\n", "\n", "delete /force flash:R1.cfg\n"], offset
+        assert output.endswith("R1#")
+
+
+def test_rejected_line_is_reported():
+    with pytest.raises(AsyncnetfsmConfigError) as e:
+        load([ECHO + QUESTION, "\r\n% Invalid input detected at '^' marker.\r\n" + DONE, DELETE])
+    assert "Invalid input" in str(e.value)
+
+
+def test_copy_error_fails_before_questions():
+    error = "%Error opening flash:R1.cfg (No such file or directory)\r\n"
+    for offset in range(1, len(ECHO + error)):
+        sent = []
+        with pytest.raises(AsyncnetfsmConfigError) as e:
+            load(split_at(ECHO + error, [offset]) + ["R1#", DELETE], sent)
+        assert "No such file or directory" in str(e.value), offset
+        # The question isn't answered and the file is still removed
+        assert sent == ["copy flash:R1.cfg running-config\n", "delete /force flash:R1.cfg\n"], offset
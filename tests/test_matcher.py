@@ -0,0 +1,60 @@
+import re
+
+from asyncnetfsm.connections.matcher import PatternMatcher, PatternSet
+
+PROMPT = r"router1.*?(\(.*?\))?[>#]"
+
+
+def feed_all(matcher, chunks):
+    for chunk in chunks:
+        match = matcher.feed(chunk)
+        if match:
+            return match
+    return None
+
+
+def test_pattern_set_reports_index_of_leftmost_pattern():
+    patterns = PatternSet([r"\[confirm\]", PROMPT])
+    index, match = patterns.search("copy\n[confirm]\nrouter1#")
+    assert index == 0
+    assert match.group() == "[confirm]"
+
+
+def test_pattern_set_with_backreference_is_searched_separately():
+    patterns = PatternSet([r"(a)\1", r"b"])
+    index, match = patterns.search("xbaa")
+    assert index == 0
+    assert match.group() == "aa"
+
+
+def test_prompt_split_across_chunks_at_every_offset():
+    data = "show version\r\nCisco IOS Software\r\nrouter1(config)#"
+    for offset in range(1, len(data)):
+        matcher = PatternMatcher([PROMPT])
+        match = feed_all(matcher, [data[:offset], data[offset:]])
+        assert match is not None, offset
+        assert match.end == len(data)
+        assert match.text == "router1(config)#"
+
+
+def test_prompt_fed_one_character_at_a_time():
+    data = "output\nrouter1>"
+    match = feed_all(PatternMatcher([PROMPT]), list(data))
+    assert match.start == data.index("router1")
+    assert match.end == len(data)
+
+
+def test_offsets_count_from_beginning_after_window_is_cut():
+    line = "interface GigabitEthernet0/0 description uplink\r\n"
+    data = line * 200 + "router1#"
+    matcher = PatternMatcher([PROMPT], overlap=64)
+    chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+    match = feed_all(matcher, chunks)
+    assert match.start == len(line) * 200
+    assert match.end == len(data)
+
+
+def test_line_anchor_does_not_match_at_window_cut():
+    matcher = PatternMatcher(PatternSet([r"^#"], re.MULTILINE), overlap=8)
+    assert feed_all(matcher, ["x" * 20, "#", "\n"]) is None
+    assert matcher.feed("#").start == 22
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from asyncnetfsm.exceptions import AsyncnetfsmNetconfError
+from asyncnetfsm.connections.netconf import NetconfSession, _ChunkedDecoder, _EOMDecoder, _find_text
+from tests.helpers import split_at
+
+MESSAGE = b'<rpc-reply message-id="1"><ok/></rpc-reply>'
+NEXT = b"<rpc-reply"
+
+
+def decode(decoder, chunks):
+    """Feed chunks and return the payload of the first message and the rest after it"""
+    payload = b""
+    for index, chunk in enumerate(chunks):
+        data, rest = decoder.feed(chunk)
+        payload += data
+        if rest is not None:
+            return payload, rest + b"".join(chunks[index + 1:])
+    return payload, None
+
+
+def test_eom_delimiter_split_at_every_offset():
+    stream = _EOMDecoder.encode(MESSAGE) + NEXT
+    for offset in range(1, len(stream)):
+        assert decode(_EOMDecoder(), split_at(stream, [offset])) == (MESSAGE, NEXT), offset
+
+
+def test_eom_partial_delimiter_in_payload():
+    message = b"<data>]]>]]</data>"
+    stream = _EOMDecoder.encode(message)
+    for offset in range(1, len(stream)):
+        assert decode(_EOMDecoder(), split_at(stream, [offset])) == (message, b""), offset
+
+
+def test_eom_one_byte_at_a_time():
+    stream = _EOMDecoder.encode(MESSAGE) + NEXT
+    assert decode(_EOMDecoder(), [stream[i:i + 1] for i in range(len(stream))]) == (MESSAGE, NEXT)
+
+
+def test_chunked_split_at_every_offset():
+    stream = b"\n#10\n" + MESSAGE[:10] + b"\n#%d\n" % (len(MESSAGE) - 10) + MESSAGE[10:] + b"\n##\n" + NEXT
+    for offset in range(1, len(stream)):
+        assert decode(_ChunkedDecoder(), split_at(stream, [offset])) == (MESSAGE, NEXT), offset
+
+
+def test_chunked_one_byte_at_a_time():
+    stream = _ChunkedDecoder.encode(MESSAGE) + NEXT
+    assert decode(_ChunkedDecoder(), [stream[i:i + 1] for i in range(len(stream))]) == (MESSAGE, NEXT)
+
+
+def test_chunked_invalid_header():
+    with pytest.raises(ValueError):
+        _ChunkedDecoder().feed(b"\n#abc\n")
+    with pytest.raises(ValueError):
+        _ChunkedDecoder().feed(b"<rpc-reply>")
+
+
+class ReplaySession(NetconfSession):
+    """Session reading the reply from the given chunks"""
+
+    def __init__(self, chunks):
+        super().__init__(None, host="replay", timeout=5)
+        self._stdin = self
+        self._stdout = self
+        self._chunks = list(chunks)
+        self.root = None
+
+    def write(self, data):
+        pass
+
+    async def read(self, size):
+        return self._chunks.pop(0) if self._chunks else b""
+
+    def _check_errors(self, reply, errors=None):
+        self.root = reply
+        super()._check_errors(reply, errors)
+
+
+def test_iter_rpc_detaches_yielded_elements():
+    reply = _EOMDecoder.encode(
+        b'<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><interface-information>'
+        + b"".join(b"<physical-interface><name>ge-0/0/%d</name></physical-interface>" % i for i in range(100))
+        + b"</interface-information></rpc-reply>"
+    )
+
+    async def main():
+        session = ReplaySession(split_at(reply, range(7, len(reply), 7)))
+        names = [_find_text(element, "name") async for element in session.iter_rpc("<get/>", "physical-interface")]
+        return names, session.root
+
+    names, root = asyncio.run(main())
+    assert names == ["ge-0/0/%d" % i for i in range(100)]
+    assert len(root[0]) == 0
+
+
+def test_iter_rpc_closed_early_reads_rest_of_reply():
+    reply = _EOMDecoder.encode(
+        b"<rpc-reply><interface-information>"
+        + b"".join(b"<physical-interface><name>ge-0/0/%d</name></physical-interface>" % i for i in range(10))
+        + b"</interface-information></rpc-reply>"
+    )
+    ok = _EOMDecoder.encode(b'<rpc-reply message-id="2"><ok/></rpc-reply>')
+
+    async def main():
+        session = ReplaySession(split_at(reply + ok, range(7, len(reply + ok), 7)))
+        elements = session.iter_rpc("<get/>", "physical-interface")
+        try:
+            async for element in elements:
+                first = _find_text(element, "name")
+                break
+        finally:
+            await elements.aclose()
+        return first, await session.rpc("<commit/>")
+
+    first, reply = asyncio.run(main())
+    assert first == "ge-0/0/0"
+    assert reply.get("message-id") == "2"
+    assert reply[0].tag == "ok"
+
+
+def test_rpc_error_is_raised():
+    reply = _EOMDecoder.encode(
+        b'<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><rpc-error>'
+        b"<error-tag>invalid-value</error-tag><error-severity>error</error-severity>"
+        b"<error-message>syntax error</error-message></rpc-error></rpc-reply>"
+    )
+
+    with pytest.raises(AsyncnetfsmNetconfError) as e:
+        asyncio.run(ReplaySession([reply]).rpc("<get/>"))
+    assert "syntax error" in str(e.value)
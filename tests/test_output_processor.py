@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+from asyncnetfsm.constants import CODE_NEXT_LINE, CODE_SET
+from asyncnetfsm.utils import OutputProcessor
+
+ESC = chr(27)
+PROMPT = "router1"
+
+
+def process_old(output, ansi_escape_codes, command_string, prompt):
+    """Strip chain of BaseDevice before OutputProcessor"""
+    if ansi_escape_codes:
+        for code in CODE_SET:
+            output = re.sub(code, "", output)
+        output = re.sub(CODE_NEXT_LINE, "\n", output)
+    output = re.compile(r"(\r\r\n|\r\n|\n\r)").sub("\n", output)
+    if prompt is not None:
+        lines = output.split("\n")
+        if prompt in lines[-1]:
+            output = "\n".join(lines[:-1])
+    if command_string is not None:
+        if "\x08" in output:
+            output = "\n".join(output.replace("\x08", "").split("\n")[1:])
+        else:
+            output = output[len(command_string):]
+    return output
+
+
+OUTPUTS = [
+    "show version\r\nVersion 15.2\r\nrouter1#",
+    "show version\r\nVersion 15.2\r\n",
+    "show version\r\nrouter1#",
+    "router1#",
+    "",
+    "show version\n\rline 1\r\r\nline 2\n\rrouter1>",
+    # Mikrotik moves the cursor down before every line
+    "/ip address print\r\n" + (ESC + "[9999B 0  R  ;;; uplink ether1 10.0.0.1/24\r\n") * 20 + "[admin@router1] > ",
+    # HP erases the line and uses ESC E as the line feed
+    "show interfaces\r\n" + (" 1/0/1  Up  1G" + ESC + "E" + ESC + "[42D" + ESC + "[2K") * 20 + ESC + "[24;1Hrouter1# ",
+    ESC + "7" + ESC + "[r" + ESC + "8" + ESC + "[1;24r" + ESC + "[?25hshow clock\r\n10:00\r\nrouter1#",
+    # Cisco IOS wraps long commands with backspaces
+    "show running-config | include very long\x08\x08\x08\x08 pattern\r\nline\r\nrouter1#",
+]
+
+
+@pytest.mark.parametrize("output", OUTPUTS)
+@pytest.mark.parametrize("ansi_escape_codes", [True, False])
+@pytest.mark.parametrize("strip_command", [True, False])
+@pytest.mark.parametrize("strip_prompt", [True, False])
+def test_processor_matches_old_strip_chain(output, ansi_escape_codes, strip_command, strip_prompt):
+    command_string = output.split("\r\n", 1)[0] + "\n" if strip_command else None
+    prompt = PROMPT if strip_prompt else None
+    assert OutputProcessor().process(output, ansi_escape_codes, command_string, prompt) == process_old(
+        output, ansi_escape_codes, command_string, prompt
+    )
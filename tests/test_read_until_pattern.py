@@ -0,0 +1,25 @@
+import asyncio
+
+from tests.helpers import ReplayConnection, split_at
+
+PROMPT = r"router1.*?[>#]"
+
+
+def read(chunks, pattern=PROMPT):
+    conn = ReplayConnection(chunks)
+    return conn, asyncio.run(conn.read_until_pattern(pattern))
+
+
+def test_prompt_split_at_every_offset():
+    data = "show clock\r\n*10:00:00 UTC\r\nrouter1#"
+    for offset in range(1, len(data)):
+        conn, output = read(split_at(data, [offset]))
+        assert output == data, offset
+        assert conn.last_match.end == len(data)
+
+
+def test_last_read_stats_and_prompt_are_tracked():
+    conn, output = read(["out\r\n", "router1>"])
+    assert conn.last_read_stats.ended_by == "pattern"
+    assert conn.last_read_stats.chunks == 2
+    assert conn.last_match.text == "router1>"
@@ -0,0 +1,61 @@
+import asyncio
+import re
+
+from tests.helpers import ReplayConnection, replay_device, split_at
+
+PROMPT = r"r.*?[>#]"
+STREAM = "show a\r\nA out\r\nr#show b\r\nB out\r\nr#show c\r\nC out\r\nr#"
+PATTERNS = [
+    r"(?:{})(?={})".format(PROMPT, re.escape("show b")),
+    r"(?:{})(?={})".format(PROMPT, re.escape("show c")),
+    PROMPT,
+]
+OUTPUTS = ["show a\r\nA out\r\nr#", "show b\r\nB out\r\nr#", "show c\r\nC out\r\nr#"]
+
+
+def read_sequence(chunks):
+    conn = ReplayConnection(chunks)
+    return asyncio.run(conn.read_until_pattern_sequence(PATTERNS))
+
+
+def test_outputs_are_split_at_every_offset():
+    for offset in range(1, len(STREAM)):
+        assert read_sequence(split_at(STREAM, [offset])) == OUTPUTS, offset
+
+
+def test_outputs_are_split_in_small_chunks():
+    for size in range(1, 8):
+        assert read_sequence(split_at(STREAM, range(size, len(STREAM), size))) == OUTPUTS, size
+
+
+def test_chunk_ends_inside_next_echo():
+    chunks = ["show a\r\nA out\r\nr#sh", "ow b\r\nB out\r\nr#"]
+    conn = ReplayConnection(chunks)
+    outputs = asyncio.run(conn.read_until_pattern_sequence(PATTERNS[:1] + [PROMPT]))
+    assert outputs == OUTPUTS[:2]
+
+
+def run_device(chunks, coro):
+    async def main():
+        device = replay_device(chunks, prompt="r")
+        return await coro(device)
+
+    return asyncio.run(main())
+
+
+def test_send_commands_in_small_chunks():
+    for size in range(1, 8):
+        outputs = run_device(
+            split_at(STREAM, range(size, len(STREAM), size)),
+            lambda device: device.send_commands(["show a", "show b", "show c"]),
+        )
+        assert outputs == ["A out", "B out", "C out"], size
+
+
+def test_config_window_at_every_offset():
+    stream = "a 1\r\nr(config)#a 2\r\nr(config)#a 3\r\nr(config)#"
+    for offset in range(1, len(stream)):
+        output = run_device(
+            split_at(stream, [offset]), lambda device: device.send_config_set(["a 1", "a 2", "a 3"], window=2)
+        )
+        assert output == "a 1\nr(config)#a 2\nr(config)#a 3\nr(config)#", offset
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from tests.helpers import replay_device, split_at
+
+OUTPUT = "show log\r\nline 1\r\nline 2\r\nline 3\r\nrouter1#"
+
+
+def stream_lines(chunks):
+    async def main():
+        device = replay_device(chunks)
+        return [line async for line in device.send_command_stream("show log")]
+
+    return asyncio.run(main())
+
+
+def test_lines_are_yielded_at_every_split():
+    for offset in range(1, len(OUTPUT)):
+        assert stream_lines(split_at(OUTPUT, [offset])) == ["line 1", "line 2", "line 3"], offset
+
+
+def test_closed_stream_reads_until_prompt():
+    async def main():
+        device = replay_device(
+            ["show log\r\nline 1\r\n", "line 2\r\nline 3\r\nrouter1#", "show clock\r\n10:00\r\nrouter1#"]
+        )
+        stream = device.send_command_stream("show log")
+        try:
+            async for line in stream:
+                break
+        finally:
+            await stream.aclose()
+        return line, await device.send_command("show clock")
+
+    assert asyncio.run(main()) == ("line 1", "10:00")
+
+
+def test_failed_read_is_not_drained():
+    async def main():
+        device = replay_device(["show log\r\nline 1\r\n"])
+        stream = device.send_command_stream("show log")
+        assert await stream.__anext__() == "line 1"
+        with pytest.raises(Exception) as e:
+            await stream.__anext__()
+        await stream.aclose()
+        return e.value
+
+    assert "connection closed" in str(asyncio.run(main()))
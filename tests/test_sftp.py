@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from asyncnetfsm.connections import sftp
+from asyncnetfsm.connections.sftp import SFTPTransfer
+
+SOURCE = bytes(range(256)) * 1024
+
+
+def reader(data):
+    async def read(offset, length):
+        return data[offset:offset + length]
+
+    return read
+
+
+@pytest.mark.parametrize("destination, expected", [
+    (SOURCE[:100000], 100000),
+    (SOURCE, len(SOURCE)),
+    (b"x" * 100000, 0),
+    (SOURCE[:50000] + b"x" * 50000, 0),
+    (b"x" * len(SOURCE), 0),
+])
+def test_resume_offset_compares_last_block(destination, expected):
+    transfer = SFTPTransfer(None, host="sftp", block_size=4096)
+    start = asyncio.run(transfer._resume_offset(reader(SOURCE), reader(destination), len(destination)))
+    assert start == expected
+
+
+def test_source_md5_caches_only_computed_digest(tmp_path, monkeypatch):
+    path = tmp_path / "image.bin"
+    path.write_bytes(SOURCE)
+    sftp._source_md5_cache.clear()
+    calls = []
+
+    def failing_md5(file_path):
+        calls.append(file_path)
+        raise OSError("read error")
+
+    monkeypatch.setattr(sftp, "_file_md5", failing_md5)
+    with pytest.raises(OSError):
+        asyncio.run(sftp._source_md5(str(path)))
+    assert len(sftp._source_md5_cache) == 0
+
+    monkeypatch.undo()
+
+    async def upload_many():
+        return await asyncio.gather(*(sftp._source_md5(str(path)) for _ in range(10)))
+
+    # New loop, the digest isn't tied to the loop of the failed computation
+    assert set(asyncio.run(upload_many())) == {hashlib.md5(SOURCE).hexdigest()}
+    assert len(sftp._source_md5_cache) == 1
+    assert not sftp._source_md5_pending
+    assert asyncio.run(sftp._source_md5(str(path))) == hashlib.md5(SOURCE).hexdigest()
+
+
+class RemoteFile(object):
+    def __init__(self, files, path):
+        self._files = files
+        self._path = path
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def stat(self):
+        return Attrs(len(self._files[self._path]))
+
+    async def read(self, length, offset):
+        return bytes(self._files[self._path][offset:offset + length])
+
+    async def write(self, data, offset):
+        content = self._files[self._path]
+        content[len(content):offset] = bytes(max(offset - len(content), 0))
+        content[offset:offset + len(data)] = data
+
+
+class Attrs(object):
+    def __init__(self, size):
+        self.size = size
+
+
+class SFTPClient(object):
+    """SFTP client keeping the files in memory"""
+
+    def __init__(self, files):
+        self.files = files
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def open(self, path, mode, encoding=None, block_size=None):
+        if "w" in mode:
+            self.files[path] = bytearray()
+        elif path not in self.files:
+            raise sftp.asyncssh.SFTPNoSuchFile("no such file")
+        return RemoteFile(self.files, path)
+
+    async def stat(self, path):
+        if path not in self.files:
+            raise sftp.asyncssh.SFTPNoSuchFile("no such file")
+        return Attrs(len(self.files[path]))
+
+    async def truncate(self, path, length):
+        del self.files[path][length:]
+
+    async def remove(self, path):
+        del self.files[path]
+
+
+class SSHClient(object):
+    def __init__(self, files):
+        self.files = files
+
+    async def start_sftp_client(self):
+        return SFTPClient(self.files)
+
+
+def test_resume_requires_checksum(tmp_path):
+    transfer = SFTPTransfer(SSHClient({}), host="sftp")
+    with pytest.raises(ValueError):
+        asyncio.run(transfer.get("image.bin", str(tmp_path / "image.bin"), resume=True))
+    with pytest.raises(ValueError):
+        asyncio.run(transfer.put(str(tmp_path / "image.bin"), "image.bin", resume=True))
+
+
+def test_put_removes_corrupt_resumed_file(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(SOURCE)
+    # The first block differs, the last block before the offset matches
+    files = {"image.bin": bytearray(b"x" * 4096 + SOURCE[4096:100000])}
+    transfer = SFTPTransfer(SSHClient(files), host="sftp", block_size=4096)
+
+    async def verify(remote_path):
+        return hashlib.md5(files[remote_path]).hexdigest()
+
+    with pytest.raises(sftp.AsyncnetfsmTransferError):
+        asyncio.run(transfer.put(str(path), "image.bin", resume=True, verify=verify))
+    assert "image.bin" not in files
+
+    result = asyncio.run(transfer.put(str(path), "image.bin", resume=True, verify=verify))
+    assert bytes(files["image.bin"]) == SOURCE
+    assert result.resumed_from == 0
+
+
+def test_put_resumes_interrupted_upload(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(SOURCE)
+    files = {"image.bin": bytearray(SOURCE[:100000])}
+    transfer = SFTPTransfer(SSHClient(files), host="sftp", block_size=4096)
+
+    async def verify(remote_path):
+        return hashlib.md5(files[remote_path]).hexdigest()
+
+    result = asyncio.run(transfer.put(str(path), "image.bin", resume=True, verify=verify))
+    assert bytes(files["image.bin"]) == SOURCE
+    assert result.resumed_from == 100000
+    assert result.transferred == len(SOURCE) - 100000
+
+
+def test_get_removes_corrupt_resumed_file(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(b"x" * 4096 + SOURCE[4096:100000])
+    transfer = SFTPTransfer(SSHClient({"image.bin": bytearray(SOURCE)}), host="sftp", block_size=4096)
+    md5 = hashlib.md5(SOURCE).hexdigest()
+
+    with pytest.raises(sftp.AsyncnetfsmTransferError):
+        asyncio.run(transfer.get("image.bin", str(path), resume=True, md5=md5))
+    assert not path.exists()
+
+    result = asyncio.run(transfer.get("image.bin", str(path), resume=True, md5=md5))
+    assert path.read_bytes() == SOURCE
+    assert result.resumed_from == 0
@@ -0,0 +1,193 @@
+import asyncio
+
+import asyncssh
+import pytest
+
+import asyncnetfsm
+from asyncnetfsm.connections import SSHExecConnection
+
+
+class Stream(object):
+    """Output stream of the exec channel"""
+
+    def __init__(self):
+        self._data = asyncio.Queue()
+
+    def write(self, data):
+        self._data.put_nowait(data)
+
+    def close(self):
+        self._data.put_nowait("")
+
+    async def read(self, size):
+        return await self._data.get()
+
+
+class Process(object):
+    """Exec channel running the script of the command"""
+
+    def __init__(self, command):
+        self.stdout = Stream()
+        self.stderr = Stream()
+        self.exit_status = None
+        self.closed = False
+        self._task = asyncio.ensure_future(self._run(command))
+
+    async def _run(self, command):
+        if command == "show version":
+            for index in range(100):
+                self.stdout.write("line {}\n".format(index))
+                await asyncio.sleep(0)
+            self._exit(0)
+        elif command == "bad":
+            self.stdout.write("partial\n")
+            self.stderr.write("% Invalid input\n")
+            self._exit(1)
+        elif command == "hang":
+            self.stdout.write("started\n")
+            await asyncio.sleep(10)
+            self._exit(0)
+        elif command == "trickle":
+            for _ in range(100):
+                self.stdout.write(".")
+                await asyncio.sleep(0.05)
+            self._exit(0)
+        else:
+            raise asyncssh.ChannelOpenError(asyncssh.OPEN_CONNECT_FAILED, "unexpected command")
+
+    def _exit(self, status):
+        self.exit_status = status
+        self.stdout.close()
+        self.stderr.close()
+
+    async def wait_closed(self):
+        await self._task
+
+    def close(self):
+        self.closed = True
+        self._task.cancel()
+
+
+class Connection(object):
+    """SSH connection opening exec channels"""
+
+    def __init__(self):
+        self.processes = []
+        self._closed = False
+
+    async def create_process(self, command):
+        if command == "refused":
+            raise asyncssh.ChannelOpenError(asyncssh.OPEN_ADMINISTRATIVELY_PROHIBITED, "exec is disabled")
+        process = Process(command)
+        self.processes.append(process)
+        return process
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+@pytest.fixture
+def ssh(monkeypatch):
+    connections = []
+
+    async def connect(**kwargs):
+        connections.append(Connection())
+        return connections[-1]
+
+    monkeypatch.setattr(asyncssh, "connect", connect)
+    return connections
+
+
+async def connect():
+    conn = SSHExecConnection(host="10.0.0.1", timeout=5)
+    await conn.connect()
+    return conn
+
+
+def test_interactive_use_raises_value_error():
+    async def main():
+        conn = SSHExecConnection(host="10.0.0.1")
+        with pytest.raises(ValueError):
+            conn.send("show version\n")
+        with pytest.raises(ValueError):
+            conn.read()
+
+    asyncio.run(main())
+
+
+def test_run_collects_output_and_exit_status(ssh):
+    async def main():
+        conn = await connect()
+        return await conn.run("show version"), await conn.run("bad"), conn.last_read_stats
+
+    result, failed, stats = asyncio.run(main())
+    assert result.stdout == "".join("line {}\n".format(index) for index in range(100))
+    assert result.stderr == ""
+    assert result.exit_status == 0 and result.ok
+    assert failed.stdout == "partial\n"
+    assert failed.stderr == "% Invalid input\n"
+    assert failed.exit_status == 1 and not failed.ok
+    assert stats.ended_by == "eof"
+
+
+def test_run_idle_timeout_closes_channel(ssh):
+    async def main():
+        conn = await connect()
+        with pytest.raises(TimeoutError):
+            await conn.run("hang", idle_timeout=0.2)
+        # The connection is still usable after the timeout
+        return conn.last_read_stats, await conn.run("show version")
+
+    stats, result = asyncio.run(main())
+    assert stats.ended_by == "idle"
+    assert ssh[0].processes[0].closed
+    assert result.ok
+
+
+def test_run_total_timeout(ssh):
+    async def main():
+        conn = await connect()
+        with pytest.raises(TimeoutError):
+            await conn.run("trickle", timeout=0.5, idle_timeout=1)
+        return conn.last_read_stats
+
+    stats = asyncio.run(main())
+    assert stats.ended_by == "timeout"
+    assert stats.chunks > 1
+
+
+def test_run_channel_open_error(ssh):
+    async def main():
+        conn = await connect()
+        with pytest.raises(asyncnetfsm.AsyncnetfsmConnectionError) as e:
+            await conn.run("refused")
+        return e.value
+
+    error = asyncio.run(main())
+    assert "exec is disabled" in str(error)
+
+
+@pytest.mark.parametrize("device_type", ["mikrotik_routeros", "hw1000", "terminal", "cisco_ios"])
+def test_exec_command_after_connect(ssh, device_type):
+    async def main():
+        device = asyncnetfsm.create(
+            ip="10.0.0.1", username="user", password="", device_type=device_type, protocol="ssh_exec", timeout=5
+        )
+        await device.connect()
+        try:
+            result = await device.exec_command("bad")
+            return result, device.last_exit_status, await device.send_command("show version")
+        finally:
+            await device.disconnect()
+
+    result, exit_status, output = asyncio.run(main())
+    assert len(ssh) == 1
+    assert result.stderr == "% Invalid input\n"
+    assert exit_status == 1
+    assert output.startswith("line 0\nline 1\n")
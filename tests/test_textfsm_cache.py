@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import pytest
+
+from asyncnetfsm import utils
+
+TEMPLATE = """Value VERSION (\\S+)
+
+Start
+  ^Version ${VERSION} -> Record
+"""
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    index = ["Template, Hostname, Platform, Command", ""]
+    for number in range(300):
+        name = "cisco_ios_show_test_{}.textfsm".format(number)
+        (tmp_path / name).write_text(TEMPLATE)
+        index.append("{}, .*, cisco_ios, show test {}".format(name, number))
+    (tmp_path / "cisco_nxos_show_version.textfsm").write_text(TEMPLATE)
+    index.append("cisco_nxos_show_version.textfsm, .*, cisco_nxos, sh[[ow]] ver[[sion]]")
+    (tmp_path / "cisco_nxos_show_broken.textfsm").write_text("Value BROKEN (\n")
+    index.append("cisco_nxos_show_broken.textfsm, .*, cisco_nxos, show broken")
+    (tmp_path / "index").write_text("\n".join(index) + "\n")
+
+    monkeypatch.delenv("NET_TEXTFSM", raising=False)
+    utils._template_cache.clear()
+    yield str(tmp_path)
+    utils._template_cache.resize(utils.TEXTFSM_TEMPLATE_CACHE_SIZE)
+    utils._template_cache.clear()
+
+
+def test_cache_is_enlarged_for_all_templates(template_dir):
+    utils.warm_textfsm_cache(template_dir)
+    # All templates except the broken one stay compiled
+    assert len(utils._template_cache) == 301
+
+
+def test_broken_template_is_skipped(template_dir):
+    utils.warm_textfsm_cache(template_dir, platforms=["cisco_nxos"])
+    assert len(utils._template_cache) == 1
+    assert utils.get_structured_data("Version 9.3\n", "cisco_nxos", "show version", template_dir) == [
+        {"version": "9.3"}
+    ]
+
+
+def test_warming_keeps_environment(template_dir):
+    utils.warm_textfsm_cache(template_dir)
+    assert "NET_TEXTFSM" not in os.environ
+
+
+def test_executor_workers_use_template_dir(template_dir):
+    async def main():
+        executor = utils.create_textfsm_executor(max_workers=1, platforms=["cisco_nxos"], template_dir=template_dir)
+        try:
+            return await utils.parse_output("Version 9.3\n", "cisco_nxos", "show version", executor)
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(main()) == [{"version": "9.3"}]
+    assert "NET_TEXTFSM" not in os.environ
+
+
+def test_lru_cache_resize_evicts_oldest():
+    cache = utils.LRUCache(3)
+    for key in range(3):
+        cache.get(key, lambda: key)
+    cache.resize(2)
+    assert len(cache) == 2
+    assert cache.get(0, lambda: "new") == "new"
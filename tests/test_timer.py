@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from asyncnetfsm.connections.timer import ReadTimer
+
+
+async def read_with_gaps(timer, gaps):
+    with timer:
+        for gap in gaps:
+            await asyncio.sleep(gap)
+            timer.touch()
+
+
+def test_idle_timeout_expires():
+    timer = ReadTimer(idle_timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(read_with_gaps(timer, [0.01, 0.2]))
+    assert timer.expired == "idle"
+
+
+def test_touch_keeps_idle_timer_alive():
+    timer = ReadTimer(idle_timeout=0.05)
+    asyncio.run(read_with_gaps(timer, [0.03] * 5))
+    assert timer.expired is None
+    stats = timer.stats("pattern")
+    assert stats.chunks == 5
+    assert stats.ended_by == "pattern"
+    assert stats.max_gap >= 0.03
+
+
+def test_total_timeout_expires_with_steady_data():
+    timer = ReadTimer(timeout=0.1, idle_timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(read_with_gaps(timer, [0.02] * 20))
+    assert timer.expired == "timeout"
+
+
+def test_without_limits_nothing_expires():
+    timer = ReadTimer()
+    asyncio.run(read_with_gaps(timer, [0.01, 0.01]))
+    assert timer.expired is None
+
+
+def test_outer_cancellation_is_not_converted():
+    async def main():
+        timer = ReadTimer(idle_timeout=10)
+        task = asyncio.ensure_future(read_with_gaps(timer, [1]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert timer.expired is None
+
+    asyncio.run(main())